@@ -0,0 +1,44 @@
+"""
+Benchmark decoding of textual bundle entries with eval() and with
+Toolbox.decode_text(), using bundles/bundler.py as corpus.
+"""
+
+from pathlib import Path
+import sys
+import timeit
+
+from tsutsumu.bundle import Toolbox
+
+
+def main(args: list[str]) -> None:
+    path = Path(args[1] if len(args) > 1 else 'bundles/bundler.py')
+    manifest = Toolbox.load_meta_data(path)[1]
+    entries = [
+        Toolbox.read(path, offset, length)
+        for kind, offset, length in manifest.values()
+        if kind == 't' and length > 0
+    ]
+    size = sum(len(entry) for entry in entries)
+    print(f'{len(entries)} text entries with {size:,} bytes in "{path}"')
+
+    for entry in entries:
+        assert eval(entry) == Toolbox.decode_text(entry)
+
+    def with_eval() -> None:
+        for entry in entries:
+            eval(entry)
+
+    def with_decode_text() -> None:
+        for entry in entries:
+            Toolbox.decode_text(entry)
+
+    repeat = 20
+    baseline = min(timeit.repeat(with_eval, number=1, repeat=repeat))
+    print(f'eval():                 {baseline * 1_000:8.3f} ms')
+    optimized = min(timeit.repeat(with_decode_text, number=1, repeat=repeat))
+    print(f'Toolbox.decode_text():  {optimized * 1_000:8.3f} ms')
+    print(f'speedup:                {baseline / optimized:8.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,67 @@
+"""
+Benchmark scan_anchors(), which extracts anchors from PEP 503 project pages with
+regular expressions, against LinkParser, which is based on html.parser. The page
+is a synthetic stand-in for a large project's, with the given number of files.
+"""
+
+import html
+import sys
+import timeit
+
+from cargo.index import LinkParser, scan_anchors
+
+
+def make_page(count: int) -> bytes:
+    lines = [
+        '<!DOCTYPE html>',
+        '<html>',
+        '  <head>',
+        '    <meta name="pypi:repository-version" content="1.1">',
+        '    <title>Links for numpy</title>',
+        '  </head>',
+        '  <body>',
+        '    <h1>Links for numpy</h1>',
+    ]
+    for index in range(count):
+        version = f'1.{index // 300}.{index // 30 % 10}'
+        tag = f'cp3{index % 30}'
+        filename = f'numpy-{version}-{tag}-{tag}-manylinux_2_17_x86_64.whl'
+        url = f'https://files.pythonhosted.org/packages/{index:064x}/{filename}'
+        lines.append(
+            f'    <a href="{url}#sha256={index:064x}" '
+            f'data-requires-python="{html.escape(">=3.9")}" '
+            f'data-dist-info-metadata="sha256={index:064x}" '
+            f'data-core-metadata="sha256={index:064x}">{filename}</a><br />'
+        )
+    lines.extend(['  </body>', '</html>', '<!--SERIAL 19000000-->', ''])
+    return '\n'.join(lines).encode('utf8')
+
+
+def main(args: list[str]) -> None:
+    count = int(args[1]) if len(args) > 1 else 10_000
+    page = make_page(count)
+    size = len(page) / 1024 / 1024
+    print(f'{count:,} anchors in {size:.1f} MiB of HTML')
+
+    def with_link_parser() -> object:
+        parser = LinkParser()
+        parser.feed(page.decode('utf8'))
+        parser.close()
+        return parser.version, parser.anchors
+
+    def with_scan_anchors() -> object:
+        return scan_anchors(page)
+
+    assert with_link_parser() == with_scan_anchors()
+
+    repeat = 5
+    baseline = min(timeit.repeat(with_link_parser, number=1, repeat=repeat))
+    print(f'LinkParser:      {baseline * 1_000:8.1f} ms  {size / baseline:6.1f} MiB/s')
+    optimized = min(timeit.repeat(with_scan_anchors, number=1, repeat=repeat))
+    print(
+        f'scan_anchors():  {optimized * 1_000:8.1f} ms  {size / optimized:6.1f} MiB/s')
+    print(f'speedup:         {baseline / optimized:8.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,79 @@
+"""
+Benchmark ingest_json_text(), which decodes a Simple API project page one file
+at a time, against decoding the entire page with json.loads() before calling
+ingest_json(). The page is a synthetic stand-in for botocore's, with the given
+number of releases, each with a wheel and an sdist.
+"""
+
+import json
+import sys
+import timeit
+import tracemalloc
+from typing import Callable
+
+from cargo.index import ingest_json, ingest_json_text
+
+
+def make_page(count: int) -> str:
+    files = []
+    versions = []
+    for index in range(count):
+        version = f'1.{index // 100}.{index % 100}'
+        versions.append(version)
+        for filename in (
+            f'botocore-{version}-py3-none-any.whl',
+            f'botocore-{version}.tar.gz',
+        ):
+            files.append({
+                'filename': filename,
+                'url': f'https://files.pythonhosted.org/packages/{index:064x}/{filename}',
+                'hashes': {'sha256': f'{index:064x}'},
+                'requires-python': '>= 3.7',
+                'core-metadata': {'sha256': f'{index:064x}'}
+                    if filename.endswith('.whl') else False,
+                'size': 10_000_000 + index,
+                'upload-time': '2023-07-01T19:23:51.123456Z',
+                'yanked': False,
+            })
+    return json.dumps({
+        'meta': {'api-version': '1.1', '_last-serial': 18_000_000},
+        'name': 'botocore',
+        'files': files,
+        'versions': versions,
+    })
+
+
+def peak_memory(fn: Callable[[], object]) -> int:
+    tracemalloc.start()
+    try:
+        fn()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+def main(args: list[str]) -> None:
+    count = int(args[1]) if len(args) > 1 else 2_500
+    text = make_page(count)
+    print(f'{2 * count:,} files in {len(text):,} bytes of JSON')
+
+    def with_json_loads() -> object:
+        return ingest_json(json.loads(text))
+
+    def with_streaming() -> object:
+        return ingest_json_text(text)
+
+    assert with_json_loads() == with_streaming()
+
+    repeat = 5
+    baseline = min(timeit.repeat(with_json_loads, number=1, repeat=repeat))
+    optimized = min(timeit.repeat(with_streaming, number=1, repeat=repeat))
+    print(f'json.loads():        {baseline * 1_000:8.1f} ms  '
+        f'{peak_memory(with_json_loads) / 1024 / 1024:6.1f} MiB peak')
+    print(f'ingest_json_text():  {optimized * 1_000:8.1f} ms  '
+        f'{peak_memory(with_streaming) / 1024 / 1024:6.1f} MiB peak')
+    print(f'speedup:             {baseline / optimized:8.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
@@ -0,0 +1,75 @@
+"""
+Benchmark BundleMaker.list_files(), which walks directories with os.scandir(),
+against the previous walker based on Path.iterdir(), using a synthetic tree of
+50,000 files.
+"""
+
+from collections.abc import Iterator
+import os
+from pathlib import Path
+import sys
+from tempfile import TemporaryDirectory
+import timeit
+
+from tsutsumu.maker import BundledFile, BundleMaker, FileKind
+
+
+def iterdir_list_files(maker: BundleMaker) -> Iterator[BundledFile]:
+    for directory in maker._directories:
+        root = Path(directory).absolute()
+        pending = list(root.iterdir())
+        while pending:
+            item = pending.pop().absolute()
+            if item.is_file() and BundleMaker.is_module_name(item.stem):
+                name, suffix = item.name, item.suffix
+                if suffix in maker._binary_extensions or name in maker._binary_files:
+                    kind = FileKind.BINARY
+                elif suffix in maker._text_extensions or name in maker._text_files:
+                    kind = FileKind.TEXT
+                else:
+                    continue
+                key = str(item.relative_to(root.parent)).replace('\\', '/')
+                if not maker.is_excluded_key(key):
+                    yield BundledFile(kind, item, key)
+            elif item.is_dir() and BundleMaker.is_module_name(item.name):
+                pending.extend(item.iterdir())
+
+
+def make_tree(root: Path, count: int) -> None:
+    # 50 packages with 10 subpackages with 100 files each, of which 1 in 10
+    # has an extension that isn't bundled.
+    suffixes = ['.py'] * 6 + ['.txt', '.json', '.png', '.c']
+    per_package = count // 500
+    for package in range(50):
+        for subpackage in range(10):
+            directory = root / f'pkg{package}' / f'sub{subpackage}'
+            directory.mkdir(parents=True)
+            for index in range(per_package):
+                suffix = suffixes[index % len(suffixes)]
+                (directory / f'mod{index}{suffix}').write_bytes(b'')
+
+
+def main(args: list[str]) -> None:
+    count = int(args[1]) if len(args) > 1 else 50_000
+    with TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / 'synthetic'
+        make_tree(root, count)
+        maker = BundleMaker([str(root)])
+
+        expected = sorted(iterdir_list_files(maker), key=lambda f: f.key)
+        actual = sorted(maker.list_files(), key=lambda f: f.key)
+        assert actual == expected
+        print(f'{len(actual):,} bundled out of {count:,} files in "{root}"')
+
+        repeat = 5
+        baseline = min(timeit.repeat(
+            lambda: sum(1 for _ in iterdir_list_files(maker)), number=1, repeat=repeat))
+        print(f'Path.iterdir():  {baseline * 1_000:8.1f} ms')
+        optimized = min(timeit.repeat(
+            lambda: sum(1 for _ in maker.list_files()), number=1, repeat=repeat))
+        print(f'os.scandir():    {optimized * 1_000:8.1f} ms')
+        print(f'speedup:         {baseline / optimized:8.1f}x')
+
+
+if __name__ == '__main__':
+    main(sys.argv)
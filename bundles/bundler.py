@@ -300,6 +300,206 @@ class DistInfo:
         return record_path, content
 """,
 # ------------------------------------------------------------------------------
+"cargo/httpcache.py":
+b"""\x22\x22\x22
+An on-disk cache for HTTP responses, which revalidates stale entries with
+conditional requests based on their `ETag` and `Last-Modified` validators.
+\x22\x22\x22
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import NamedTuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+__all__ = (\x22CacheEntry\x22, \x22HttpCache\x22)
+
+
+# Only these response headers are retained
+_CACHED_HEADERS = (\x22content-type\x22, \x22etag\x22, \x22last-modified\x22)
+
+
+class CacheEntry(NamedTuple):
+    \x22\x22\x22A cached response body with its URL, select headers, and storage time.\x22\x22\x22
+
+    url: str
+    headers: dict[str, str]
+    body: bytes
+    timestamp: float
+
+    def validators(self) -> dict[str, str]:
+        \x22\x22\x22Determine the headers for revalidating this entry.\x22\x22\x22
+        headers = {}
+        if \x22etag\x22 in self.headers:
+            headers[\x22if-none-match\x22] = self.headers[\x22etag\x22]
+        if \x22last-modified\x22 in self.headers:
+            headers[\x22if-modified-since\x22] = self.headers[\x22last-modified\x22]
+        return headers
+
+    def to_response(self) -> requests.Response:
+        \x22\x22\x22Recreate the response with status 200 from this entry.\x22\x22\x22
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = self.body
+        return response
+
+
+class HttpCache:
+    \x22\x22\x22
+    A cache of HTTP responses in a directory. Entries younger than the TTL in
+    seconds are fresh and used as is. Older entries need to be revalidated with
+    the server. Once the entries' total size exceeds the maximum, the least
+    recently used ones are evicted.
+    \x22\x22\x22
+
+    def __init__(
+        self,
+        directory: str | Path,
+        *,
+        ttl: float = 10 * 60,
+        max_size: int = 256 * 1024 * 1024,
+    ) -> None:
+        self._directory = Path(directory)
+        self._ttl = ttl
+        self._max_size = max_size
+        self._size: None | int = None
+        self._lock = threading.Lock()
+        self.hits = self.revalidations = self.misses = 0
+
+    def _path(self, url: str) -> Path:
+        digest = hashlib.sha256(url.encode(\x22utf8\x22)).hexdigest()
+        return self._directory / f\x22{digest}.cache\x22
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.timestamp < self._ttl
+
+    def get(self, url: str) -> None | CacheEntry:
+        \x22\x22\x22Look up the entry for the URL, marking it as recently used.\x22\x22\x22
+        path = self._path(url)
+        try:
+            with open(path, mode=\x22rb\x22) as file:
+                meta = json.loads(file.readline())
+                body = file.read()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        if meta.get(\x22url\x22) != url:
+            return None
+        return CacheEntry(url, meta[\x22headers\x22], body, meta[\x22timestamp\x22])
+
+    def put(self, url: str, response: requests.Response) -> CacheEntry:
+        \x22\x22\x22Store the successful response for the URL.\x22\x22\x22
+        headers = {
+            key: response.headers[key]
+            for key in _CACHED_HEADERS
+            if key in response.headers
+        }
+        entry = CacheEntry(url, headers, response.content, time.time())
+        self._write(entry)
+        return entry
+
+    def refresh(self, entry: CacheEntry) -> CacheEntry:
+        \x22\x22\x22Restart the entry's TTL after the server confirmed it is unchanged.\x22\x22\x22
+        entry = entry._replace(timestamp=time.time())
+        self._write(entry)
+        return entry
+
+    def _write(self, entry: CacheEntry) -> None:
+        meta = {
+            \x22url\x22: entry.url, \x22headers\x22: entry.headers, \x22timestamp\x22: entry.timestamp
+        }
+        data = json.dumps(meta).encode(\x22utf8\x22) + b\x22\\n\x22 + entry.body
+
+        path = self._path(entry.url)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(
+            f\x22.{path.name}.{os.getpid()}.{threading.get_ident()}\x22
+        )
+        temp_path.write_bytes(data)
+
+        with self._lock:
+            size = self._current_size()
+            try:
+                size -= path.stat().st_size
+            except OSError:
+                pass
+            os.replace(temp_path, path)
+            self._size = size + len(data)
+            if self._size > self._max_size:
+                self._evict()
+
+    def _current_size(self) -> int:
+        if self._size is None:
+            self._size = sum(status.st_size for _, status in self._list_entries())
+        return self._size
+
+    def _list_entries(self) -> list[tuple[str, os.stat_result]]:
+        entries = []
+        try:
+            with os.scandir(self._directory) as iterator:
+                for item in iterator:
+                    if item.name.endswith(\x22.cache\x22) and not item.name.startswith(\x22.\x22):
+                        try:
+                            entries.append((item.path, item.stat()))
+                        except OSError:
+                            pass
+        except OSError:
+            pass
+        return entries
+
+    def _evict(self) -> None:
+        assert self._size is not None
+        # Evict down to 90% of the maximum, so eviction doesn't run on every write.
+        target = self._max_size * 9 // 10
+        entries = sorted(self._list_entries(), key=lambda e: e[1].st_mtime_ns)
+        for path, status in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= status.st_size
+
+    def hit(self, entry: CacheEntry) -> requests.Response:
+        \x22\x22\x22Use the fresh entry without any request.\x22\x22\x22
+        with self._lock:
+            self.hits += 1
+        return entry.to_response()
+
+    def update(
+        self, url: str, entry: None | CacheEntry, response: requests.Response
+    ) -> requests.Response:
+        \x22\x22\x22
+        Process the response to a request for the URL, which was conditional if
+        there is a stale entry. If the server responded with 304 Not Modified,
+        return the entry's response again. Otherwise, cache successful
+        responses and return them unchanged. Only stored responses count as
+        misses.
+        \x22\x22\x22
+        if response.status_code == 304 and entry is not None:
+            refreshed = self.refresh(entry)
+            with self._lock:
+                self.revalidations += 1
+            return refreshed.to_response()
+
+        if response.status_code == 200:
+            self.put(url, response)
+            with self._lock:
+                self.misses += 1
+        return response
+""",
+# ------------------------------------------------------------------------------
 "cargo/index.py":
 b"""\x22\x22\x22
 Support for accessing PyPI and compatible indices through the simple repository
@@ -320,17 +520,24 @@ API. Relevant PEPs are:
   * [PEP 715](https://peps.python.org/pep-0715/) disallows `.egg` uploads.
 \x22\x22\x22
 
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 import email.message
+from functools import lru_cache
+import html
 from html.parser import HTMLParser
 import json
 import logging
 import re
 import sys
+import threading
 import time
 from typing import cast, Literal, NamedTuple, TypedDict
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from .httpcache import HttpCache
 from .name import canonicalize, split_hash
 from .version import Version
 
@@ -352,6 +559,10 @@ HEADERS = {
     \x22accept\x22: \x22, \x22.join(ACCEPTABLE_CONTENT),
 }
 
+# Responses with these status codes are retried, after backing off
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+TIMEOUT = 30.0
+
 PYPI_CONTENT_TYPES = re.compile(
     r\x22application/vnd.pypi.simple.v(?P<version>\\d+)\\+(?P<format>html|json)\x22
 )
@@ -415,23 +626,122 @@ def determine_format(content_type_header: str) -> tuple[None | str, None | str]:
     return cast(tuple[str, str], pypi_format.groups())
 
 
-def retrieve_metadata(name: str) -> None | ReleaseMetadata:
+class RateLimiter:
+    \x22\x22\x22
+    A thread-safe token bucket. It refills at the given rate per second and
+    holds at most capacity tokens, which bounds the size of bursts.
+    \x22\x22\x22
+
+    def __init__(self, rate: float, capacity: int = 1) -> None:
+        if rate <= 0 or capacity < 1:
+            raise ValueError(f\x22invalid rate {rate} or capacity {capacity}\x22)
+        self._rate = rate
+        self._capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._timestamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        \x22\x22\x22Take a token, waiting until it becomes available if necessary.\x22\x22\x22
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._timestamp
+            self._tokens = min(self._capacity, self._tokens + elapsed * self._rate)
+            self._timestamp = now
+            # Going into debt reserves the token, so that waiters are served in
+            # order without polling.
+            self._tokens -= 1
+            delay = -self._tokens / self._rate
+        if delay > 0:
+            time.sleep(delay)
+
+
+def fetch(
+    session: requests.Session,
+    url: str,
+    *,
+    limiter: None | RateLimiter = None,
+    retries: int = 3,
+    backoff: float = 0.5,
+    cache: None | HttpCache = None,
+) -> requests.Response:
+    \x22\x22\x22
+    Get the URL. Retry connection errors, timeouts, and responses with transient
+    status codes up to the given number of times, with exponential backoff
+    unless the server asks for a specific delay via Retry-After. With a cache,
+    fresh responses are served from disk and stale ones are revalidated.
+    \x22\x22\x22
+    entry = None if cache is None else cache.get(url)
+    headers = HEADERS
+    if entry is not None:
+        assert cache is not None
+        if cache.is_fresh(entry):
+            return cache.hit(entry)
+        headers = HEADERS | entry.validators()
+
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+
+        delay = backoff * 2 ** attempt
+        try:
+            response = session.get(url, headers=headers, timeout=TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as x:
+            if attempt >= retries:
+                raise
+            logger.debug('retrying \x22%s\x22 after %s', url, x)
+        else:
+            if response.status_code not in RETRYABLE_STATUS or attempt >= retries:
+                if cache is not None:
+                    response = cache.update(url, entry, response)
+                response.raise_for_status()
+                return response
+            retry_after = response.headers.get(\x22retry-after\x22, \x22\x22)
+            if retry_after.isdigit():
+                delay = min(float(retry_after), 60.0)
+            logger.debug('retrying \x22%s\x22 after status %d', url, response.status_code)
+
+        time.sleep(delay)
+        attempt += 1
+
+
+def retrieve_metadata(
+    name: str,
+    *,
+    session: None | requests.Session = None,
+    limiter: None | RateLimiter = None,
+    retries: int = 3,
+    backoff: float = 0.5,
+    cache: None | HttpCache = None,
+    index: str = PACKAGE_INDEX,
+) -> None | ReleaseMetadata:
     \x22\x22\x22Retrieve metadata about the most recent wheel-based release.\x22\x22\x22
     name = canonicalize(name)
 
     # Fetch project JSON or page
     logger.debug('fetching package metadata for \x22%s\x22', name)
-    response = requests.get(f\x22{PACKAGE_INDEX}/{name}/\x22, headers=HEADERS)
-    response.raise_for_status()
+    url = f\x22{index}/{name}/\x22
+    if session is None:
+        with requests.Session() as session:
+            response = fetch(
+                session, url, limiter=limiter, retries=retries, backoff=backoff,
+                cache=cache,
+            )
+    else:
+        response = fetch(
+            session, url, limiter=limiter, retries=retries, backoff=backoff,
+            cache=cache,
+        )
 
     content_type = response.headers.get(\x22content-type\x22, \x22\x22)
     format = determine_format(content_type)[1]
     info: None | ReleaseMetadata
     match format:
         case \x22json\x22:
-            info = ingest_json(response.json())
+            info = ingest_json_text(response.text)
         case \x22html\x22:
-            info = ingest_html(response.text)
+            info = ingest_html(response.content, response.encoding or \x22utf8\x22)
         case _:
             raise ValueError(
                 f'unrecognized content type \x22{content_type}\x22 for package \x22{name}\x22'
@@ -443,12 +753,56 @@ def retrieve_metadata(name: str) -> None | ReleaseMetadata:
         info[\x22version\x22] = str(info[\x22version\x22])
         pep658 = \x22\xe2\x9c\x85\x22 if \x22core_metadata\x22 in info else \x22\xe2\x9d\x8c\x22
         logger.info(\x22%s %s v%s:\x22, pep658, name, info[\x22version\x22])
-        logger.info(\x22    requires_pathon=%s\x22, info[\x22requires_python\x22])
+        logger.info(\x22    requires_pathon=%s\x22, info.get(\x22requires_python\x22))
         logger.info(\x22    filename=%s\x22, info[\x22filename\x22])
         logger.info(\x22    href=%s\x22, info[\x22url\x22])
     return info
 
 
+def retrieve_all_metadata(
+    names: Iterable[str],
+    *,
+    workers: int = 8,
+    rate: float = 10.0,
+    retries: int = 3,
+    backoff: float = 0.5,
+    cache: None | HttpCache = None,
+    index: str = PACKAGE_INDEX,
+) -> dict[str, None | ReleaseMetadata]:
+    \x22\x22\x22
+    Retrieve metadata about the most recent wheel-based releases of many projects
+    concurrently. The workers share one session and hence one connection pool,
+    together issue at most rate requests per second, and retry transient
+    failures. Given a cache, they also share that cache. Projects whose metadata
+    cannot be retrieved map to None.
+    \x22\x22\x22
+    names = list(names)
+    limiter = RateLimiter(rate, capacity=workers)
+
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_maxsize=workers)
+        session.mount(\x22https://\x22, adapter)
+        session.mount(\x22http://\x22, adapter)
+
+        def retrieve(name: str) -> None | ReleaseMetadata:
+            try:
+                return retrieve_metadata(
+                    name,
+                    session=session,
+                    limiter=limiter,
+                    retries=retries,
+                    backoff=backoff,
+                    cache=cache,
+                    index=index,
+                )
+            except (requests.RequestException, ValueError) as x:
+                logger.warning('Unable to retrieve metadata for \x22%s\x22: %s', name, x)
+                return None
+
+        with ThreadPoolExecutor(workers) as executor:
+            return dict(zip(names, executor.map(retrieve, names)))
+
+
 # --------------------------------------------------------------------------------------
 
 
@@ -458,38 +812,147 @@ def ingest_json(data: dict[str, object]) -> None | ReleaseMetadata:
     if \x22meta\x22 in data and isinstance(data[\x22meta\x22], dict):
         api_version = data[\x22meta\x22].get(\x22api-version\x22)
 
-    files = cast(list[ReleaseMetadata], data[\x22files\x22])
+    latest = ingest_json_files(cast(list[dict[str, object]], data[\x22files\x22]))
+    if api_version is not None and latest is not None:
+        latest[\x22api_version\x22] = api_version
+    return latest
+
+
+def ingest_json_text(text: str) -> None | ReleaseMetadata:
+    \x22\x22\x22
+    Process the JSON text from PyPI's Simple Repository API. Unlike
+    `ingest_json()`, this function does not decode the entire document upfront.
+    It instead decodes one file at a time, which keeps memory consumption low
+    for projects with tens of thousands of files.
+    \x22\x22\x22
+    api_version = None
     latest: None | ReleaseMetadata = None
+    for key, value in iter_json_object(text, \x22files\x22):
+        if key == \x22meta\x22 and isinstance(value, dict):
+            api_version = value.get(\x22api-version\x22)
+        elif key == \x22files\x22:
+            latest = ingest_json_files(cast(Iterator[dict[str, object]], value))
+
+    if api_version is not None and latest is not None:
+        latest[\x22api_version\x22] = api_version
+    return latest
+
+
+def ingest_json_files(files: Iterable[dict[str, object]]) -> None | ReleaseMetadata:
+    \x22\x22\x22Determine the latest wheel amongst the files and its metadata.\x22\x22\x22
+    latest: None | ReleaseMetadata = None
+    latest_file: None | dict[str, object] = None
 
     for file in files:
-        maybe_latest = find_latest_release(file[\x22filename\x22], latest)
+        filename = file[\x22filename\x22]
+        # Skip sdists and the like before parsing the version.
+        if not isinstance(filename, str) or not filename.rstrip().endswith(\x22.whl\x22):
+            continue
+        maybe_latest = find_latest_release(filename, latest)
         if maybe_latest is None:
             continue
+        latest, latest_file = maybe_latest, file
 
-        latest = maybe_latest
-        for key, value in file.items():
+    # Only copy the attributes of the one file that made the cut.
+    if latest is not None:
+        assert latest_file is not None
+        for key, value in latest_file.items():
             if key == \x22hashes\x22:
                 latest[\x22hashes\x22] = cast(HashValue, value).copy()
             if key == \x22core-metadata\x22 and isinstance(value, dict):
                 latest[\x22core_metadata\x22] = cast(HashValue, value).copy()
             elif key in JSON_ATTRIBUTES:
                 latest[JSON_ATTRIBUTES[key]] = value  # type: ignore[literal-required]
-
-    if api_version is not None and latest is not None:
-        latest[\x22api_version\x22] = api_version
     return latest
 
 
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE = re.compile(r\x22[ \\t\\n\\r]*\x22)
+_JSON_ELEMENT_END = re.compile(r\x22[ \\t\\n\\r]*([,\\]])[ \\t\\n\\r]*\x22)
+
+
+def iter_json_object(text: str, lazy: str) -> Iterator[tuple[str, object]]:
+    \x22\x22\x22
+    Iterate over the members of the JSON object in the text, decoding each value
+    in turn. The member named lazy must have an array as its value, which is
+    returned as an iterator that decodes one element at a time. Any elements
+    not consumed before advancing to the next member are skipped.
+    \x22\x22\x22
+    def skip(index: int) -> int:
+        return cast(re.Match[str], _JSON_WHITESPACE.match(text, index)).end()
+
+    def expect(index: int, chars: str) -> tuple[str, int]:
+        char = text[index:index + 1]
+        if char == \x22\x22 or char not in chars:
+            expected = \x22 or \x22.join(f\x22'{c}'\x22 for c in chars)
+            raise json.JSONDecodeError(f\x22Expecting {expected}\x22, text, index)
+        return char, skip(index + 1)
+
+    def iter_array(index: int) -> Iterator[object]:
+        _, index = expect(index, \x22[\x22)
+        if text[index:index + 1] != \x22]\x22:
+            # Bind names locally, since this loop runs once per element.
+            decode, match_end = _JSON_DECODER.raw_decode, _JSON_ELEMENT_END.match
+            while True:
+                value, index = decode(text, index)
+                position[0] = index
+                yield value
+                if (end := match_end(text, index)) is None:
+                    raise json.JSONDecodeError(
+                        \x22Expecting ',' or ']'\x22, text, skip(index)
+                    )
+                index = end.end()
+                if end.group(1) == \x22]\x22:
+                    break
+        else:
+            index = skip(index + 1)
+        position[0] = index
+
+    position = [0]
+    _, index = expect(skip(0), \x22{\x22)
+    if text[index:index + 1] == \x22}\x22:
+        return
+    while True:
+        key, index = _JSON_DECODER.raw_decode(text, index)
+        if not isinstance(key, str):
+            raise json.JSONDecodeError(\x22Expecting property name\x22, text, index)
+        _, index = expect(skip(index), \x22:\x22)
+        if key == lazy:
+            position[0] = index
+            elements = iter_array(index)
+            yield key, elements
+            for _ in elements:
+                pass
+            index = position[0]
+        else:
+            value, index = _JSON_DECODER.raw_decode(text, index)
+            index = skip(index)
+            yield key, value
+        char, index = expect(index, \x22,}\x22)
+        if char == \x22}\x22:
+            return
+
+
 # --------------------------------------------------------------------------------------
 
 
-def ingest_html(html: str) -> None | ReleaseMetadata:
-    \x22\x22\x22Process the HTML result from PyPI' Simple Repository API.\x22\x22\x22
-    parser = LinkParser()
-    parser.feed(html)
-    parser.close()
-    anchors = parser._anchors
-    api_version = parser._api_version
+def ingest_html(page: str | bytes, encoding: str = \x22utf8\x22) -> None | ReleaseMetadata:
+    \x22\x22\x22
+    Process the HTML result from PyPI' Simple Repository API. If the page is
+    bytes, this function first tries the faster `scan_anchors()` and only
+    falls back on `LinkParser` if the page has an unusual shape.
+    \x22\x22\x22
+    if isinstance(page, bytes) and (scan := scan_anchors(page, encoding)) is not None:
+        api_version, anchors = scan
+    else:
+        if isinstance(page, bytes):
+            logger.debug(\x22Falling back on LinkParser for unusual HTML page\x22)
+            page = page.decode(encoding, errors=\x22replace\x22)
+        parser = LinkParser()
+        parser.feed(page)
+        parser.close()
+        anchors = parser._anchors
+        api_version = parser._api_version
 
     latest: None | ReleaseMetadata = None
     for filename, attributes in anchors:
@@ -518,6 +981,80 @@ class Anchor(NamedTuple):
     attributes: list[tuple[str, None | str]]
 
 
+_HTML_ATTRIBUTE_SYNTAX = r\x22\x22\x22\\s+([^\\s\x22'<>/=]+)(?:\\s*(=)\\s*(?:\x22([^\x22]*)\x22|'([^']*)'))?\x22\x22\x22
+_HTML_ATTRIBUTE = re.compile(_HTML_ATTRIBUTE_SYNTAX)
+# Only group the attributes as a whole, so that findall() returns two strings.
+_HTML_ATTRIBUTES = f\x22((?:{re.sub(r'[(](?![?])', '(?:', _HTML_ATTRIBUTE_SYNTAX)})*)\x22
+# Without re.I, which slows down matching.
+_HTML_ANCHOR = re.compile(f\x22<[aA]{_HTML_ATTRIBUTES}\\\\s*>([^<]*)</[aA]\\\\s*>\x22)
+_HTML_ANCHOR_START = re.compile(r\x22<[aA][\\s/>]\x22)
+_HTML_ANCHOR_END = re.compile(r\x22</[aA]\\s*>\x22)
+_HTML_META = re.compile(f\x22<meta{_HTML_ATTRIBUTES}\\\\s*/?>\x22, re.I)
+_HTML_META_START = re.compile(r\x22<meta[\\s/>]\x22, re.I)
+_HTML_COMMENT = re.compile(r\x22<!--.*?-->\x22, re.S)
+# CDATA sections and raw text elements may hide or contain markup.
+_HTML_UNUSUAL = re.compile(r\x22<!\\[|<script|<style\x22, re.I)
+
+
+def scan_anchors(
+    page: bytes, encoding: str = \x22utf8\x22
+) -> None | tuple[None | str, list[Anchor]]:
+    \x22\x22\x22
+    Scan the HTML page for its API version and anchors with regular expressions.
+    Doing so is a few times faster than running `LinkParser`, but it only works
+    for pages with the simple shape mandated by PEP 503: Anchors must contain
+    nothing but text and their attribute values must be quoted. If the page has
+    any other shape, this function returns None.
+    \x22\x22\x22
+    text = page.decode(encoding, errors=\x22replace\x22)
+    # PyPI ends every page with a comment containing its serial number. Since
+    # comments without markup do not affect scanning, they may stay in place.
+    comments = _HTML_COMMENT.findall(text)
+    if (
+        text.count(\x22<!--\x22) != len(comments)
+        or any(\x22<\x22 in comment[4:] for comment in comments)
+        or _HTML_UNUSUAL.search(text) is not None
+    ):
+        return None
+
+    unescape = html.unescape
+
+    def parse_attributes(text: str) -> list[tuple[str, None | str]]:
+        return [
+            (
+                name.lower(),
+                None if not equals
+                else unescape(value) if \x22&\x22 in (value := double or single)
+                else value,
+            )
+            for name, equals, double, single in _HTML_ATTRIBUTE.findall(text)
+        ]
+
+    api_version = None
+    metas = _HTML_META.findall(text)
+    for attribute_text in metas:
+        attributes = parse_attributes(attribute_text)
+        if (\x22name\x22, \x22pypi:repository-version\x22) in attributes:
+            for key, value in attributes:
+                if key == \x22content\x22 and value is not None:
+                    api_version = value
+
+    anchors = []
+    for attribute_text, content in _HTML_ANCHOR.findall(text):
+        if \x22&\x22 in content:
+            content = unescape(content)
+        anchors.append(Anchor(content, parse_attributes(attribute_text)))
+
+    # Every element must have been matched.
+    if (
+        len(_HTML_META_START.findall(text)) != len(metas)
+        or len(_HTML_ANCHOR_START.findall(text)) != len(anchors)
+        or len(_HTML_ANCHOR_END.findall(text)) != len(anchors)
+    ):
+        return None
+    return api_version, anchors
+
+
 class LinkParser(HTMLParser):
     \x22\x22\x22A parser for the project pages of PyPI's Simple Repository API.\x22\x22\x22
 
@@ -612,6 +1149,17 @@ def parse_filename(filename: str) -> None | tuple[str, str, str]:
     return kind, name, version
 
 
+@lru_cache(maxsize=4096)
+def parse_version(version: str) -> Version:
+    \x22\x22\x22
+    Parse the version string. Since a project's releases typically comprise
+    several wheels for different platforms, this function memoizes its results,
+    effectively grouping files by version string and parsing each group's
+    version only once.
+    \x22\x22\x22
+    return Version(version)
+
+
 def find_latest_release(
     filename: str, latest_so_far: None | ReleaseMetadata
 ) -> None | ReleaseMetadata:
@@ -625,13 +1173,17 @@ def find_latest_release(
         return None
 
     assert version is not None
-    version_object = Version(version)
-    if (
-        latest_so_far is not None and
-        version_object < latest_so_far[\x22version\x22]
-    ) :
-        logger.debug(\x22Skipping wheel %s < %s\x22, version, latest_so_far[\x22version\x22])
-        return None
+    version_object = parse_version(version)
+    if latest_so_far is not None:
+        latest_version = cast(Version, latest_so_far[\x22version\x22])
+        # The same version string yields the same object, which need not be
+        # compared. Otherwise, comparing the keys avoids dispatch overhead.
+        if (
+            version_object is not latest_version
+            and version_object.key < latest_version.key
+        ):
+            logger.debug(\x22Skipping wheel %s < %s\x22, version, latest_version)
+            return None
 
     return {\x22filename\x22: filename, \x22name\x22: name, \x22version\x22: version_object}
 
@@ -648,14 +1200,17 @@ def main(args: list[str]) -> None:
     core_metadata_count = 0
 
     projects = [r['project'] for r in rows[:50]]
+    retrieved = retrieve_all_metadata(
+        (name for name in projects if name not in latest_releases),
+        cache=HttpCache(\x22pypi-cache\x22),
+    )
     for name in projects:
         logger.info('Processing %s', name)
-        time.sleep(2.0)
 
         if name in latest_releases:
             release: None | ReleaseMetadata = latest_releases[name]
         else:
-            release = retrieve_metadata(name)
+            release = retrieved[name]
 
         if release is None:
             continue
@@ -1014,37 +1569,45 @@ def distill_extra(tokens: TokenString) -> Token:
     # that the marker expression syntax is very simple.
 
     while True:
-        # Shift an operand onto the stack
+        # (1) Shift operand onto stack
         if tokens.has_next():
             if tokens.peek().tag is T.OPEN:
+                # RECURSE parenthesized
                 parenthesized = tokens.parenthesized()
                 stack.shift(distill_extra(parenthesized))
+                # SHIFT result from recursion as operand
             elif tokens.peek().tag in (T.VAR, T.LIT):
+                # SHIFT operand
                 stack.shift(tokens.next())
             else:
                 raise SyntaxError(f'expected operand, found \x22{tokens}\x22')
-        # Try to reduce a comparison
+
+        # (2) Reduce comparisons and conjunctions
         if stack.is_reducible(T.COMP):
+            # REDUCE comparison
             stack.reduce_with(apply_operator)
-        # Try to reduce a conjunction. Top of stack mustn't be variable or literal.
         if stack.is_reducible(T.BOOL, 'and', T.EXTRA, T.NOT_EXTRA):
+            # REDUCE conjunction
             stack.reduce_with(apply_operator)
-        # Shift an operator onto the stack and restart cascade.
+
+        # (3) Shift operator onto stack and restart from top
         if tokens.has_next():
             if tokens.peek().tag in (T.COMP, T.BOOL):
+                # SHIFT operator
                 stack.shift(tokens.next())
             else:
                 raise SyntaxError(f'expected operator, found \x22{tokens}\x22')
             continue
-        # All tokens have been consumed. All comparisons and conjunctions have
-        # been reduced. That should leave only disjunctions.
+
+        # (4) Break out of loop when all tokens have been consumed.
         if len(stack) > 1 and not stack.is_reducible(T.BOOL, \x22or\x22):
             raise SyntaxError('expected operand but marker ended already')
         break
 
-    # Reduce disjunctions until the stack has only one token. That's our result.
+    # (5) Reduce disjunctions until stack has one token left. That's our result.
     while len(stack) > 1:
         assert stack.is_reducible(T.BOOL, \x22or\x22)
+        # REDUCE disjunction
         stack.reduce_with(apply_operator)
 
     return stack.unwrap()
@@ -1168,56 +1731,6 @@ class Requirement(NamedTuple):
         return Requirement(package, extras, versions, extra)
 """,
 # ------------------------------------------------------------------------------
-"cargo/rules.txt":
-b"""pre-releases:
-    only consider as candidate if
-      * already installed;
-      * there is no matching final or post;
-
-V must not contain local unless explicitly allowed. Candidate's local must be ignored
-
-
-~= V.N  =>  >= V.N, == V.*
-
-    No local
-    ignore pre, post, or dev part on prefix match
-        eg  ~= V.N.post  becomes >= V.N.post, == V.*
-
-
-== V
-
-    strict equality with zero padding on C and V
-    if V public, ignore C.local
-    if V local, C.local must be string equal
-
-== V.*
-
-    no dev, no local
-    ignore C.local
-
-!= is just negation
-
-<=, >=
-
-    just order
-    no V.local
-
->, <
-
-    similar but exclude pre, post, and local of V  --> hence:
-
-    >V  does NOT match V.post  unless it's >V.post
-    >V  does NOT match V.local
-
-    <V  does NOT match V.pre  unless < V.pre
-
-    no V.local
-
-====
-
-    string equality
-""",
-# ------------------------------------------------------------------------------
 "cargo/version.py":
 b"""\x22\x22\x22
 Support for version identifiers compatible with [PEP
@@ -1537,6 +2050,11 @@ class Version:
         \x22\x22\x22Return the version data.\x22\x22\x22
         return self._data
 
+    @property
+    def key(self) -> Key:
+        \x22\x22\x22Return the version key.\x22\x22\x22
+        return self._key
+
     @property
     def public_version(self) -> 'Version':
         \x22\x22\x22Return the same version but without a local segment.\x22\x22\x22
@@ -1692,12 +2210,14 @@ class Specifier:
 "tsutsumu/__main__.py":
 b"""from argparse import ArgumentParser, HelpFormatter, RawTextHelpFormatter
 from dataclasses import dataclass, field
+import hashlib
 import os
 import sys
 from textwrap import dedent
 import traceback
 
-from .maker import BundleMaker
+from .bundle import Toolbox
+from .maker import BundleMaker, EncodingCache
 
 
 def parser() -> ArgumentParser:
@@ -1748,32 +2268,101 @@ def parser() -> ArgumentParser:
             The source repository is <https://github.com/apparebit/tsutsumu>
         \x22\x22\x22),
         formatter_class=width_limited_formatter)
+    parser.add_argument(
+        '--append-finder',
+        action='store_true',
+        help='when running the bundle, search the bundle\\n'
+        'after the standard library and site packages')
     parser.add_argument(
         '-b', '--bundle-only',
         action='store_true',
         help='emit only bundled files and their manifest,\\nno runtime code')
+    parser.add_argument(
+        '--bytecode-cache',
+        action='store_true',
+        help=\x22when running the bundle, cache compiled\\n\x22
+        \x22modules in the user's cache directory\x22)
+    parser.add_argument(
+        '--compact-manifest',
+        action='store_true',
+        help='also append a marshalled manifest, which\\n'
+        'loads without reading the entire bundle')
+    parser.add_argument(
+        '--compress',
+        action='store_true',
+        help='zlib-compress resources whose encoding\\n'
+        'shrinks enough, per --compress-ratio')
+    parser.add_argument(
+        '--compress-ratio',
+        metavar='RATIO', type=float,
+        help='with --compress, the largest size of the\\n'
+        'compressed over the original encoding\\n'
+        '(default: 0.8)')
+    parser.add_argument(
+        '--compression-level',
+        metavar='LEVEL', type=int,
+        help=\x22zipapp's deflate compression level from\\n\x22
+        '0 (none) to 9 (best)')
     parser.add_argument(
         '-f', '--format',
         choices=('text', 'zipapp'),
         help=\x22select Tsutsumu's textual bundle format or\\nzipapp's more \x22
         \x22compact, binary one\x22)
+    parser.add_argument(
+        '-i', '--incremental',
+        action='store_true',
+        help=\x22reuse unchanged files' encodings from\\n\x22
+        \x22the previous build of the same output\x22)
+    parser.add_argument(
+        '-j', '--jobs',
+        metavar='N', type=int, default=1,
+        help='encode files with N workers;\\n'
+        '0 means one per CPU')
+    parser.add_argument(
+        '-k', '--keep',
+        metavar='MODULE', action='append', default=[],
+        help='with --tree-shake, also bundle this module\\n'
+        'and its submodules, e.g., for dynamic imports')
     parser.add_argument(
         '-m', '--main',
         metavar='MODULE',
         help=\x22if a package, execute its __main__ module;\\n\x22
         \x22if a module, execute this module\x22)
+    parser.add_argument(
+        '--no-dedup',
+        action='store_true',
+        help='store identical files separately instead\\n'
+        'of letting their keys share one copy')
     parser.add_argument(
         '-o', '--output',
         metavar='FILENAME',
         help='write bundle to this file')
+    parser.add_argument(
+        '--precompile',
+        action='store_true',
+        help='also embed code objects compiled by the\\nrunning Python interpreter')
     parser.add_argument(
         '-r', '--repackage',
         action='store_true',
         help='repackage runtime as \x22tsutsumu.bundle.Bundle\x22')
+    parser.add_argument(
+        '-t', '--tree-shake',
+        action='store_true',
+        help='bundle only modules reachable from main\\n'
+        'module through import statements')
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
         help='enable verbose output')
+    parser.add_argument(
+        '--verify',
+        action='store_true',
+        help=\x22when running the bundle, check each file's\\n\x22
+        'digest when it is first loaded')
+    parser.add_argument(
+        '-w', '--watch',
+        action='store_true',
+        help='keep rebuilding the bundle whenever\\nbundled files change')
     parser.add_argument(
         'roots',
         metavar='PKGROOT', nargs='+',
@@ -1783,11 +2372,26 @@ def parser() -> ArgumentParser:
 
 @dataclass
 class ToolOptions:
+    append_finder: bool = False
     bundle_only: bool = False
+    bytecode_cache: bool = False
+    compact_manifest: bool = False
+    compress: bool = False
+    compress_ratio: 'None | float' = None
+    compression_level: 'None | int' = None
+    format: str = 'text'
+    incremental: bool = False
+    jobs: int = 1
+    keep: 'list[str]' = field(default_factory=list)
     main: 'None | str' = None
+    no_dedup: bool = False
     output: 'None | str' = None
+    precompile: bool = False
     repackage: bool = False
+    tree_shake: bool = False
     verbose: bool = False
+    verify: bool = False
+    watch: bool = False
     roots: 'list[str]' = field(default_factory=list)
 
 
@@ -1795,16 +2399,83 @@ def main() -> None:
     options = parser().parse_args(namespace=ToolOptions())
 
     try:
-        if options.bundle_only and (options.main or options.repackage):
-            raise ValueError('--bundle is incompatible with --main/--repackage')
-
-        BundleMaker(
+        if options.bundle_only and (
+            options.main
+            or options.repackage
+            or options.append_finder
+            or options.bytecode_cache
+            or options.tree_shake
+            or options.verify
+        ):
+            raise ValueError(
+                '--bundle is incompatible with --main/--repackage/'
+                '--append-finder/--bytecode-cache/--tree-shake/--verify')
+        if options.format == 'zipapp' and (
+            options.repackage
+            or options.append_finder
+            or options.bytecode_cache
+            or options.compact_manifest
+            or options.compress
+            or options.verify
+            or options.jobs != 1
+            or options.incremental
+            or options.no_dedup
+        ):
+            raise ValueError(
+                '--format zipapp is incompatible with --repackage/'
+                '--append-finder/--bytecode-cache/--compact-manifest/--compress/'
+                '--verify/--jobs/--incremental/--no-dedup')
+        if options.compress_ratio is not None and (
+            not options.compress or not 0 < options.compress_ratio <= 1
+        ):
+            raise ValueError(
+                '--compress-ratio requires --compress and must be greater than 0 '
+                'and at most 1')
+        if options.compression_level is not None and (
+            options.format != 'zipapp' or not 0 <= options.compression_level <= 9
+        ):
+            raise ValueError(
+                '--compression-level requires --format zipapp and ranges from 0 to 9')
+        if options.keep and not options.tree_shake:
+            raise ValueError('--keep requires --tree-shake')
+        if options.incremental and options.output is None:
+            raise ValueError('--incremental requires --output')
+        if options.watch and options.output is None:
+            raise ValueError('--watch requires --output')
+
+        encoding_cache = None
+        if options.incremental:
+            assert options.output is not None
+            output = os.path.abspath(options.output).encode('utf8')
+            encoding_cache = EncodingCache(Toolbox.user_cache_dir(
+                'encodings', hashlib.sha256(output).hexdigest() + '.json'))
+
+        maker = BundleMaker(
             options.roots,
+            append_finder=options.append_finder,
             bundle_only=options.bundle_only,
+            bytecode_cache=options.bytecode_cache,
+            compact_manifest=options.compact_manifest,
+            compress_threshold=(
+                (options.compress_ratio or 0.8) if options.compress else None),
+            compression_level=options.compression_level,
+            deduplicate=not options.no_dedup,
+            encoding_cache=encoding_cache,
+            jobs=options.jobs,
+            keep=options.keep,
+            format=options.format,
             main=options.main,
             output=options.output,
+            precompile=options.precompile,
             repackage=options.repackage,
-        ).run()
+            tree_shake=options.tree_shake,
+            verbose=options.verbose,
+            verify=options.verify,
+        )
+        if options.watch:
+            maker.watch()
+        else:
+            maker.run()
     except Exception as x:
         if options.verbose:
             traceback.print_exception(x)
@@ -1840,11 +2511,30 @@ if __name__ == '__main__':
         print(f\x22Error: unable to load meta data ({x})\x22)
         sys.exit(1)
 
+    try:
+        recorded, actual = Toolbox.compute_digest(bundle.read_bytes())
+        if recorded == actual:
+            print(f'bundle digest {recorded} is valid')
+        else:
+            print(f'Error: bundle digest {recorded} differs from actual {actual}')
+    except ValueError:
+        print('bundle has no digest')
+
+    originals: 'dict[tuple[str, int, int], str]' = {}
+    alias_count = saved_bytes = 0
+
     for key, (kind, offset, length) in manifest.items():
         if length == 0:
             print(f'bundled file \x22{key}\x22 is empty')
             continue
 
+        original = originals.setdefault((kind, offset, length), key)
+        if original != key:
+            print(f'bundled file \x22{key}\x22 shares {length} bytes with \x22{original}\x22')
+            alias_count += 1
+            saved_bytes += length
+            continue
+
         try:
             data = Toolbox.load_from_bundle(bundle, kind, offset, length)
             print(f'bundled file \x22{key}\x22 has {len(data)} bytes')
@@ -1856,29 +2546,48 @@ if __name__ == '__main__':
             for line in raw_data.splitlines():
                 print(f'    {line!r}')
             print()
+
+    if alias_count > 0:
+        print(f'deduplication saved {saved_bytes} bytes for {alias_count} files')
 """,
 # ------------------------------------------------------------------------------
 "tsutsumu/maker.py":
-b"""import base64
-from contextlib import nullcontext
+b"""import ast
+import base64
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, nullcontext
 from enum import Enum
+import hashlib
+import importlib.util
+import json
 from keyword import iskeyword
-import os.path
+import marshal
+import os
 from pathlib import Path
+import shutil
 import sys
-from typing import NamedTuple, TYPE_CHECKING
+import time
+from typing import cast, NamedTuple, TYPE_CHECKING
+import zipfile
+import zlib
 
 if TYPE_CHECKING:
     from collections.abc import Iterable, Iterator, Sequence
+    from concurrent.futures import Executor
     from contextlib import AbstractContextManager
     from importlib.abc import Loader
     from importlib.machinery import ModuleSpec
-    from typing import Callable, Protocol
+    from threading import Event
+    from typing import BinaryIO, Callable, Protocol, TextIO, TypeAlias
 
     class Writable(Protocol):
         def write(self, data: 'bytes | bytearray') -> int:
             ...
 
+    # The lines for a bundled file, the layout of its content, and its kind,
+    # which differs from the file's kind if compressed
+    Encoding: TypeAlias = tuple[list[bytes], tuple[int, int, int], 'FileKind']
+
 from tsutsumu import __version__
 from tsutsumu.bundle import Toolbox
 
@@ -1933,6 +2642,16 @@ _BUNDLE_START = b'if False: {\\n'
 _BUNDLE_STOP = b'}\\n\\n'
 _EMPTY_LINE = b'\\n'
 
+# Lines are coalesced into chunks of this many bytes before writing them
+_CHUNK_SIZE = 256 * 1024
+
+# Compressed data is Base85-encoded this many bytes per line. Since it's a
+# multiple of 4, each line decodes independently, which enables streaming.
+_COMPRESSED_LINE_SIZE = 56
+
+# Bump whenever the format of encoding cache entries changes
+_ENCODING_CACHE_FORMAT = 4
+
 _MAIN = \x22\x22\x22\\
 if __name__ == \x22__main__\x22:
     import runpy
@@ -1941,7 +2660,7 @@ if __name__ == \x22__main__\x22:
     Toolbox.restrict_sys_path()
 
     # Install the bundle
-    bundle = Bundle.install(__file__, __version__, __manifest__)
+    bundle = Bundle.install(__file__, __version__, __manifest__{install_options})
 
     # This script does not exist. It never ran!
     {repackage}
@@ -1950,11 +2669,25 @@ if __name__ == \x22__main__\x22:
     runpy.run_module(\x22{main}\x22, run_name=\x22__main__\x22, alter_sys=True)
 \x22\x22\x22
 
+_ZIPAPP_MAIN = \x22\x22\x22\\
+# DO NOT EDIT! This module was automatically generated
+# by Tsutsumu <https://github.com/apparebit/tsutsumu>.
+import runpy
+
+# Run equivalent of \x22python -m {main}\x22
+runpy.run_module(\x22{main}\x22, run_name=\x22__main__\x22, alter_sys=True)
+\x22\x22\x22
+
+# Zip entries have fixed timestamps so that zipapps are reproducible
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
 # --------------------------------------------------------------------------------------
 
 class FileKind(Enum):
     BINARY = 'b'
+    CODE = 'c'
     TEXT = 't'
+    COMPRESSED = 'z'
     VALUE = 'v'
 
 
@@ -1965,6 +2698,156 @@ class BundledFile(NamedTuple):
     key: str
 
 
+class SourceStatus(NamedTuple):
+    \x22\x22\x22The size, modification time, and SHA-256 of the content that was encoded.\x22\x22\x22
+    size: int
+    mtime: int
+    sha256: str
+
+
+class EncodingCache:
+    \x22\x22\x22
+    A persistent cache of encoded files. Entries are keyed by bundle key, which
+    differs for a module's source and code object, and validated by local path,
+    size, and modification time or, failing that, content hash.
+    \x22\x22\x22
+
+    def __init__(self, path: 'None | str | Path' = None) -> None:
+        self._path = None if path is None else Path(path)
+        self._fingerprint = (
+            f'{__version__} {importlib.util.MAGIC_NUMBER.hex()} {_ENCODING_CACHE_FORMAT}')
+        self._entries: 'dict[str, dict[str, object]]' = {}
+        self._used: 'set[str]' = set()
+        self.hits = self.misses = 0
+
+        if self._path is not None and self._path.exists():
+            try:
+                with open(self._path, mode='rt', encoding='utf8') as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                return
+            if data.get('fingerprint') == self._fingerprint:
+                self._entries = data['entries']
+
+    def get(
+        self, file: 'BundledFile', compress: 'None | float' = None
+    ) -> 'None | Encoding':
+        entry = self._entries.get(file.key)
+        if (
+            entry is None
+            or entry['kind'] != file.kind.value
+            or entry['path'] != str(file.path)
+            or entry['compress'] != compress
+        ):
+            self.misses += 1
+            return None
+
+        status = file.path.stat()
+        if entry['size'] != status.st_size or entry['mtime'] != status.st_mtime_ns:
+            digest = hashlib.sha256(file.path.read_bytes()).hexdigest()
+            if entry['sha256'] != digest:
+                self.misses += 1
+                return None
+            entry['size'] = status.st_size
+            entry['mtime'] = status.st_mtime_ns
+
+        self.hits += 1
+        self._used.add(file.key)
+        chunk = cast(str, entry['chunk']).encode('latin1')
+        prefix, data, suffix = cast('list[int]', entry['layout'])
+        kind = FileKind(entry['stored'])
+        return ([chunk] if chunk else []), (prefix, data, suffix), kind
+
+    def put(
+        self,
+        file: 'BundledFile',
+        encoding: 'Encoding',
+        status: 'SourceStatus',
+        compress: 'None | float' = None,
+    ) -> None:
+        # The status describes the encoded content, not the file as is. Otherwise,
+        # a file modified while being encoded would be cached with stale content.
+        self._entries[file.key] = {
+            'kind': file.kind.value,
+            'stored': encoding[2].value,
+            'compress': compress,
+            'path': str(file.path),
+            'size': status.size,
+            'mtime': status.mtime,
+            'sha256': status.sha256,
+            'layout': list(encoding[1]),
+            'chunk': b''.join(encoding[0]).decode('latin1'),
+        }
+        self._used.add(file.key)
+
+    def save(self) -> None:
+        \x22\x22\x22Persist the entries used since the last save and forget all others.\x22\x22\x22
+        self._entries = {
+            key: entry for key, entry in self._entries.items() if key in self._used
+        }
+        self._used = set()
+        if self._path is None:
+            return
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self._path.with_name(f'.{self._path.name}.{os.getpid()}.tmp')
+        with open(temp_path, mode='wt', encoding='utf8') as file:
+            data = {'fingerprint': self._fingerprint, 'entries': self._entries}
+            json.dump(data, file)
+        os.replace(temp_path, self._path)
+
+
+class DigestWriter:
+    \x22\x22\x22A writable that also feeds everything written to a SHA-256 hash.\x22\x22\x22
+
+    def __init__(self, writable: 'Writable') -> None:
+        self._writable = writable
+        self.hash = hashlib.sha256()
+
+    def write(self, data: 'bytes | bytearray') -> int:
+        self.hash.update(data)
+        return self._writable.write(data)
+
+
+class CountingWriter:
+    \x22\x22\x22
+    A writable that counts the bytes written. Since it also reports that count
+    as its position, zipfile can write to outputs that do not support seeking.
+    \x22\x22\x22
+
+    def __init__(self, writable: 'Writable') -> None:
+        self._writable = writable
+        self.count = 0
+
+    def write(self, data: 'bytes | bytearray') -> int:
+        self.count += len(data)
+        return self._writable.write(data)
+
+    def tell(self) -> int:
+        return self.count
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class TextWriter:
+    \x22\x22\x22
+    A writable that decodes UTF-8 for a text stream without binary buffer, such
+    as doctest's replacement for stdout. Each write must end on a character
+    boundary, which holds for the whole lines written by write_chunked().
+    \x22\x22\x22
+
+    def __init__(self, stream: 'TextIO') -> None:
+        self._stream = stream
+
+    def write(self, data: 'bytes | bytearray') -> int:
+        self._stream.write(data.decode('utf8'))
+        return len(data)
+
+
 class BundleMaker:
     \x22\x22\x22
     Class to create Python bundles, i.e., Python scripts that contains the source
@@ -1975,20 +2858,50 @@ class BundleMaker:
         self,
         directories: 'Sequence[str | Path]',
         *,
+        append_finder: bool = False,
         bundle_only: bool = False,
+        bytecode_cache: bool = False,
+        compact_manifest: bool = False,
+        compress_threshold: 'None | float' = None,
+        compression_level: 'None | int' = None,
+        deduplicate: bool = True,
+        encoding_cache: 'None | EncodingCache' = None,
+        jobs: int = 1,
+        keep: 'Sequence[str]' = (),
         binary_extensions: 'tuple[str, ...]' = _BINARY_EXTENSIONS,
         binary_files: 'tuple[str, ...]' = _BINARY_FILES,
         text_extensions: 'tuple[str, ...]' = _TEXT_EXTENSIONS,
         text_files: 'tuple[str, ...]' = _TEXT_FILES,
+        format: str = 'text',
         main: 'None | str' = None,
         output: 'None | str | Path' = None,
+        precompile: bool = False,
         repackage: bool = False,
+        tree_shake: bool = False,
+        verbose: bool = False,
+        verify: bool = False,
     ) -> None:
         self._directories = directories
+        self._append_finder = append_finder
         self._bundle_only = bundle_only
+        self._bytecode_cache = bytecode_cache
+        self._compact_manifest = compact_manifest
+        self._compress_threshold = compress_threshold
+        self._compression_level = compression_level
+        self._deduplicate = deduplicate
+        self._encoding_cache = encoding_cache
+        self._jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self._keep = tuple(keep)
+        if format not in ('text', 'zipapp'):
+            raise ValueError(f'unknown bundle format \x22{format}\x22')
+        self._format = format
         self._main = main
         self._output = output
+        self._precompile = precompile
         self._repackage = repackage
+        self._tree_shake = tree_shake
+        self._verbose = verbose
+        self._verify = verify
 
         self._binary_extensions = set(binary_extensions)
         self._binary_files = set(binary_files)
@@ -1996,6 +2909,11 @@ class BundleMaker:
         self._text_files = set(text_files)
 
         self._ranges: 'list[tuple[FileKind, str, int, int, int]]' = []
+        self._aliases: 'dict[str, str]' = {}
+        self._digests: 'dict[str, str]' = {}
+        self._originals: 'dict[tuple[FileKind, bytes], str]' = {}
+        self._saved_bytes = 0
+        self._dropped: 'None | list[str]' = None
         self._repr: 'None | str' = None
 
     def __repr__(self) -> str:
@@ -2007,54 +2925,212 @@ class BundleMaker:
     # ----------------------------------------------------------------------------------
 
     def run(self) -> None:
+        self._ranges = []
+        self._aliases = {}
+        self._digests = {}
+        self._originals = {}
+        self._saved_bytes = 0
+        if self._encoding_cache is not None:
+            self._encoding_cache.hits = self._encoding_cache.misses = 0
         files = sorted(self.list_files(), key=lambda f: f.key)
         main = None if self._bundle_only else self.select_main(files)
+        if self._tree_shake:
+            assert main is not None
+            files, dropped = self.shake_tree(files, main)
+            self.report_dropped(dropped)
+        if self._precompile and self._format == 'text':
+            files = sorted([*files, *self.list_precompiled(files)], key=lambda f: f.key)
 
         # context's type annotation is based on the observation that open()'s
         # result is a BufferedWriter is an AbstractContextManager[BufferedWriter].
         # The nullcontext prevents closing of stdout's binary stream when done.
-        context: 'AbstractContextManager[Writable]'
+        # To never expose a partially written bundle, it goes to a temporary file
+        # first, which replaces the output only after all writes succeeded. The
+        # output path is resolved, so that the target of a symlink is replaced.
+        context: 'AbstractContextManager[BinaryIO]'
         if self._output is None:
             context = nullcontext(sys.stdout.buffer)
+            temp_path = None
         else:
-            context = open(self._output, mode='wb')
+            output = Path(os.path.realpath(self._output))
+            temp_path = output.with_name(f'.{output.name}.{os.getpid()}.tmp')
+            context = open(temp_path, mode='wb')
+
+        start = time.perf_counter()
+        byte_count = 0
+        try:
+            with context as script:
+                if self._format == 'zipapp':
+                    byte_count += self.emit_zipapp(files, main, script)
+                else:
+                    writer = DigestWriter(script)
+                    byte_count += BundleMaker.write_chunked(
+                        _BANNER.splitlines(keepends=True), writer)
+                    byte_count += BundleMaker.write_chunked(
+                        self.emit_bundle(files), writer)
+                    byte_count += BundleMaker.write_chunked(
+                        self.emit_meta_data(), writer)
+
+                    # The bundle digest covers all bytes but its own line. Since
+                    # the runtime and compact manifest come after that line, they
+                    # are buffered and hashed before writing the digest.
+                    tail: 'list[bytes]' = []
+                    if not self._bundle_only:
+                        assert main is not None
+                        tail.extend(self.emit_runtime(main))
+                    if self._compact_manifest:
+                        tail.extend(self.emit_compact_manifest())
+                    for line in tail:
+                        writer.hash.update(line)
+                    byte_count += BundleMaker.write_chunked(
+                        self.emit_digest(writer.hash.hexdigest()), script)
+                    byte_count += BundleMaker.write_chunked(tail, script)
+            if temp_path is not None:
+                # Preserve the mode of an existing bundle, e.g., its executable bit.
+                if output.exists():
+                    shutil.copymode(output, temp_path)
+                os.replace(temp_path, output)
+            if self._encoding_cache is not None:
+                self._encoding_cache.save()
+        except BaseException:
+            if temp_path is not None and temp_path.exists():
+                temp_path.unlink()
+            raise
+
+        if self._verbose:
+            duration = time.perf_counter() - start
+            throughput = byte_count / duration / 1_000_000 if duration > 0 else 0
+            destination = 'stdout' if self._output is None else f'\x22{self._output}\x22'
+            print(
+                f'Wrote {byte_count:,} bytes for {len(files):,} files to {destination} '
+                f'in {duration:.3f} s ({throughput:.1f} MB/s)',
+                file=sys.stderr,
+            )
+            if self._encoding_cache is not None:
+                print(
+                    f'Reused {self._encoding_cache.hits:,} cached files, '
+                    f'encoded {self._encoding_cache.misses:,} files',
+                    file=sys.stderr,
+                )
+            if self._aliases:
+                print(
+                    f'Deduplicated {len(self._aliases):,} files, '
+                    f'saving {self._saved_bytes:,} bytes',
+                    file=sys.stderr,
+                )
+
+    def watch(
+        self,
+        interval: float = 0.5,
+        settle: float = 0.2,
+        stop: 'None | Event' = None,
+    ) -> None:
+        \x22\x22\x22
+        Rebuild the bundle whenever the files to be bundled change. This method
+        polls the file system, since the standard library does not support
+        inotify or equivalents. It runs until interrupted or the stop event is
+        set.
+        \x22\x22\x22
+        if self._output is None:
+            raise ValueError('unable to watch without output file')
+        if self._encoding_cache is None:
+            self._encoding_cache = EncodingCache()
 
-        with context as script:
-            BundleMaker.writeall(_BANNER.splitlines(keepends=True), script)
-            BundleMaker.writeall(self.emit_bundle(files), script)
-            BundleMaker.writeall(self.emit_meta_data(), script)
-            if not self._bundle_only:
-                assert main is not None
-                BundleMaker.writeall(self.emit_runtime(main), script)
+        def sleep(duration: float) -> bool:
+            if stop is None:
+                time.sleep(duration)
+                return True
+            return not stop.wait(duration)
+
+        snapshot: 'None | dict[str, tuple[int, int]]' = None
+        try:
+            while True:
+                current = self.take_snapshot()
+                if current == snapshot:
+                    if not sleep(interval):
+                        return
+                    continue
+
+                # Debounce bursts of changes by waiting until files are unchanged.
+                while snapshot is not None:
+                    if not sleep(settle):
+                        return
+                    latest = self.take_snapshot()
+                    if latest == current:
+                        break
+                    current = latest
+
+                start = time.perf_counter()
+                try:
+                    self.run()
+                except Exception as x:
+                    print(f'Error: {x}', file=sys.stderr)
+                else:
+                    duration = (time.perf_counter() - start) * 1_000
+                    cache = self._encoding_cache
+                    print(
+                        f'Rebuilt \x22{self._output}\x22 in {duration:.1f} ms '
+                        f'(reused {cache.hits:,}, encoded {cache.misses:,} files)',
+                        file=sys.stderr,
+                    )
+                snapshot = current
+        except KeyboardInterrupt:
+            pass
+
+    def take_snapshot(self) -> 'dict[str, tuple[int, int]]':
+        snapshot = {}
+        for file in self.list_files():
+            try:
+                status = file.path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[file.key] = status.st_mtime_ns, status.st_size
+        return snapshot
 
     # ----------------------------------------------------------------------------------
 
     def list_files(self) -> 'Iterator[BundledFile]':
         # Since names of directories (and stems of Python files) are module
-        # names, traversal MUST NOT resolve symbolic links!
+        # names, traversal MUST NOT resolve symbolic links! Directory entries
+        # cache their type, which saves a stat() call per file. The output is
+        # skipped, since bundling a bundle's previous version is never intended
+        # and watching it would rebuild forever. Temporary outputs start with a
+        # dot and hence are no module names.
+        outputs = set()
+        if self._output is not None:
+            outputs.add(os.path.abspath(self._output))
+            outputs.add(os.path.realpath(self._output))
         for directory in self._directories:
-            root = Path(directory).absolute()
-            pending = list(root.iterdir())
+            root = os.path.abspath(directory)
+            pending = [(root, os.path.basename(root) + '/')]
             while pending:
-                item = pending.pop().absolute()
-                if item.is_file() and BundleMaker.is_module_name(item.stem):
-                    kind = self.classify_kind(item)
-                    if kind is None:
-                        continue
-                    key = str(item.relative_to(root.parent)).replace('\\\\', '/')
-                    if not self.is_excluded_key(key):
-                        yield BundledFile(kind, item, key)
-                elif item.is_dir() and BundleMaker.is_module_name(item.name):
-                    pending.extend(item.iterdir())
+                path, prefix = pending.pop()
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        name = entry.name
+                        if entry.is_file():
+                            stem, suffix = os.path.splitext(name)
+                            if not BundleMaker.is_module_name(stem):
+                                continue
+                            kind = self.classify_kind(name, suffix)
+                            if kind is None:
+                                continue
+                            key = prefix + name
+                            if entry.path in outputs:
+                                continue
+                            if not self.is_excluded_key(key):
+                                yield BundledFile(kind, Path(entry.path), key)
+                        elif entry.is_dir() and BundleMaker.is_module_name(name):
+                            pending.append((entry.path, prefix + name + '/'))
 
     @staticmethod
     def is_module_name(name: str) -> bool:
         return name.isidentifier() and not iskeyword(name)
 
-    def classify_kind(self, path: Path) -> 'None | FileKind':
-        if path.suffix in self._binary_extensions or path.name in self._binary_files:
+    def classify_kind(self, name: str, suffix: str) -> 'None | FileKind':
+        if suffix in self._binary_extensions or name in self._binary_files:
             return FileKind.BINARY
-        elif path.suffix in self._text_extensions or path.name in self._text_files:
+        elif suffix in self._text_extensions or name in self._text_files:
             return FileKind.TEXT
         else:
             return None
@@ -2065,6 +3141,19 @@ class BundleMaker:
             and key in ('tsutsumu/__init__.py', 'tsutsumu/bundle.py')
         )
 
+    def list_precompiled(self, files: 'list[BundledFile]') -> 'Iterator[BundledFile]':
+        # Code objects are only valid for the running interpreter. Their keys
+        # include the cache tag, just like the contents of __pycache__.
+        tag: 'None | str' = sys.implementation.cache_tag
+        if tag is None:
+            raise ValueError(f'{sys.implementation.name} does not support bytecode')
+
+        for file in files:
+            if file.kind is FileKind.TEXT and file.key.endswith('.py'):
+                head, _, tail = file.key.rpartition('/')
+                key = f'{head}/__pycache__/{tail[:-3]}.{tag}.pyc'
+                yield BundledFile(FileKind.CODE, file.path, key)
+
     # ----------------------------------------------------------------------------------
 
     def select_main(self, files: 'list[BundledFile]') -> str:
@@ -2090,61 +3179,335 @@ class BundleMaker:
 
     # ----------------------------------------------------------------------------------
 
+    def shake_tree(
+        self, files: 'list[BundledFile]', main: str
+    ) -> 'tuple[list[BundledFile], list[BundledFile]]':
+        \x22\x22\x22
+        Split the files into those reachable from the main module and those
+        that are not. Reachability is determined by statically parsing import
+        statements, including those nested inside functions and conditionals,
+        and then computing the transitive closure. Importing a module also
+        imports its parent packages. Modules named by the keep option, which
+        serves as allowlist for dynamic imports, are reachable along with their
+        submodules. Finally, resources are reachable if the closest enclosing
+        directory with Python modules contains a reachable module.
+        \x22\x22\x22
+        modules: 'dict[str, BundledFile]' = {}
+        for file in files:
+            if file.key.endswith('.py'):
+                modules[BundleMaker.to_module_name(file.key)] = file
+
+        roots = [main]
+        if f'{main}.__main__' in modules:
+            roots.append(f'{main}.__main__')
+        for name in self._keep:
+            roots.extend(
+                module for module in modules
+                if module == name or module.startswith(name + '.')
+            )
+
+        reachable: 'set[str]' = set()
+        pending = list(roots)
+        while pending:
+            name = pending.pop()
+            for module in BundleMaker.with_parents(name):
+                if module in reachable or module not in modules:
+                    continue
+                reachable.add(module)
+                file = modules[module]
+                pending.extend(self.list_imports(
+                    module, file.key.endswith('/__init__.py'), file.path))
+
+        reachable_directories = {
+            modules[module].key.rpartition('/')[0] for module in reachable
+        }
+        module_directories = {
+            file.key.rpartition('/')[0] for file in modules.values()
+        }
+
+        kept: 'list[BundledFile]' = []
+        dropped: 'list[BundledFile]' = []
+        for file in files:
+            if file.key.endswith('.py'):
+                is_reachable = BundleMaker.to_module_name(file.key) in reachable
+            else:
+                directory = file.key.rpartition('/')[0]
+                while directory not in module_directories and '/' in directory:
+                    directory = directory.rpartition('/')[0]
+                is_reachable = directory in reachable_directories
+            (kept if is_reachable else dropped).append(file)
+        return kept, dropped
+
+    @staticmethod
+    def to_module_name(key: str) -> str:
+        name = key[:-3].replace('/', '.')
+        return name[:-9] if name.endswith('.__init__') else name
+
+    @staticmethod
+    def with_parents(name: str) -> 'Iterator[str]':
+        index = name.find('.')
+        while index != -1:
+            yield name[:index]
+            index = name.find('.', index + 1)
+        yield name
+
+    @staticmethod
+    def list_imports(name: str, is_package: bool, path: Path) -> 'Iterator[str]':
+        try:
+            tree = ast.parse(path.read_bytes(), filename=str(path))
+        except SyntaxError as x:
+            raise ValueError(f'unable to parse module {name} for tree shaking') from x
+
+        package = name if is_package else name.rpartition('.')[0]
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    yield alias.name
+            elif isinstance(node, ast.ImportFrom):
+                if node.level == 0:
+                    base = node.module or ''
+                else:
+                    # Resolve relative imports just like importlib.util.resolve_name()
+                    parts = package.rsplit('.', node.level - 1)
+                    if len(parts) < node.level:
+                        continue
+                    base = parts[0]
+                    if node.module:
+                        base = f'{base}.{node.module}' if base else node.module
+                if not base:
+                    continue
+                yield base
+                for alias in node.names:
+                    if alias.name != '*':
+                        # The name may be a submodule or just an attribute.
+                        yield f'{base}.{alias.name}'
+
+    def report_dropped(self, dropped: 'list[BundledFile]') -> None:
+        # When watching, only report changes to the dropped files.
+        keys = [file.key for file in dropped]
+        if keys == self._dropped or (self._dropped is None and not keys):
+            self._dropped = keys
+            return
+        self._dropped = keys
+        print(
+            f'Tree shaking dropped {len(dropped):,} files'
+            f'{\x22:\x22 if self._verbose else \x22\x22}',
+            file=sys.stderr,
+        )
+        if self._verbose:
+            for file in dropped:
+                print(f'    {file.key}', file=sys.stderr)
+
+    # ----------------------------------------------------------------------------------
+
     def emit_bundle(
         self,
         files: 'list[BundledFile]',
     ) -> 'Iterator[bytes]':
         yield from _BUNDLE_START.splitlines(keepends=True)
-        for file in files:
-            yield from self.emit_file(file.kind, file.path, file.key)
+        if self._jobs == 1 and self._encoding_cache is None:
+            for file in files:
+                yield from self.emit_file(
+                    file.kind, file.path, file.key, self.get_compress_threshold(file))
+        else:
+            for file, encoding in zip(files, self.encode_files(files)):
+                yield from self.emit_encoding(file.key, encoding)
         yield from _BUNDLE_STOP.splitlines(keepends=True)
 
-    def emit_file(self, kind: 'FileKind', path: Path, key: str) -> 'Iterator[bytes]':
+    def encode_files(self, files: 'list[BundledFile]') -> 'Iterator[Encoding]':
+        \x22\x22\x22
+        Encode the files, yielding their encodings in order. Files that are not
+        in the encoding cache are encoded by the workers, with their encodings
+        yielded as they become available, so that the bundle keeps streaming.
+        \x22\x22\x22
+        cache = self._encoding_cache
+        thresholds = [self.get_compress_threshold(file) for file in files]
+        if cache is None:
+            cached: 'list[None | Encoding]' = [None] * len(files)
+        else:
+            cached = [
+                cache.get(file, threshold) for file, threshold in zip(files, thresholds)
+            ]
+
+        pending = [
+            (file, threshold)
+            for file, threshold, encoding in zip(files, thresholds, cached)
+            if encoding is None
+        ]
+        arguments = (
+            [file.kind for file, _ in pending],
+            [file.path for file, _ in pending],
+            [file.key for file, _ in pending],
+            [threshold for _, threshold in pending],
+        )
+
+        encode = BundleMaker.encode_file_with_status
+        with ExitStack() as stack:
+            if self._jobs == 1 or len(pending) <= 1:
+                fresh = map(encode, *arguments)
+            else:
+                executor = stack.enter_context(self.create_executor())
+                fresh = executor.map(encode, *arguments, chunksize=16)
+
+            # Merge fresh encodings into the ones from the cache, maintaining order.
+            for file, threshold, encoding in zip(files, thresholds, cached):
+                if encoding is None:
+                    encoding, status = next(fresh)
+                    if cache is not None:
+                        cache.put(file, encoding, status, threshold)
+                yield encoding
+
+    def create_executor(self) -> 'Executor':
+        # Worker processes must be able to import this module, which isn't
+        # necessarily the case when running from a bundle.
+        path = globals().get('__file__')
+        if isinstance(path, str) and Path(path).is_file():
+            return ProcessPoolExecutor(self._jobs)
+        return ThreadPoolExecutor(self._jobs)
+
+    def get_compress_threshold(self, file: 'BundledFile') -> 'None | float':
+        # Only resources are candidates for compression, so that bundled code
+        # remains readable.
+        if (
+            self._compress_threshold is None
+            or file.kind not in (FileKind.BINARY, FileKind.TEXT)
+            or file.key.endswith('.py')
+        ):
+            return None
+        return self._compress_threshold
+
+    def emit_file(
+        self, kind: 'FileKind', path: Path, key: str, compress: 'None | float' = None
+    ) -> 'Iterator[bytes]':
+        yield from self.emit_encoding(
+            key, BundleMaker.encode_file(kind, path, key, compress))
+
+    def emit_encoding(self, key: str, encoding: 'Encoding') -> 'Iterator[bytes]':
+        lines, (prefix, data, suffix), kind = encoding
+        digest = hashlib.sha256(b''.join(lines)[prefix:prefix + data])
+        self._digests[key] = digest.hexdigest()
+        if self._deduplicate and data > 0:
+            # Files with the same stored kind and payload share the same range.
+            # Instead of the payload, the alias has a comment naming the original.
+            original = self._originals.setdefault((kind, digest.digest()), key)
+            if original != key:
+                comment = f'# \x22{key}\x22 has the same content as \x22{original}\x22\\n'
+                alias_lines = [Toolbox.PLAIN_RULE, comment.encode('utf8')]
+                self._aliases[key] = original
+                self._saved_bytes += sum(map(len, lines)) - sum(map(len, alias_lines))
+                self.record_range(kind, key, 0, 0, sum(map(len, alias_lines)))
+                yield from alias_lines
+                return
+
+        self.record_range(kind, key, prefix, data, suffix)
+        yield from lines
+
+    @staticmethod
+    def encode_file(
+        kind: 'FileKind', path: Path, key: str, compress: 'None | float' = None
+    ) -> 'Encoding':
+        return BundleMaker.encode_content(kind, path.read_bytes(), key, compress)
+
+    @staticmethod
+    def encode_file_with_status(
+        kind: 'FileKind', path: Path, key: str, compress: 'None | float' = None
+    ) -> 'tuple[Encoding, SourceStatus]':
+        # Stat before reading, so that a modification while reading results in a
+        # newer modification time and hence revalidation by content hash.
+        mtime = path.stat().st_mtime_ns
+        content = path.read_bytes()
+        status = SourceStatus(len(content), mtime, hashlib.sha256(content).hexdigest())
+        return BundleMaker.encode_content(kind, content, key, compress), status
+
+    @staticmethod
+    def encode_content(
+        kind: 'FileKind', content: bytes, key: str, compress: 'None | float' = None
+    ) -> 'Encoding':
+        \x22\x22\x22
+        Encode the file content as lines of the bundle and determine their
+        layout. If compress is a ratio, the content is stored zlib-compressed
+        instead when that shrinks the encoded lines to at most that fraction of
+        the uncompressed ones. The returned kind reflects that choice.
+        \x22\x22\x22
         if kind is FileKind.TEXT:
             lines = [
                 line                      # Split bytestring into lines,
                 .decode('iso8859-1')      # convert each byte 1:1 to code point,
                 .encode('unicode_escape') # convert to bytes, escaping non-ASCII values
                 .replace(b'\x22', b'\\\\x22')  # and escape double quotes.
-                for line in path.read_bytes().splitlines()
+                for line in content.splitlines()
             ]
+        elif kind is FileKind.CODE:
+            data = BundleMaker.compile_code(content, key)
+            lines = base64.a85encode(data, wrapcol=76).splitlines()
         else:
-            lines = base64.a85encode(path.read_bytes(), wrapcol=76).splitlines()
+            lines = base64.a85encode(content, wrapcol=76).splitlines()
 
         line_count = len(lines)
         byte_length = sum(len(line) for line in lines) + line_count
 
         if line_count == 0:
             assert byte_length == 0
-            self.record_range(kind, key, 0, 0, 0)
-            return
+            return [], (0, 0, 0), kind
+
+        if compress is not None:
+            if kind is FileKind.TEXT:
+                content = BundleMaker.normalize_newlines(content)
+            compressed = zlib.compress(content, 9)
+            compressed_lines = [
+                base64.a85encode(compressed[index:index + _COMPRESSED_LINE_SIZE])
+                for index in range(0, len(compressed), _COMPRESSED_LINE_SIZE)
+            ]
+            compressed_length = (
+                sum(len(line) for line in compressed_lines) + len(compressed_lines))
+            if compressed_length <= compress * byte_length:
+                kind = FileKind.COMPRESSED
+                lines = compressed_lines
+                line_count = len(lines)
+                byte_length = compressed_length
 
         prefix = b'\x22' + key.encode('utf8') + b'\x22:'
         offset = len(Toolbox.PLAIN_RULE) + len(prefix) + 1
 
-        yield Toolbox.PLAIN_RULE
+        output = [Toolbox.PLAIN_RULE]
 
         if line_count == 1:
             if kind is FileKind.TEXT:
-                self.record_range(kind, key, offset, byte_length + 4, 2)
+                layout = offset, byte_length + 4, 2
             else:
-                self.record_range(kind, key, offset + 2, byte_length + 1, 3)
+                # The range excludes the escaped newline, whose backslash and n
+                # would otherwise be decoded as Base85 characters.
+                layout = offset + 2, byte_length - 1, 5
 
-            yield prefix + b' b\x22' + lines[0] + b'\\\\n\x22,\\n'
+            output.append(prefix + b' b\x22' + lines[0] + b'\\\\n\x22,\\n')
         else:
             if kind is FileKind.TEXT:
-                self.record_range(kind, key, offset, byte_length + 7, 2)
+                layout = offset, byte_length + 7, 2
                 first_line = b'b\x22\x22\x22' + lines[0]
             else:
-                self.record_range(kind, key, offset + 4, byte_length + 1, 5)
+                layout = offset + 4, byte_length + 1, 5
                 prefix += b' b\x22\x22\x22'
                 first_line = lines[0]
 
-            yield prefix + b'\\n'
-            yield first_line + b'\\n'
+            output.append(prefix + b'\\n')
+            output.append(first_line + b'\\n')
             for line in lines[1:]:
-                yield line + b'\\n'
-            yield b'\x22\x22\x22,\\n'
+                output.append(line + b'\\n')
+            output.append(b'\x22\x22\x22,\\n')
+
+        return output, layout, kind
+
+    @staticmethod
+    def normalize_newlines(content: bytes) -> bytes:
+        # Same as decoding the textual encoding, which writes lines with \\n.
+        return b''.join(line + b'\\n' for line in content.splitlines())
+
+    @staticmethod
+    def compile_code(source: bytes, key: str) -> bytes:
+        # Bundle.get_code() replaces the key with the runtime path again.
+        filename = key.replace('/__pycache__/', '/').rsplit('.', 2)[0] + '.py'
+        code = compile(source, filename, 'exec', dont_inherit=True)
+        return importlib.util.MAGIC_NUMBER + marshal.dumps(code)
 
     def record_range(
         self,
@@ -2158,11 +3521,79 @@ class BundleMaker:
 
     # ----------------------------------------------------------------------------------
 
+    def emit_zipapp(
+        self, files: 'list[BundledFile]', main: 'None | str', output: 'BinaryIO'
+    ) -> int:
+        \x22\x22\x22
+        Write a zipapp with the given files and a generated __main__ module that
+        runs the main module to the output and return the number of bytes
+        written. The archive is deflate-compressed. If precompiling, it also
+        includes .pyc files next to the Python sources, which is where zipimport
+        looks for them.
+        \x22\x22\x22
+        writable: 'BinaryIO | CountingWriter'
+        if output.seekable():
+            writable = output
+            start = output.tell()
+        else:
+            writable = CountingWriter(output)
+            start = 0
+
+        if main is not None:
+            writable.write(b'#!/usr/bin/env python3\\n')
+
+        with zipfile.ZipFile(writable, mode='w') as archive:
+            def add(key: str, data: bytes) -> None:
+                info = zipfile.ZipInfo(key, date_time=_ZIP_DATE_TIME)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.create_system = 3
+                info.external_attr = 0o644 << 16
+                archive.writestr(info, data, compresslevel=self._compression_level)
+
+            # zipimport reports a module's path as the archive's absolute path
+            # joined with the module's key. Compiled code uses the same path.
+            archive_path = (
+                None if self._output is None else os.path.abspath(self._output))
+
+            def add_source(key: str, data: bytes) -> None:
+                add(key, data)
+                if self._precompile and key.endswith('.py'):
+                    path = key if archive_path is None else os.path.join(
+                        archive_path, *key.split('/'))
+                    add(key[:-3] + '.pyc', BundleMaker.compile_pyc(data, path))
+
+            if main is not None:
+                add_source('__main__.py', _ZIPAPP_MAIN.format(main=main).encode('utf8'))
+            for file in files:
+                data = file.path.read_bytes()
+                if file.kind is FileKind.TEXT:
+                    data = BundleMaker.normalize_newlines(data)
+                add_source(file.key, data)
+
+        return writable.tell() - start
+
+    @staticmethod
+    def compile_pyc(source: bytes, path: str) -> bytes:
+        # Unchecked hash-based .pyc files don't depend on timestamps, which keeps
+        # the zipapp reproducible, and zipimport never reads the source again.
+        code = compile(source, path, 'exec', dont_inherit=True)
+        return b''.join([
+            importlib.util.MAGIC_NUMBER,
+            (0b01).to_bytes(4, 'little'),
+            importlib.util.source_hash(source),
+            marshal.dumps(code),
+        ])
+
+    # ----------------------------------------------------------------------------------
+
     def emit_meta_data(self) -> 'Iterator[bytes]':
         yield Toolbox.HEAVY_RULE
         yield from self.emit_version()
         yield _EMPTY_LINE
         yield from self.emit_manifest()
+        yield _EMPTY_LINE
+        yield from self.emit_digests()
+        yield _EMPTY_LINE
 
     def emit_version(self) -> 'Iterator[bytes]':
         yield f\x22__version__ = '{__version__}'\\n\x22.encode('ascii')
@@ -2171,8 +3602,14 @@ class BundleMaker:
         self
     ) -> 'Iterator[tuple[str, tuple[FileKind, int, int]]]':
         offset = len(_BANNER) + len(_BUNDLE_START)
+        locations: 'dict[str, tuple[int, int]]' = {}
         for kind, key, prefix, data, suffix in self._ranges:
-            yield key, ((kind, 0, 0) if data == 0 else (kind, offset + prefix, data))
+            if key in self._aliases:
+                location = locations[self._aliases[key]]
+            else:
+                location = (0, 0) if data == 0 else (offset + prefix, data)
+                locations[key] = location
+            yield key, (kind, *location)
             offset += prefix + data + suffix
 
     def emit_manifest(self) -> 'Iterator[bytes]':
@@ -2182,6 +3619,31 @@ class BundleMaker:
             yield entry.encode('utf8')
         yield b'}\\n'
 
+    def emit_digests(self) -> 'Iterator[bytes]':
+        # SHA-256 of each entry's range in the bundle, i.e., its stored bytes
+        yield b'__digests__ = {\\n'
+        for _, key, *_ in self._ranges:
+            yield f'    \x22{key}\x22: \x22{self._digests[key]}\x22,\\n'.encode('utf8')
+        yield b'}\\n'
+
+    def emit_digest(self, digest: str) -> 'Iterator[bytes]':
+        yield Toolbox.DIGEST_MARK + f'{digest}\x22\\n'.encode('ascii')
+
+    def emit_compact_manifest(self) -> 'Iterator[bytes]':
+        manifest = {
+            key: (kind.value, offset, length)
+            for key, (kind, offset, length) in self.list_manifest_entries()
+        }
+        data = marshal.dumps((__version__, manifest), 4)
+        encoded = base64.a85encode(data, wrapcol=76).splitlines()
+        lines = [b'# ' + line + b'\\n' for line in encoded]
+
+        yield _EMPTY_LINE
+        yield Toolbox.PLAIN_RULE
+        yield from lines
+        length = sum(len(line) for line in lines)
+        yield Toolbox.MANIFEST_MARK + f'{length:010d}\\n'.encode('ascii')
+
     # ----------------------------------------------------------------------------------
 
     def emit_runtime(
@@ -2200,7 +3662,16 @@ class BundleMaker:
         repackage = 'bundle.repackage()\\n    ' if self._repackage else ''
         repackage += \x22del sys.modules['__main__']\x22
 
-        main_block = _MAIN.format(main=main, repackage=repackage)
+        install_options = ''
+        if self._append_finder:
+            install_options += ', append=True'
+        if self._bytecode_cache:
+            install_options += ', cache_dir=Toolbox.user_cache_dir(\x22bytecode\x22)'
+        if self._verify:
+            install_options += ', digests=__digests__, verify=True'
+
+        main_block = _MAIN.format(
+            main=main, install_options=install_options, repackage=repackage)
         yield from main_block.encode('utf8').splitlines(keepends=True)
 
     def emit_tsutsumu_bundle(self) -> 'Iterator[bytes]':
@@ -2238,11 +3709,27 @@ class BundleMaker:
         writable: 'None | Writable' = None,
     ) -> None:
         if writable is None:
-            for line in lines:
-                print(line.decode('utf8'), end='')
-        else:
-            for line in lines:
-                writable.write(line)
+            # Flush pending text first, so that it precedes the lines.
+            sys.stdout.flush()
+            buffer = getattr(sys.stdout, 'buffer', None)
+            writable = TextWriter(sys.stdout) if buffer is None else buffer
+        BundleMaker.write_chunked(lines, writable)
+
+    @staticmethod
+    def write_chunked(lines: 'Iterable[bytes]', writable: 'Writable') -> int:
+        \x22\x22\x22Write the lines in few large chunks and return their total size.\x22\x22\x22
+        byte_count = 0
+        chunk = bytearray()
+        for line in lines:
+            chunk += line
+            if len(chunk) >= _CHUNK_SIZE:
+                writable.write(chunk)
+                byte_count += len(chunk)
+                chunk.clear()
+        if chunk:
+            writable.write(chunk)
+            byte_count += len(chunk)
+        return byte_count
 """,
 }
 
@@ -2253,31 +3740,61 @@ __version__ = '0.2.0'
 __manifest__ = {
     "cargo/__init__.py": ("t", 0, 0),
     "cargo/distinfo.py": ("t", 306, 11_371),
-    "cargo/index.py": ("t", 11_778, 12_201),
-    "cargo/marker.py": ("t", 24_081, 15_169),
-    "cargo/name.py": ("t", 39_350, 814),
+    "cargo/httpcache.py": ("t", 11_782, 7_055),
+    "cargo/index.py": ("t", 18_938, 26_339),
+    "cargo/marker.py": ("t", 45_379, 15_279),
+    "cargo/name.py": ("t", 60_758, 814),
     "cargo/py.typed": ("t", 0, 0),
-    "cargo/requirement.py": ("t", 40_271, 1_948),
-    "cargo/rules.txt": ("t", 42_321, 843),
-    "cargo/version.py": ("t", 43_267, 17_866),
-    "tsutsumu/__main__.py": ("t", 61_240, 4_920),
-    "tsutsumu/debug.py": ("t", 66_264, 1_229),
-    "tsutsumu/maker.py": ("t", 67_597, 13_439),
+    "cargo/requirement.py": ("t", 61_679, 1_948),
+    "cargo/version.py": ("t", 63_730, 17_988),
+    "tsutsumu/__main__.py": ("t", 81_825, 10_938),
+    "tsutsumu/debug.py": ("t", 92_867, 2_028),
+    "tsutsumu/maker.py": ("t", 94_999, 46_463),
     "tsutsumu/py.typed": ("t", 0, 0),
 }
 
+__digests__ = {
+    "cargo/__init__.py": "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855",
+    "cargo/distinfo.py": "6d2c653e18524a1bb5e798a11115331f859422e8c3aecaf4c0aaf599eee2b177",
+    "cargo/httpcache.py": "591157904996d9382ba341a4580d965568b2e2ae51c3023d487eb68be6f73d05",
+    "cargo/index.py": "ffdf9f80ac6617afdfeb9c0182f38b9c78aece5e2494fdaa849de69a0aa618b1",
+    "cargo/marker.py": "6a5575d052bc72519a1c14734506cfbf3916194ce5ee498b0ecd27b1977e43b1",
+    "cargo/name.py": "59840d4e967ed959ec6a4e4f6848146234109fc3c2340984dafcbb2ff50f815c",
+    "cargo/py.typed": "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855",
+    "cargo/requirement.py": "981fd97f01dd2e6482275a52ab7ca8a90b1fe73150127fa4f71bd25513ecef80",
+    "cargo/version.py": "a25ad4eaaff8392d72dfcf0dd50e30b95a6b98add18077b1ea8481688b74d1e9",
+    "tsutsumu/__main__.py": "02f8695fda41d11149b0c04d32f93e92b564b0512dcc5a09b2dacc5a1df7bb15",
+    "tsutsumu/debug.py": "bb6c607803c13932294e2cda53e428eccc9c2b28a4a6e8a819f06ad247dee9b6",
+    "tsutsumu/maker.py": "436127f2cb3b8e5fa8f59dca42e3a4fccafb848e42181505288bf538f24cbd2b",
+    "tsutsumu/py.typed": "e3b0c44298fc1c149afbf4c8996fb92427ae41e4649b934ca495991b7852b855",
+}
+
+__digest__ = "0520cb632ee9078559073b0bf3dd5ecef49c8b43142ddbd87429476e0fc7b476"
+
 # ==============================================================================
 
+import _imp
 import base64
+import codecs
+from collections import OrderedDict
+import hashlib
 from importlib.abc import Loader
 from importlib.machinery import ModuleSpec
 import importlib.util
+import io
+import marshal
 import os
 import sys
+import threading
+import time
 from typing import cast, TYPE_CHECKING
+import zlib
 
 if TYPE_CHECKING:
-    from collections.abc import Sequence
+    from collections.abc import Iterator, Sequence
+    from io import BufferedReader
+    from typing import BinaryIO
+    from mmap import mmap
     from pathlib import Path
     from types import CodeType, ModuleType
     from typing import TypeAlias
@@ -2288,6 +3805,14 @@ if TYPE_CHECKING:
 class Toolbox:
     HEAVY_RULE = b"# " + b"=" * 78 + b"\n\n"
     PLAIN_RULE = b"# " + b"-" * 78 + b"\n"
+    META_DATA_MARK = HEAVY_RULE + b"__version__ = "
+    MANIFEST_MARK = b"# __manifest__ "
+    MANIFEST_TRAILER_LENGTH = len(MANIFEST_MARK) + 11
+    DIGEST_MARK = b'__digest__ = "'
+    DIGEST_LINE_LENGTH = len(DIGEST_MARK) + 64 + 2
+    # Compressed entries with more encoded bytes are decompressed block by block
+    STREAMING_THRESHOLD = 1024 * 1024
+    STREAMING_BLOCK_SIZE = 256 * 1024
 
     @staticmethod
     def create_module_spec(
@@ -2312,39 +3837,175 @@ class Toolbox:
 
     @staticmethod
     def find_section_offsets(bundle: bytes) -> tuple[int, int, int]:
-        # Search from back is safe and if bundled data > this module, also faster.
-        index3 = bundle.rfind(Toolbox.HEAVY_RULE)
-        index2 = bundle.rfind(Toolbox.HEAVY_RULE, 0, index3 - 1)
-        index1 = bundle.rfind(Toolbox.HEAVY_RULE, 0, index2 - 1)
-        return index1, index2, index3
+        """
+        Locate the heavy rules starting the meta data, runtime, and main
+        sections. Since bundled files may contain heavy rules, too, the meta data
+        section is identified by the rule being followed by the version. Its last
+        occurrence is authoritative, since bundled files precede the meta data.
+        Only the runtime and main sections come after, each starting with a rule.
+        A bundle without runtime has its meta data section's rule as the last
+        offset and -1 as the first two offsets.
+        """
+        meta_data = bundle.rfind(Toolbox.META_DATA_MARK)
+        if meta_data < 0:
+            return -1, -1, -1
+        runtime = bundle.find(Toolbox.HEAVY_RULE, meta_data + len(Toolbox.HEAVY_RULE))
+        if runtime < 0:
+            return -1, -1, meta_data
+        main = bundle.find(Toolbox.HEAVY_RULE, runtime + len(Toolbox.HEAVY_RULE))
+        return meta_data, runtime, main
+
+    @staticmethod
+    def find_section_offsets_in_file(
+        file: "BinaryIO | BufferedReader",
+    ) -> tuple[int, int, int]:
+        # Read ever larger blocks from the end, until one has the meta data mark.
+        size = file.seek(0, os.SEEK_END)
+        block_size = 16 * 1024
+        while True:
+            start = max(size - block_size, 0)
+            file.seek(start)
+            offsets = Toolbox.find_section_offsets(file.read(size - start))
+            if offsets[2] >= 0 or start == 0:
+                index1, index2, index3 = (
+                    -1 if offset < 0 else start + offset for offset in offsets
+                )
+                return index1, index2, index3
+            block_size *= 4
+
+    @staticmethod
+    def compute_digest(bundle: bytes) -> "tuple[str, str]":
+        """
+        Determine the bundle's recorded SHA-256 digest and the actual one, which
+        covers all bytes of the bundle but the line with the recorded digest.
+        """
+        index1, index2, index3 = Toolbox.find_section_offsets(bundle)
+        start, stop = (index1, index2) if index1 >= 0 else (index3, len(bundle))
+        line = bundle.find(b"\n" + Toolbox.DIGEST_MARK, max(start, 0), stop) + 1
+        if start < 0 or line == 0:
+            raise ValueError("bundle has no digest")
+
+        end = line + Toolbox.DIGEST_LINE_LENGTH
+        recorded = bundle[line + len(Toolbox.DIGEST_MARK) : end - 2].decode("ascii")
+        view = memoryview(bundle)
+        digest = hashlib.sha256(view[:line])
+        digest.update(view[end:])
+        return recorded, digest.hexdigest()
 
     @staticmethod
     def load_meta_data(path: "str | Path") -> "tuple[str, ManifestType]":
         with open(path, mode="rb") as file:
-            content = file.read()
+            meta_data = Toolbox.load_compact_meta_data(file)
+            if meta_data is not None:
+                return meta_data
+
+            start, stop, last = Toolbox.find_section_offsets_in_file(file)
+            if last < 0:
+                raise ValueError(f'"{path}" is not a bundle script')
+            if start < 0:
+                # Without runtime, the meta data is the last section.
+                start, stop = last, file.seek(0, os.SEEK_END)
+            file.seek(start + len(Toolbox.HEAVY_RULE))
+            content = file.read(stop - start - len(Toolbox.HEAVY_RULE))
 
-        start, stop, _ = Toolbox.find_section_offsets(content)
         bindings: "dict[str, object]" = {}
-        exec(content[start + len(Toolbox.HEAVY_RULE) : stop], bindings)
+        exec(content, bindings)
         version = cast(str, bindings["__version__"])
         # cast() would require backwards-compatible type value; comment seems simpler.
         manifest: "ManifestType" = bindings["__manifest__"]  # type: ignore[assignment]
         return version, manifest
 
+    @staticmethod
+    def load_compact_meta_data(
+        file: "BinaryIO | BufferedReader",
+    ) -> "None | tuple[str, ManifestType]":
+        # The optional compact manifest is a marshalled (version, manifest) pair,
+        # Base85-encoded in comment lines, and followed by a fixed-width trailer
+        # with the length of those lines.
+        size = file.seek(0, os.SEEK_END)
+        if size < Toolbox.MANIFEST_TRAILER_LENGTH:
+            return None
+        file.seek(size - Toolbox.MANIFEST_TRAILER_LENGTH)
+        trailer = file.read(Toolbox.MANIFEST_TRAILER_LENGTH)
+        digits = trailer[len(Toolbox.MANIFEST_MARK) : -1]
+        if not trailer.startswith(Toolbox.MANIFEST_MARK) or not digits.isdigit():
+            return None
+
+        length = int(digits)
+        file.seek(size - Toolbox.MANIFEST_TRAILER_LENGTH - length)
+        lines = file.read(length).splitlines()
+        data = base64.a85decode(b"".join(line[2:] for line in lines))
+        version, manifest = marshal.loads(data)
+        if not isinstance(version, str) or not isinstance(manifest, dict):
+            raise ValueError("compact manifest is malformed")
+        return version, manifest
+
     @staticmethod
     def load_from_bundle(
         path: "str | Path", kind: str, offset: int, length: int
     ) -> bytes:
-        data = Toolbox.read(path, offset, length)
+        return Toolbox.decode(kind, Toolbox.read(path, offset, length))
+
+    @staticmethod
+    def decode(kind: str, data: "bytes | memoryview") -> bytes:
         if kind == "t":
-            return cast(bytes, eval(data))
-        elif kind == "b":
+            return Toolbox.decode_text(data)
+        elif kind == "b" or kind == "c":
             return base64.a85decode(data)
         elif kind == "v":
-            return data
+            return bytes(data)
+        elif kind == "z":
+            return Toolbox.decompress(data)
         else:
             raise ValueError(f'invalid kind "{kind}" for manifest entry')
 
+    @staticmethod
+    def decompress(data: "bytes | memoryview") -> bytes:
+        if len(data) <= Toolbox.STREAMING_THRESHOLD:
+            return zlib.decompress(base64.a85decode(data))
+        buffer = io.BytesIO()
+        for chunk in Toolbox.iter_decompressed(data):
+            buffer.write(chunk)
+        return buffer.getvalue()
+
+    @staticmethod
+    def iter_decompressed(data: "bytes | memoryview") -> "Iterator[bytes]":
+        # BundleMaker.encode_file() Base85-encodes every 56 bytes of compressed
+        # data on their own line. Since 56 is a multiple of 4, blocks of whole
+        # lines decode independently, without materializing all compressed data.
+        decompressor = zlib.decompressobj()
+        view = memoryview(data)
+        start, end = 0, len(view)
+        while start < end:
+            block = bytes(view[start : start + Toolbox.STREAMING_BLOCK_SIZE])
+            if start + len(block) < end:
+                block = block[: block.rfind(b"\n") + 1]
+                if not block:
+                    raise ValueError("compressed entry has overlong line")
+            start += len(block)
+            yield decompressor.decompress(base64.a85decode(block))
+        yield decompressor.flush()
+        if not decompressor.eof:
+            raise ValueError("compressed entry is truncated")
+
+    @staticmethod
+    def decode_text(data: "bytes | memoryview") -> bytes:
+        # BundleMaker.emit_file() writes either one line with an escaped newline
+        # or several lines in triple quotes. Since it also escapes all non-ASCII
+        # bytes and double quotes, escape_decode() suffices for decoding. Without
+        # backslashes, there isn't anything to decode.
+        if data[:4] == b'b"""' and data[-3:] == b'"""':
+            body = bytes(data[4:-3])
+            if b"\\" not in body:
+                return body
+        elif data[:2] == b'b"' and data[-3:] == b'\\n"':
+            body = bytes(data[2:-1])
+            if b"\\" not in body[:-2]:
+                return body[:-2] + b"\n"
+        else:
+            return cast(bytes, eval(bytes(data)))
+        return codecs.escape_decode(body)[0]
+
     @staticmethod
     def read(path: "str | Path", offset: int, length: int) -> bytes:
         if length == 0:
@@ -2356,6 +4017,18 @@ class Toolbox:
             raise AssertionError(f"actual length {len(data):,} is not {length:,}")
         return data
 
+    @staticmethod
+    def user_cache_dir(*segments: str) -> str:
+        if sys.platform == "win32":
+            root = os.environ.get("LOCALAPPDATA") or os.path.join(
+                os.path.expanduser("~"), "AppData", "Local"
+            )
+        elif sys.platform == "darwin":
+            root = os.path.expanduser("~/Library/Caches")
+        else:
+            root = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        return os.path.join(root, "tsutsumu", *segments)
+
     @staticmethod
     def restrict_sys_path() -> None:
         # TODO: Remove virtual environment paths, too!
@@ -2395,11 +4068,29 @@ class Bundle(Loader):
         script: "str | Path",
         version: str,
         manifest: "ManifestType",
+        *,
+        append: bool = False,
+        cache_dir: "None | str | Path" = None,
+        data_cache_size: int = 4 * 1024 * 1024,
+        digests: "None | dict[str, str]" = None,
+        verify: bool = False,
     ) -> "Bundle":
-        bundle = cls(script, version, manifest)
+        bundle = cls(
+            script,
+            version,
+            manifest,
+            cache_dir=cache_dir,
+            data_cache_size=data_cache_size,
+            digests=digests,
+            verify=verify,
+        )
         if bundle in sys.meta_path:
             raise ImportError(f'bundle for "{bundle._script}" already installed')
-        sys.meta_path.insert(0, bundle)
+        # Appending is faster but only safe if bundled modules don't shadow others.
+        if append:
+            sys.meta_path.append(bundle)
+        else:
+            sys.meta_path.insert(0, bundle)
         return bundle
 
     def __init__(
@@ -2407,6 +4098,11 @@ class Bundle(Loader):
         script: "str | Path",
         version: str,
         manifest: "ManifestType",
+        *,
+        cache_dir: "None | str | Path" = None,
+        data_cache_size: int = 4 * 1024 * 1024,
+        digests: "None | dict[str, str]" = None,
+        verify: bool = False,
     ) -> None:
         script = str(script)
         if not os.path.isabs(script):
@@ -2423,6 +4119,39 @@ class Bundle(Loader):
         self._script = script
         self._version = version
         self._manifest = {intern(k): v for k, v in manifest.items()}
+        self._modules: "dict[str, tuple[str, None | str]]" = {}
+        self._namespaces: "set[str]" = set()
+        self._toplevel: "set[str]" = set()
+        for path in self._manifest:
+            self._index(path)
+        self._cache_dir = None if cache_dir is None else str(cache_dir)
+        self._cache_stamp: "None | bytes" = None
+
+        # The bundle script is opened on first access and stays open until
+        # close(). If possible, it is memory-mapped as well.
+        self._lock = threading.Lock()
+        self._file: "None | BufferedReader" = None
+        self._mmap: "None | mmap" = None
+        self._view: "None | memoryview" = None
+
+        # Decoded resources, most recently used last, up to the given total size.
+        self._data_cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._data_cache_size = data_cache_size
+        self._data_cache_used = 0
+        self._data_cache_hits = 0
+        self._data_cache_misses = 0
+
+        # With verification, each entry is hashed on first access only.
+        self._digests = (
+            None if digests is None else {intern(k): v for k, v in digests.items()}
+        )
+        if verify and (
+            self._digests is None or self._digests.keys() != self._manifest.keys()
+        ):
+            raise ValueError("verification requires a digest for every bundled file")
+        self._verify = verify
+        self._verified: "set[str]" = set()
+        self._verification_time = 0.0
 
     def __hash__(self) -> int:
         return hash(self._script) + hash(self._manifest)
@@ -2439,6 +4168,23 @@ class Bundle(Loader):
     def __repr__(self) -> str:
         return f"<tsutsumu {self._script}>"
 
+    @property
+    def data_cache_hits(self) -> int:
+        return self._data_cache_hits
+
+    @property
+    def data_cache_misses(self) -> int:
+        return self._data_cache_misses
+
+    @property
+    def verified_entries(self) -> int:
+        return len(self._verified)
+
+    @property
+    def verification_time(self) -> float:
+        """The total time spent verifying entries, in seconds."""
+        return self._verification_time
+
     def __contains__(self, key: str) -> bool:
         return key in self._manifest
 
@@ -2446,38 +4192,117 @@ class Bundle(Loader):
         if not key in self._manifest:
             raise ImportError(f'unknown path "{key}"')
         kind, offset, length = self._manifest[key]
-        return Toolbox.load_from_bundle(self._script, kind, offset, length)
+        data = self._read(offset, length)
+        if self._verify and key not in self._verified:
+            self._check_digest(key, data)
+        return Toolbox.decode(kind, data)
+
+    def _check_digest(self, key: str, data: "bytes | memoryview") -> None:
+        assert self._digests is not None
+        start = time.perf_counter()
+        digest = hashlib.sha256(data).hexdigest()
+        duration = time.perf_counter() - start
+        with self._lock:
+            self._verification_time += duration
+            if digest != self._digests[key]:
+                raise ImportError(f'bundled file "{key}" does not match its digest')
+            self._verified.add(key)
+
+    def _open(self) -> None:
+        self._file = open(self._script, mode="rb")
+        try:
+            import mmap
+
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+        except (ImportError, OSError, ValueError):
+            # mmap is unavailable on some platforms and fails for empty files.
+            self._mmap = self._view = None
+
+    def _read(self, offset: int, length: int) -> "bytes | memoryview":
+        if length == 0:
+            return b""
+
+        data: "bytes | memoryview"
+        with self._lock:
+            if self._file is None:
+                self._open()
+            if self._view is not None:
+                data = self._view[offset : offset + length]
+            else:
+                assert self._file is not None
+                self._file.seek(offset)
+                data = self._file.read(length)
+
+        if len(data) != length:
+            raise AssertionError(f"actual length {len(data):,} is not {length:,}")
+        return data
+
+    def close(self) -> None:
+        with self._lock:
+            self._data_cache.clear()
+            self._data_cache_used = 0
+            if self._view is not None:
+                self._view.release()
+                self._view = None
+            if self._mmap is not None:
+                try:
+                    self._mmap.close()
+                except BufferError:
+                    # Slices returned by _read() are still alive. Dropping the
+                    # mapping leaves unmapping it to the last of them.
+                    pass
+                self._mmap = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _index(self, path: str) -> None:
+        # Map module names to paths. Packages take precedence over modules.
+        names = path[len(self._script) + 1 :].split(os.sep)
+        for count in range(1, len(names)):
+            self._namespaces.add(".".join(names[:count]))
+
+        stem, _, suffix = names[-1].rpartition(".")
+        if len(names) > 1:
+            self._toplevel.add(names[0])
+        if suffix != "py" or not stem:
+            return
+        if stem == "__init__":
+            if len(names) > 1:
+                self._modules[".".join(names[:-1])] = (path, os.path.dirname(path))
+        else:
+            if len(names) == 1:
+                self._toplevel.add(stem)
+            self._modules.setdefault(".".join([*names[:-1], stem]), (path, None))
 
     def _locate(
         self,
         fullname: str,
         search_paths: "None | Sequence[str]" = None,
     ) -> "tuple[str, None | str]":
-        if search_paths is None:
-            base_paths = [os.path.join(self._script, fullname.replace(".", os.sep))]
-        else:
-            modname = fullname.rpartition(".")[2]
-            base_paths = [os.path.join(path, modname) for path in search_paths]
-
-        for suffix, is_pkg in (
-            (os.sep + "__init__.py", True),
-            (".py", False),
-        ):
-            for base_path in base_paths:
-                full_path = base_path + suffix
-                if full_path in self._manifest:
-                    return full_path, (base_path if is_pkg else None)
+        location = self._lookup(fullname, search_paths)
+        if location is None:
+            raise ImportError(f"No such module {fullname} in bundle {self._script}")
+        return location
 
-        # It's not a regular module or package, but could be a namespace package
-        # (see https://github.com/python/cpython/blob/3.11/Lib/zipimport.py#L171)
-
-        for base_path in base_paths:
-            prefix = base_path + os.sep
-            for key in self._manifest:
-                if key.startswith(prefix):
-                    return base_path, base_path
-
-        raise ImportError(f"No such module {fullname} in bundle {self._script}")
+    def _lookup(
+        self,
+        fullname: str,
+        search_paths: "None | Sequence[str]" = None,
+    ) -> "None | tuple[str, None | str]":
+        location = self._modules.get(fullname)
+        if location is None and fullname in self._namespaces:
+            # It's not a regular module or package but a namespace package
+            # (see https://github.com/python/cpython/blob/3.11/Lib/zipimport.py#L171)
+            base_path = os.path.join(self._script, fullname.replace(".", os.sep))
+            location = base_path, base_path
+
+        if location is not None and search_paths is not None:
+            path, pkgdir = location
+            if os.path.dirname(pkgdir or path) not in search_paths:
+                location = None
+        return location
 
     def find_spec(
         self,
@@ -2485,12 +4310,13 @@ class Bundle(Loader):
         search_paths: "None | Sequence[str]" = None,
         target: "None | ModuleType" = None,
     ) -> "None | ModuleSpec":
-        try:
-            return Toolbox.create_module_spec(
-                fullname, self, *self._locate(fullname, search_paths)
-            )
-        except ImportError:
+        # Most imports are for other modules. Reject them as quickly as possible.
+        if fullname.partition(".")[0] not in self._toplevel:
+            return None
+        location = self._lookup(fullname, search_paths)
+        if location is None:
             return None
+        return Toolbox.create_module_spec(fullname, self, *location)
 
     def create_module(self, spec: ModuleSpec) -> "None | ModuleType":
         return None
@@ -2504,14 +4330,123 @@ class Bundle(Loader):
 
     def get_code(self, fullname: str) -> "CodeType":
         fullpath = self.get_filename(fullname)
+        code = self._get_precompiled_code(fullpath)
+        if code is not None:
+            return code
+
+        cache_path = self._get_cache_path(fullpath)
+        if cache_path is not None:
+            code = self._read_cached_code(cache_path)
+            if code is not None:
+                return code
+
         source = importlib.util.decode_source(self[fullpath])
-        return compile(source, fullpath, "exec", dont_inherit=True)
+        code = compile(source, fullpath, "exec", dont_inherit=True)
+        if cache_path is not None and not sys.dont_write_bytecode:
+            self._write_cached_code(cache_path, code)
+        return code
+
+    def _get_precompiled_code(self, fullpath: str) -> "None | CodeType":
+        tag: "None | str" = sys.implementation.cache_tag
+        if tag is None:
+            return None
+        head, tail = os.path.split(fullpath)
+        stem, dot, _ = tail.rpartition(".")
+        code_path = os.path.join(head, "__pycache__", f"{stem}.{tag}.pyc")
+        if not dot or code_path not in self._manifest:
+            return None
+
+        data = self[code_path]
+        magic_length = len(importlib.util.MAGIC_NUMBER)
+        if data[:magic_length] != importlib.util.MAGIC_NUMBER:
+            return None
+        code = cast("CodeType", marshal.loads(data[magic_length:]))
+        # The maker compiled the code with the manifest key as file name.
+        _imp._fix_co_filename(code, fullpath)  # type: ignore[attr-defined]
+        return code
+
+    def _get_cache_path(self, fullpath: str) -> "None | str":
+        if self._cache_dir is None or fullpath not in self._manifest:
+            return None
+        if self._cache_stamp is None:
+            # Cached code is only valid for this very bundle script.
+            try:
+                status = os.stat(self._script)
+            except OSError:
+                return None
+            self._cache_stamp = (
+                importlib.util.MAGIC_NUMBER
+                + status.st_mtime_ns.to_bytes(8, "little")
+                + status.st_size.to_bytes(8, "little")
+            )
+
+        _, offset, length = self._manifest[fullpath]
+        key = f"{fullpath}\0{offset}\0{length}\0".encode("utf8")
+        key += importlib.util.MAGIC_NUMBER
+        if self._digests is not None:
+            # Cached code is also only valid for the same, verified source.
+            key += self._digests.get(fullpath, "").encode("ascii")
+        return os.path.join(self._cache_dir, hashlib.sha256(key).hexdigest() + ".pyc")
+
+    def _read_cached_code(self, cache_path: str) -> "None | CodeType":
+        assert self._cache_stamp is not None
+        try:
+            with open(cache_path, mode="rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+
+        stamp_length = len(self._cache_stamp)
+        if data[:stamp_length] != self._cache_stamp:
+            return None
+        try:
+            return cast("CodeType", marshal.loads(data[stamp_length:]))
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def _write_cached_code(self, cache_path: str, code: "CodeType") -> None:
+        assert self._cache_stamp is not None
+        # Write to temporary file first, so that concurrent readers never see
+        # partially written code.
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(temp_path, mode="wb") as file:
+                file.write(self._cache_stamp)
+                file.write(marshal.dumps(code))
+            os.replace(temp_path, cache_path)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
 
     def get_source(self, fullname: str) -> str:
         return importlib.util.decode_source(self[self.get_filename(fullname)])
 
     def get_data(self, path: "str | Path") -> bytes:
-        return self[str(path)]
+        key = str(path)
+        with self._lock:
+            data = self._data_cache.get(key)
+            if data is not None:
+                self._data_cache.move_to_end(key)
+                self._data_cache_hits += 1
+                return data
+            self._data_cache_misses += 1
+
+        data = self[key]
+        size = len(data)
+        if size == 0 or size > self._data_cache_size:
+            return data
+
+        with self._lock:
+            if key not in self._data_cache:
+                self._data_cache[key] = data
+                self._data_cache_used += size
+                while self._data_cache_used > self._data_cache_size:
+                    _, evicted = self._data_cache.popitem(last=False)
+                    self._data_cache_used -= len(evicted)
+        return data
 
     def get_filename(self, fullname: str) -> str:
         return self._locate(fullname)[0]
@@ -2544,22 +4479,27 @@ class Bundle(Loader):
         tsutsumu_bundle: "ModuleType",
     ) -> None:
         with open(self._script, mode="rb") as file:
-            content = file.read()
-
-        section1, section2, section3 = Toolbox.find_section_offsets(content)
-
-        module_offset = section1 + len(Toolbox.HEAVY_RULE)
-        module_length = content.find(b"\n", module_offset) + 1 - module_offset
+            section1, section2, section3 = Toolbox.find_section_offsets_in_file(file)
+            module_offset = section1 + len(Toolbox.HEAVY_RULE)
+            file.seek(module_offset)
+            module_length = len(file.readline())
         assert tsutsumu.__file__ is not None
         self._manifest[tsutsumu.__file__] = ("v", module_offset, module_length)
+        self._index(tsutsumu.__file__)
 
         module_offset = section2 + len(Toolbox.HEAVY_RULE)
         module_length = section3 - 1 - module_offset
         assert tsutsumu_bundle.__file__ is not None
         self._manifest[tsutsumu_bundle.__file__] = ("v", module_offset, module_length)
+        self._index(tsutsumu_bundle.__file__)
+
+        # Both modules are already running. There's nothing left to verify.
+        self._verified.add(tsutsumu.__file__)
+        self._verified.add(tsutsumu_bundle.__file__)
 
     def uninstall(self) -> None:
         sys.meta_path.remove(self)
+        self.close()
 
 # ==============================================================================
 
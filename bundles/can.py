@@ -238,18 +238,40 @@ __manifest__ = {
     "spam/ham.html": ("t", 13_853, 534),
 }
 
+__digests__ = {
+    "spam/__init__.py": "1840da4dc6404cb7035bb302c7c7138827c076f23dd5dffb64c8db5699d261be",
+    "spam/__main__.py": "64857be8e19b26ab19a4adcf6214b43b4bacc89d15276e863b3be37a8530f851",
+    "spam/bacon.jpg": "67924185072230248ee630dd9e1f59c0d10c1069d831418f93f2afd33c90dccd",
+    "spam/bacon.py": "e1241cc6c7367a01030e16a0e60959099179cd73c3ffc87d77be3e2e2089fdfa",
+    "spam/ham.html": "cc8b22e9683681368da1b801860128f4ebb7b4c89d9c4e9b3e40795922e0ddf5",
+}
+
+__digest__ = "19426c0a24ca7d237de6ee22512736d9f31fcb54c2e583b9bf92b912bcd467e2"
+
 # ==============================================================================
 
+import _imp
 import base64
+import codecs
+from collections import OrderedDict
+import hashlib
 from importlib.abc import Loader
 from importlib.machinery import ModuleSpec
 import importlib.util
+import io
+import marshal
 import os
 import sys
+import threading
+import time
 from typing import cast, TYPE_CHECKING
+import zlib
 
 if TYPE_CHECKING:
-    from collections.abc import Sequence
+    from collections.abc import Iterator, Sequence
+    from io import BufferedReader
+    from typing import BinaryIO
+    from mmap import mmap
     from pathlib import Path
     from types import CodeType, ModuleType
     from typing import TypeAlias
@@ -260,6 +282,14 @@ if TYPE_CHECKING:
 class Toolbox:
     HEAVY_RULE = b"# " + b"=" * 78 + b"\n\n"
     PLAIN_RULE = b"# " + b"-" * 78 + b"\n"
+    META_DATA_MARK = HEAVY_RULE + b"__version__ = "
+    MANIFEST_MARK = b"# __manifest__ "
+    MANIFEST_TRAILER_LENGTH = len(MANIFEST_MARK) + 11
+    DIGEST_MARK = b'__digest__ = "'
+    DIGEST_LINE_LENGTH = len(DIGEST_MARK) + 64 + 2
+    # Compressed entries with more encoded bytes are decompressed block by block
+    STREAMING_THRESHOLD = 1024 * 1024
+    STREAMING_BLOCK_SIZE = 256 * 1024
 
     @staticmethod
     def create_module_spec(
@@ -284,39 +314,175 @@ class Toolbox:
 
     @staticmethod
     def find_section_offsets(bundle: bytes) -> tuple[int, int, int]:
-        # Search from back is safe and if bundled data > this module, also faster.
-        index3 = bundle.rfind(Toolbox.HEAVY_RULE)
-        index2 = bundle.rfind(Toolbox.HEAVY_RULE, 0, index3 - 1)
-        index1 = bundle.rfind(Toolbox.HEAVY_RULE, 0, index2 - 1)
-        return index1, index2, index3
+        """
+        Locate the heavy rules starting the meta data, runtime, and main
+        sections. Since bundled files may contain heavy rules, too, the meta data
+        section is identified by the rule being followed by the version. Its last
+        occurrence is authoritative, since bundled files precede the meta data.
+        Only the runtime and main sections come after, each starting with a rule.
+        A bundle without runtime has its meta data section's rule as the last
+        offset and -1 as the first two offsets.
+        """
+        meta_data = bundle.rfind(Toolbox.META_DATA_MARK)
+        if meta_data < 0:
+            return -1, -1, -1
+        runtime = bundle.find(Toolbox.HEAVY_RULE, meta_data + len(Toolbox.HEAVY_RULE))
+        if runtime < 0:
+            return -1, -1, meta_data
+        main = bundle.find(Toolbox.HEAVY_RULE, runtime + len(Toolbox.HEAVY_RULE))
+        return meta_data, runtime, main
+
+    @staticmethod
+    def find_section_offsets_in_file(
+        file: "BinaryIO | BufferedReader",
+    ) -> tuple[int, int, int]:
+        # Read ever larger blocks from the end, until one has the meta data mark.
+        size = file.seek(0, os.SEEK_END)
+        block_size = 16 * 1024
+        while True:
+            start = max(size - block_size, 0)
+            file.seek(start)
+            offsets = Toolbox.find_section_offsets(file.read(size - start))
+            if offsets[2] >= 0 or start == 0:
+                index1, index2, index3 = (
+                    -1 if offset < 0 else start + offset for offset in offsets
+                )
+                return index1, index2, index3
+            block_size *= 4
+
+    @staticmethod
+    def compute_digest(bundle: bytes) -> "tuple[str, str]":
+        """
+        Determine the bundle's recorded SHA-256 digest and the actual one, which
+        covers all bytes of the bundle but the line with the recorded digest.
+        """
+        index1, index2, index3 = Toolbox.find_section_offsets(bundle)
+        start, stop = (index1, index2) if index1 >= 0 else (index3, len(bundle))
+        line = bundle.find(b"\n" + Toolbox.DIGEST_MARK, max(start, 0), stop) + 1
+        if start < 0 or line == 0:
+            raise ValueError("bundle has no digest")
+
+        end = line + Toolbox.DIGEST_LINE_LENGTH
+        recorded = bundle[line + len(Toolbox.DIGEST_MARK) : end - 2].decode("ascii")
+        view = memoryview(bundle)
+        digest = hashlib.sha256(view[:line])
+        digest.update(view[end:])
+        return recorded, digest.hexdigest()
 
     @staticmethod
     def load_meta_data(path: "str | Path") -> "tuple[str, ManifestType]":
         with open(path, mode="rb") as file:
-            content = file.read()
+            meta_data = Toolbox.load_compact_meta_data(file)
+            if meta_data is not None:
+                return meta_data
+
+            start, stop, last = Toolbox.find_section_offsets_in_file(file)
+            if last < 0:
+                raise ValueError(f'"{path}" is not a bundle script')
+            if start < 0:
+                # Without runtime, the meta data is the last section.
+                start, stop = last, file.seek(0, os.SEEK_END)
+            file.seek(start + len(Toolbox.HEAVY_RULE))
+            content = file.read(stop - start - len(Toolbox.HEAVY_RULE))
 
-        start, stop, _ = Toolbox.find_section_offsets(content)
         bindings: "dict[str, object]" = {}
-        exec(content[start + len(Toolbox.HEAVY_RULE) : stop], bindings)
+        exec(content, bindings)
         version = cast(str, bindings["__version__"])
         # cast() would require backwards-compatible type value; comment seems simpler.
         manifest: "ManifestType" = bindings["__manifest__"]  # type: ignore[assignment]
         return version, manifest
 
+    @staticmethod
+    def load_compact_meta_data(
+        file: "BinaryIO | BufferedReader",
+    ) -> "None | tuple[str, ManifestType]":
+        # The optional compact manifest is a marshalled (version, manifest) pair,
+        # Base85-encoded in comment lines, and followed by a fixed-width trailer
+        # with the length of those lines.
+        size = file.seek(0, os.SEEK_END)
+        if size < Toolbox.MANIFEST_TRAILER_LENGTH:
+            return None
+        file.seek(size - Toolbox.MANIFEST_TRAILER_LENGTH)
+        trailer = file.read(Toolbox.MANIFEST_TRAILER_LENGTH)
+        digits = trailer[len(Toolbox.MANIFEST_MARK) : -1]
+        if not trailer.startswith(Toolbox.MANIFEST_MARK) or not digits.isdigit():
+            return None
+
+        length = int(digits)
+        file.seek(size - Toolbox.MANIFEST_TRAILER_LENGTH - length)
+        lines = file.read(length).splitlines()
+        data = base64.a85decode(b"".join(line[2:] for line in lines))
+        version, manifest = marshal.loads(data)
+        if not isinstance(version, str) or not isinstance(manifest, dict):
+            raise ValueError("compact manifest is malformed")
+        return version, manifest
+
     @staticmethod
     def load_from_bundle(
         path: "str | Path", kind: str, offset: int, length: int
     ) -> bytes:
-        data = Toolbox.read(path, offset, length)
+        return Toolbox.decode(kind, Toolbox.read(path, offset, length))
+
+    @staticmethod
+    def decode(kind: str, data: "bytes | memoryview") -> bytes:
         if kind == "t":
-            return cast(bytes, eval(data))
-        elif kind == "b":
+            return Toolbox.decode_text(data)
+        elif kind == "b" or kind == "c":
             return base64.a85decode(data)
         elif kind == "v":
-            return data
+            return bytes(data)
+        elif kind == "z":
+            return Toolbox.decompress(data)
         else:
             raise ValueError(f'invalid kind "{kind}" for manifest entry')
 
+    @staticmethod
+    def decompress(data: "bytes | memoryview") -> bytes:
+        if len(data) <= Toolbox.STREAMING_THRESHOLD:
+            return zlib.decompress(base64.a85decode(data))
+        buffer = io.BytesIO()
+        for chunk in Toolbox.iter_decompressed(data):
+            buffer.write(chunk)
+        return buffer.getvalue()
+
+    @staticmethod
+    def iter_decompressed(data: "bytes | memoryview") -> "Iterator[bytes]":
+        # BundleMaker.encode_file() Base85-encodes every 56 bytes of compressed
+        # data on their own line. Since 56 is a multiple of 4, blocks of whole
+        # lines decode independently, without materializing all compressed data.
+        decompressor = zlib.decompressobj()
+        view = memoryview(data)
+        start, end = 0, len(view)
+        while start < end:
+            block = bytes(view[start : start + Toolbox.STREAMING_BLOCK_SIZE])
+            if start + len(block) < end:
+                block = block[: block.rfind(b"\n") + 1]
+                if not block:
+                    raise ValueError("compressed entry has overlong line")
+            start += len(block)
+            yield decompressor.decompress(base64.a85decode(block))
+        yield decompressor.flush()
+        if not decompressor.eof:
+            raise ValueError("compressed entry is truncated")
+
+    @staticmethod
+    def decode_text(data: "bytes | memoryview") -> bytes:
+        # BundleMaker.emit_file() writes either one line with an escaped newline
+        # or several lines in triple quotes. Since it also escapes all non-ASCII
+        # bytes and double quotes, escape_decode() suffices for decoding. Without
+        # backslashes, there isn't anything to decode.
+        if data[:4] == b'b"""' and data[-3:] == b'"""':
+            body = bytes(data[4:-3])
+            if b"\\" not in body:
+                return body
+        elif data[:2] == b'b"' and data[-3:] == b'\\n"':
+            body = bytes(data[2:-1])
+            if b"\\" not in body[:-2]:
+                return body[:-2] + b"\n"
+        else:
+            return cast(bytes, eval(bytes(data)))
+        return codecs.escape_decode(body)[0]
+
     @staticmethod
     def read(path: "str | Path", offset: int, length: int) -> bytes:
         if length == 0:
@@ -328,6 +494,18 @@ class Toolbox:
             raise AssertionError(f"actual length {len(data):,} is not {length:,}")
         return data
 
+    @staticmethod
+    def user_cache_dir(*segments: str) -> str:
+        if sys.platform == "win32":
+            root = os.environ.get("LOCALAPPDATA") or os.path.join(
+                os.path.expanduser("~"), "AppData", "Local"
+            )
+        elif sys.platform == "darwin":
+            root = os.path.expanduser("~/Library/Caches")
+        else:
+            root = os.environ.get("XDG_CACHE_HOME") or os.path.expanduser("~/.cache")
+        return os.path.join(root, "tsutsumu", *segments)
+
     @staticmethod
     def restrict_sys_path() -> None:
         # TODO: Remove virtual environment paths, too!
@@ -367,11 +545,29 @@ class Bundle(Loader):
         script: "str | Path",
         version: str,
         manifest: "ManifestType",
+        *,
+        append: bool = False,
+        cache_dir: "None | str | Path" = None,
+        data_cache_size: int = 4 * 1024 * 1024,
+        digests: "None | dict[str, str]" = None,
+        verify: bool = False,
     ) -> "Bundle":
-        bundle = cls(script, version, manifest)
+        bundle = cls(
+            script,
+            version,
+            manifest,
+            cache_dir=cache_dir,
+            data_cache_size=data_cache_size,
+            digests=digests,
+            verify=verify,
+        )
         if bundle in sys.meta_path:
             raise ImportError(f'bundle for "{bundle._script}" already installed')
-        sys.meta_path.insert(0, bundle)
+        # Appending is faster but only safe if bundled modules don't shadow others.
+        if append:
+            sys.meta_path.append(bundle)
+        else:
+            sys.meta_path.insert(0, bundle)
         return bundle
 
     def __init__(
@@ -379,6 +575,11 @@ class Bundle(Loader):
         script: "str | Path",
         version: str,
         manifest: "ManifestType",
+        *,
+        cache_dir: "None | str | Path" = None,
+        data_cache_size: int = 4 * 1024 * 1024,
+        digests: "None | dict[str, str]" = None,
+        verify: bool = False,
     ) -> None:
         script = str(script)
         if not os.path.isabs(script):
@@ -395,6 +596,39 @@ class Bundle(Loader):
         self._script = script
         self._version = version
         self._manifest = {intern(k): v for k, v in manifest.items()}
+        self._modules: "dict[str, tuple[str, None | str]]" = {}
+        self._namespaces: "set[str]" = set()
+        self._toplevel: "set[str]" = set()
+        for path in self._manifest:
+            self._index(path)
+        self._cache_dir = None if cache_dir is None else str(cache_dir)
+        self._cache_stamp: "None | bytes" = None
+
+        # The bundle script is opened on first access and stays open until
+        # close(). If possible, it is memory-mapped as well.
+        self._lock = threading.Lock()
+        self._file: "None | BufferedReader" = None
+        self._mmap: "None | mmap" = None
+        self._view: "None | memoryview" = None
+
+        # Decoded resources, most recently used last, up to the given total size.
+        self._data_cache: "OrderedDict[str, bytes]" = OrderedDict()
+        self._data_cache_size = data_cache_size
+        self._data_cache_used = 0
+        self._data_cache_hits = 0
+        self._data_cache_misses = 0
+
+        # With verification, each entry is hashed on first access only.
+        self._digests = (
+            None if digests is None else {intern(k): v for k, v in digests.items()}
+        )
+        if verify and (
+            self._digests is None or self._digests.keys() != self._manifest.keys()
+        ):
+            raise ValueError("verification requires a digest for every bundled file")
+        self._verify = verify
+        self._verified: "set[str]" = set()
+        self._verification_time = 0.0
 
     def __hash__(self) -> int:
         return hash(self._script) + hash(self._manifest)
@@ -411,6 +645,23 @@ class Bundle(Loader):
     def __repr__(self) -> str:
         return f"<tsutsumu {self._script}>"
 
+    @property
+    def data_cache_hits(self) -> int:
+        return self._data_cache_hits
+
+    @property
+    def data_cache_misses(self) -> int:
+        return self._data_cache_misses
+
+    @property
+    def verified_entries(self) -> int:
+        return len(self._verified)
+
+    @property
+    def verification_time(self) -> float:
+        """The total time spent verifying entries, in seconds."""
+        return self._verification_time
+
     def __contains__(self, key: str) -> bool:
         return key in self._manifest
 
@@ -418,38 +669,117 @@ class Bundle(Loader):
         if not key in self._manifest:
             raise ImportError(f'unknown path "{key}"')
         kind, offset, length = self._manifest[key]
-        return Toolbox.load_from_bundle(self._script, kind, offset, length)
+        data = self._read(offset, length)
+        if self._verify and key not in self._verified:
+            self._check_digest(key, data)
+        return Toolbox.decode(kind, data)
+
+    def _check_digest(self, key: str, data: "bytes | memoryview") -> None:
+        assert self._digests is not None
+        start = time.perf_counter()
+        digest = hashlib.sha256(data).hexdigest()
+        duration = time.perf_counter() - start
+        with self._lock:
+            self._verification_time += duration
+            if digest != self._digests[key]:
+                raise ImportError(f'bundled file "{key}" does not match its digest')
+            self._verified.add(key)
+
+    def _open(self) -> None:
+        self._file = open(self._script, mode="rb")
+        try:
+            import mmap
+
+            self._mmap = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+            self._view = memoryview(self._mmap)
+        except (ImportError, OSError, ValueError):
+            # mmap is unavailable on some platforms and fails for empty files.
+            self._mmap = self._view = None
+
+    def _read(self, offset: int, length: int) -> "bytes | memoryview":
+        if length == 0:
+            return b""
+
+        data: "bytes | memoryview"
+        with self._lock:
+            if self._file is None:
+                self._open()
+            if self._view is not None:
+                data = self._view[offset : offset + length]
+            else:
+                assert self._file is not None
+                self._file.seek(offset)
+                data = self._file.read(length)
+
+        if len(data) != length:
+            raise AssertionError(f"actual length {len(data):,} is not {length:,}")
+        return data
+
+    def close(self) -> None:
+        with self._lock:
+            self._data_cache.clear()
+            self._data_cache_used = 0
+            if self._view is not None:
+                self._view.release()
+                self._view = None
+            if self._mmap is not None:
+                try:
+                    self._mmap.close()
+                except BufferError:
+                    # Slices returned by _read() are still alive. Dropping the
+                    # mapping leaves unmapping it to the last of them.
+                    pass
+                self._mmap = None
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+
+    def _index(self, path: str) -> None:
+        # Map module names to paths. Packages take precedence over modules.
+        names = path[len(self._script) + 1 :].split(os.sep)
+        for count in range(1, len(names)):
+            self._namespaces.add(".".join(names[:count]))
+
+        stem, _, suffix = names[-1].rpartition(".")
+        if len(names) > 1:
+            self._toplevel.add(names[0])
+        if suffix != "py" or not stem:
+            return
+        if stem == "__init__":
+            if len(names) > 1:
+                self._modules[".".join(names[:-1])] = (path, os.path.dirname(path))
+        else:
+            if len(names) == 1:
+                self._toplevel.add(stem)
+            self._modules.setdefault(".".join([*names[:-1], stem]), (path, None))
 
     def _locate(
         self,
         fullname: str,
         search_paths: "None | Sequence[str]" = None,
     ) -> "tuple[str, None | str]":
-        if search_paths is None:
-            base_paths = [os.path.join(self._script, fullname.replace(".", os.sep))]
-        else:
-            modname = fullname.rpartition(".")[2]
-            base_paths = [os.path.join(path, modname) for path in search_paths]
-
-        for suffix, is_pkg in (
-            (os.sep + "__init__.py", True),
-            (".py", False),
-        ):
-            for base_path in base_paths:
-                full_path = base_path + suffix
-                if full_path in self._manifest:
-                    return full_path, (base_path if is_pkg else None)
-
-        # It's not a regular module or package, but could be a namespace package
-        # (see https://github.com/python/cpython/blob/3.11/Lib/zipimport.py#L171)
-
-        for base_path in base_paths:
-            prefix = base_path + os.sep
-            for key in self._manifest:
-                if key.startswith(prefix):
-                    return base_path, base_path
+        location = self._lookup(fullname, search_paths)
+        if location is None:
+            raise ImportError(f"No such module {fullname} in bundle {self._script}")
+        return location
 
-        raise ImportError(f"No such module {fullname} in bundle {self._script}")
+    def _lookup(
+        self,
+        fullname: str,
+        search_paths: "None | Sequence[str]" = None,
+    ) -> "None | tuple[str, None | str]":
+        location = self._modules.get(fullname)
+        if location is None and fullname in self._namespaces:
+            # It's not a regular module or package but a namespace package
+            # (see https://github.com/python/cpython/blob/3.11/Lib/zipimport.py#L171)
+            base_path = os.path.join(self._script, fullname.replace(".", os.sep))
+            location = base_path, base_path
+
+        if location is not None and search_paths is not None:
+            path, pkgdir = location
+            if os.path.dirname(pkgdir or path) not in search_paths:
+                location = None
+        return location
 
     def find_spec(
         self,
@@ -457,12 +787,13 @@ class Bundle(Loader):
         search_paths: "None | Sequence[str]" = None,
         target: "None | ModuleType" = None,
     ) -> "None | ModuleSpec":
-        try:
-            return Toolbox.create_module_spec(
-                fullname, self, *self._locate(fullname, search_paths)
-            )
-        except ImportError:
+        # Most imports are for other modules. Reject them as quickly as possible.
+        if fullname.partition(".")[0] not in self._toplevel:
             return None
+        location = self._lookup(fullname, search_paths)
+        if location is None:
+            return None
+        return Toolbox.create_module_spec(fullname, self, *location)
 
     def create_module(self, spec: ModuleSpec) -> "None | ModuleType":
         return None
@@ -476,14 +807,123 @@ class Bundle(Loader):
 
     def get_code(self, fullname: str) -> "CodeType":
         fullpath = self.get_filename(fullname)
+        code = self._get_precompiled_code(fullpath)
+        if code is not None:
+            return code
+
+        cache_path = self._get_cache_path(fullpath)
+        if cache_path is not None:
+            code = self._read_cached_code(cache_path)
+            if code is not None:
+                return code
+
         source = importlib.util.decode_source(self[fullpath])
-        return compile(source, fullpath, "exec", dont_inherit=True)
+        code = compile(source, fullpath, "exec", dont_inherit=True)
+        if cache_path is not None and not sys.dont_write_bytecode:
+            self._write_cached_code(cache_path, code)
+        return code
+
+    def _get_precompiled_code(self, fullpath: str) -> "None | CodeType":
+        tag: "None | str" = sys.implementation.cache_tag
+        if tag is None:
+            return None
+        head, tail = os.path.split(fullpath)
+        stem, dot, _ = tail.rpartition(".")
+        code_path = os.path.join(head, "__pycache__", f"{stem}.{tag}.pyc")
+        if not dot or code_path not in self._manifest:
+            return None
+
+        data = self[code_path]
+        magic_length = len(importlib.util.MAGIC_NUMBER)
+        if data[:magic_length] != importlib.util.MAGIC_NUMBER:
+            return None
+        code = cast("CodeType", marshal.loads(data[magic_length:]))
+        # The maker compiled the code with the manifest key as file name.
+        _imp._fix_co_filename(code, fullpath)  # type: ignore[attr-defined]
+        return code
+
+    def _get_cache_path(self, fullpath: str) -> "None | str":
+        if self._cache_dir is None or fullpath not in self._manifest:
+            return None
+        if self._cache_stamp is None:
+            # Cached code is only valid for this very bundle script.
+            try:
+                status = os.stat(self._script)
+            except OSError:
+                return None
+            self._cache_stamp = (
+                importlib.util.MAGIC_NUMBER
+                + status.st_mtime_ns.to_bytes(8, "little")
+                + status.st_size.to_bytes(8, "little")
+            )
+
+        _, offset, length = self._manifest[fullpath]
+        key = f"{fullpath}\0{offset}\0{length}\0".encode("utf8")
+        key += importlib.util.MAGIC_NUMBER
+        if self._digests is not None:
+            # Cached code is also only valid for the same, verified source.
+            key += self._digests.get(fullpath, "").encode("ascii")
+        return os.path.join(self._cache_dir, hashlib.sha256(key).hexdigest() + ".pyc")
+
+    def _read_cached_code(self, cache_path: str) -> "None | CodeType":
+        assert self._cache_stamp is not None
+        try:
+            with open(cache_path, mode="rb") as file:
+                data = file.read()
+        except OSError:
+            return None
+
+        stamp_length = len(self._cache_stamp)
+        if data[:stamp_length] != self._cache_stamp:
+            return None
+        try:
+            return cast("CodeType", marshal.loads(data[stamp_length:]))
+        except (EOFError, ValueError, TypeError):
+            return None
+
+    def _write_cached_code(self, cache_path: str, code: "CodeType") -> None:
+        assert self._cache_stamp is not None
+        # Write to temporary file first, so that concurrent readers never see
+        # partially written code.
+        temp_path = f"{cache_path}.{os.getpid()}.tmp"
+        try:
+            os.makedirs(os.path.dirname(cache_path), exist_ok=True)
+            with open(temp_path, mode="wb") as file:
+                file.write(self._cache_stamp)
+                file.write(marshal.dumps(code))
+            os.replace(temp_path, cache_path)
+        except OSError:
+            try:
+                os.unlink(temp_path)
+            except OSError:
+                pass
 
     def get_source(self, fullname: str) -> str:
         return importlib.util.decode_source(self[self.get_filename(fullname)])
 
     def get_data(self, path: "str | Path") -> bytes:
-        return self[str(path)]
+        key = str(path)
+        with self._lock:
+            data = self._data_cache.get(key)
+            if data is not None:
+                self._data_cache.move_to_end(key)
+                self._data_cache_hits += 1
+                return data
+            self._data_cache_misses += 1
+
+        data = self[key]
+        size = len(data)
+        if size == 0 or size > self._data_cache_size:
+            return data
+
+        with self._lock:
+            if key not in self._data_cache:
+                self._data_cache[key] = data
+                self._data_cache_used += size
+                while self._data_cache_used > self._data_cache_size:
+                    _, evicted = self._data_cache.popitem(last=False)
+                    self._data_cache_used -= len(evicted)
+        return data
 
     def get_filename(self, fullname: str) -> str:
         return self._locate(fullname)[0]
@@ -516,22 +956,27 @@ class Bundle(Loader):
         tsutsumu_bundle: "ModuleType",
     ) -> None:
         with open(self._script, mode="rb") as file:
-            content = file.read()
-
-        section1, section2, section3 = Toolbox.find_section_offsets(content)
-
-        module_offset = section1 + len(Toolbox.HEAVY_RULE)
-        module_length = content.find(b"\n", module_offset) + 1 - module_offset
+            section1, section2, section3 = Toolbox.find_section_offsets_in_file(file)
+            module_offset = section1 + len(Toolbox.HEAVY_RULE)
+            file.seek(module_offset)
+            module_length = len(file.readline())
         assert tsutsumu.__file__ is not None
         self._manifest[tsutsumu.__file__] = ("v", module_offset, module_length)
+        self._index(tsutsumu.__file__)
 
         module_offset = section2 + len(Toolbox.HEAVY_RULE)
         module_length = section3 - 1 - module_offset
         assert tsutsumu_bundle.__file__ is not None
         self._manifest[tsutsumu_bundle.__file__] = ("v", module_offset, module_length)
+        self._index(tsutsumu_bundle.__file__)
+
+        # Both modules are already running. There's nothing left to verify.
+        self._verified.add(tsutsumu.__file__)
+        self._verified.add(tsutsumu_bundle.__file__)
 
     def uninstall(self) -> None:
         sys.meta_path.remove(self)
+        self.close()
 
 # ==============================================================================
 
@@ -0,0 +1,197 @@
+"""
+An on-disk cache for HTTP responses, which revalidates stale entries with
+conditional requests based on their `ETag` and `Last-Modified` validators.
+"""
+
+import hashlib
+import json
+import os
+from pathlib import Path
+import threading
+import time
+from typing import NamedTuple
+
+import requests
+from requests.structures import CaseInsensitiveDict
+from requests.utils import get_encoding_from_headers
+
+
+__all__ = ("CacheEntry", "HttpCache")
+
+
+# Only these response headers are retained
+_CACHED_HEADERS = ("content-type", "etag", "last-modified")
+
+
+class CacheEntry(NamedTuple):
+    """A cached response body with its URL, select headers, and storage time."""
+
+    url: str
+    headers: dict[str, str]
+    body: bytes
+    timestamp: float
+
+    def validators(self) -> dict[str, str]:
+        """Determine the headers for revalidating this entry."""
+        headers = {}
+        if "etag" in self.headers:
+            headers["if-none-match"] = self.headers["etag"]
+        if "last-modified" in self.headers:
+            headers["if-modified-since"] = self.headers["last-modified"]
+        return headers
+
+    def to_response(self) -> requests.Response:
+        """Recreate the response with status 200 from this entry."""
+        response = requests.Response()
+        response.status_code = 200
+        response.url = self.url
+        response.headers = CaseInsensitiveDict(self.headers)
+        response.encoding = get_encoding_from_headers(response.headers)
+        response._content = self.body
+        return response
+
+
+class HttpCache:
+    """
+    A cache of HTTP responses in a directory. Entries younger than the TTL in
+    seconds are fresh and used as is. Older entries need to be revalidated with
+    the server. Once the entries' total size exceeds the maximum, the least
+    recently used ones are evicted.
+    """
+
+    def __init__(
+        self,
+        directory: str | Path,
+        *,
+        ttl: float = 10 * 60,
+        max_size: int = 256 * 1024 * 1024,
+    ) -> None:
+        self._directory = Path(directory)
+        self._ttl = ttl
+        self._max_size = max_size
+        self._size: None | int = None
+        self._lock = threading.Lock()
+        self.hits = self.revalidations = self.misses = 0
+
+    def _path(self, url: str) -> Path:
+        digest = hashlib.sha256(url.encode("utf8")).hexdigest()
+        return self._directory / f"{digest}.cache"
+
+    def is_fresh(self, entry: CacheEntry) -> bool:
+        return time.time() - entry.timestamp < self._ttl
+
+    def get(self, url: str) -> None | CacheEntry:
+        """Look up the entry for the URL, marking it as recently used."""
+        path = self._path(url)
+        try:
+            with open(path, mode="rb") as file:
+                meta = json.loads(file.readline())
+                body = file.read()
+            os.utime(path)
+        except (OSError, ValueError):
+            return None
+        if meta.get("url") != url:
+            return None
+        return CacheEntry(url, meta["headers"], body, meta["timestamp"])
+
+    def put(self, url: str, response: requests.Response) -> CacheEntry:
+        """Store the successful response for the URL."""
+        headers = {
+            key: response.headers[key]
+            for key in _CACHED_HEADERS
+            if key in response.headers
+        }
+        entry = CacheEntry(url, headers, response.content, time.time())
+        self._write(entry)
+        return entry
+
+    def refresh(self, entry: CacheEntry) -> CacheEntry:
+        """Restart the entry's TTL after the server confirmed it is unchanged."""
+        entry = entry._replace(timestamp=time.time())
+        self._write(entry)
+        return entry
+
+    def _write(self, entry: CacheEntry) -> None:
+        meta = {
+            "url": entry.url, "headers": entry.headers, "timestamp": entry.timestamp
+        }
+        data = json.dumps(meta).encode("utf8") + b"\n" + entry.body
+
+        path = self._path(entry.url)
+        self._directory.mkdir(parents=True, exist_ok=True)
+        temp_path = path.with_name(
+            f".{path.name}.{os.getpid()}.{threading.get_ident()}"
+        )
+        temp_path.write_bytes(data)
+
+        with self._lock:
+            size = self._current_size()
+            try:
+                size -= path.stat().st_size
+            except OSError:
+                pass
+            os.replace(temp_path, path)
+            self._size = size + len(data)
+            if self._size > self._max_size:
+                self._evict()
+
+    def _current_size(self) -> int:
+        if self._size is None:
+            self._size = sum(status.st_size for _, status in self._list_entries())
+        return self._size
+
+    def _list_entries(self) -> list[tuple[str, os.stat_result]]:
+        entries = []
+        try:
+            with os.scandir(self._directory) as iterator:
+                for item in iterator:
+                    if item.name.endswith(".cache") and not item.name.startswith("."):
+                        try:
+                            entries.append((item.path, item.stat()))
+                        except OSError:
+                            pass
+        except OSError:
+            pass
+        return entries
+
+    def _evict(self) -> None:
+        assert self._size is not None
+        # Evict down to 90% of the maximum, so eviction doesn't run on every write.
+        target = self._max_size * 9 // 10
+        entries = sorted(self._list_entries(), key=lambda e: e[1].st_mtime_ns)
+        for path, status in entries:
+            if self._size <= target:
+                break
+            try:
+                os.remove(path)
+            except OSError:
+                continue
+            self._size -= status.st_size
+
+    def hit(self, entry: CacheEntry) -> requests.Response:
+        """Use the fresh entry without any request."""
+        with self._lock:
+            self.hits += 1
+        return entry.to_response()
+
+    def update(
+        self, url: str, entry: None | CacheEntry, response: requests.Response
+    ) -> requests.Response:
+        """
+        Process the response to a request for the URL, which was conditional if
+        there is a stale entry. If the server responded with 304 Not Modified,
+        return the entry's response again. Otherwise, cache successful
+        responses and return them unchanged. Only stored responses count as
+        misses.
+        """
+        if response.status_code == 304 and entry is not None:
+            refreshed = self.refresh(entry)
+            with self._lock:
+                self.revalidations += 1
+            return refreshed.to_response()
+
+        if response.status_code == 200:
+            self.put(url, response)
+            with self._lock:
+                self.misses += 1
+        return response
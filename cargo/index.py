@@ -17,17 +17,24 @@ API. Relevant PEPs are:
   * [PEP 715](https://peps.python.org/pep-0715/) disallows `.egg` uploads.
 """
 
+from collections.abc import Iterable, Iterator
+from concurrent.futures import ThreadPoolExecutor
 import email.message
+from functools import lru_cache
+import html
 from html.parser import HTMLParser
 import json
 import logging
 import re
 import sys
+import threading
 import time
 from typing import cast, Literal, NamedTuple, TypedDict
 
 import requests
+from requests.adapters import HTTPAdapter
 
+from .httpcache import HttpCache
 from .name import canonicalize, split_hash
 from .version import Version
 
@@ -49,6 +56,10 @@ HEADERS = {
     "accept": ", ".join(ACCEPTABLE_CONTENT),
 }
 
+# Responses with these status codes are retried, after backing off
+RETRYABLE_STATUS = frozenset({429, 500, 502, 503, 504})
+TIMEOUT = 30.0
+
 PYPI_CONTENT_TYPES = re.compile(
     r"application/vnd.pypi.simple.v(?P<version>\d+)\+(?P<format>html|json)"
 )
@@ -112,23 +123,122 @@ def determine_format(content_type_header: str) -> tuple[None | str, None | str]:
     return cast(tuple[str, str], pypi_format.groups())
 
 
-def retrieve_metadata(name: str) -> None | ReleaseMetadata:
+class RateLimiter:
+    """
+    A thread-safe token bucket. It refills at the given rate per second and
+    holds at most capacity tokens, which bounds the size of bursts.
+    """
+
+    def __init__(self, rate: float, capacity: int = 1) -> None:
+        if rate <= 0 or capacity < 1:
+            raise ValueError(f"invalid rate {rate} or capacity {capacity}")
+        self._rate = rate
+        self._capacity = float(capacity)
+        self._tokens = float(capacity)
+        self._timestamp = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> None:
+        """Take a token, waiting until it becomes available if necessary."""
+        with self._lock:
+            now = time.monotonic()
+            elapsed = now - self._timestamp
+            self._tokens = min(self._capacity, self._tokens + elapsed * self._rate)
+            self._timestamp = now
+            # Going into debt reserves the token, so that waiters are served in
+            # order without polling.
+            self._tokens -= 1
+            delay = -self._tokens / self._rate
+        if delay > 0:
+            time.sleep(delay)
+
+
+def fetch(
+    session: requests.Session,
+    url: str,
+    *,
+    limiter: None | RateLimiter = None,
+    retries: int = 3,
+    backoff: float = 0.5,
+    cache: None | HttpCache = None,
+) -> requests.Response:
+    """
+    Get the URL. Retry connection errors, timeouts, and responses with transient
+    status codes up to the given number of times, with exponential backoff
+    unless the server asks for a specific delay via Retry-After. With a cache,
+    fresh responses are served from disk and stale ones are revalidated.
+    """
+    entry = None if cache is None else cache.get(url)
+    headers = HEADERS
+    if entry is not None:
+        assert cache is not None
+        if cache.is_fresh(entry):
+            return cache.hit(entry)
+        headers = HEADERS | entry.validators()
+
+    attempt = 0
+    while True:
+        if limiter is not None:
+            limiter.acquire()
+
+        delay = backoff * 2 ** attempt
+        try:
+            response = session.get(url, headers=headers, timeout=TIMEOUT)
+        except (requests.ConnectionError, requests.Timeout) as x:
+            if attempt >= retries:
+                raise
+            logger.debug('retrying "%s" after %s', url, x)
+        else:
+            if response.status_code not in RETRYABLE_STATUS or attempt >= retries:
+                if cache is not None:
+                    response = cache.update(url, entry, response)
+                response.raise_for_status()
+                return response
+            retry_after = response.headers.get("retry-after", "")
+            if retry_after.isdigit():
+                delay = min(float(retry_after), 60.0)
+            logger.debug('retrying "%s" after status %d', url, response.status_code)
+
+        time.sleep(delay)
+        attempt += 1
+
+
+def retrieve_metadata(
+    name: str,
+    *,
+    session: None | requests.Session = None,
+    limiter: None | RateLimiter = None,
+    retries: int = 3,
+    backoff: float = 0.5,
+    cache: None | HttpCache = None,
+    index: str = PACKAGE_INDEX,
+) -> None | ReleaseMetadata:
     """Retrieve metadata about the most recent wheel-based release."""
     name = canonicalize(name)
 
     # Fetch project JSON or page
     logger.debug('fetching package metadata for "%s"', name)
-    response = requests.get(f"{PACKAGE_INDEX}/{name}/", headers=HEADERS)
-    response.raise_for_status()
+    url = f"{index}/{name}/"
+    if session is None:
+        with requests.Session() as session:
+            response = fetch(
+                session, url, limiter=limiter, retries=retries, backoff=backoff,
+                cache=cache,
+            )
+    else:
+        response = fetch(
+            session, url, limiter=limiter, retries=retries, backoff=backoff,
+            cache=cache,
+        )
 
     content_type = response.headers.get("content-type", "")
     format = determine_format(content_type)[1]
     info: None | ReleaseMetadata
     match format:
         case "json":
-            info = ingest_json(response.json())
+            info = ingest_json_text(response.text)
         case "html":
-            info = ingest_html(response.text)
+            info = ingest_html(response.content, response.encoding or "utf8")
         case _:
             raise ValueError(
                 f'unrecognized content type "{content_type}" for package "{name}"'
@@ -140,12 +250,56 @@ def retrieve_metadata(name: str) -> None | ReleaseMetadata:
         info["version"] = str(info["version"])
         pep658 = "✅" if "core_metadata" in info else "❌"
         logger.info("%s %s v%s:", pep658, name, info["version"])
-        logger.info("    requires_pathon=%s", info["requires_python"])
+        logger.info("    requires_pathon=%s", info.get("requires_python"))
         logger.info("    filename=%s", info["filename"])
         logger.info("    href=%s", info["url"])
     return info
 
 
+def retrieve_all_metadata(
+    names: Iterable[str],
+    *,
+    workers: int = 8,
+    rate: float = 10.0,
+    retries: int = 3,
+    backoff: float = 0.5,
+    cache: None | HttpCache = None,
+    index: str = PACKAGE_INDEX,
+) -> dict[str, None | ReleaseMetadata]:
+    """
+    Retrieve metadata about the most recent wheel-based releases of many projects
+    concurrently. The workers share one session and hence one connection pool,
+    together issue at most rate requests per second, and retry transient
+    failures. Given a cache, they also share that cache. Projects whose metadata
+    cannot be retrieved map to None.
+    """
+    names = list(names)
+    limiter = RateLimiter(rate, capacity=workers)
+
+    with requests.Session() as session:
+        adapter = HTTPAdapter(pool_maxsize=workers)
+        session.mount("https://", adapter)
+        session.mount("http://", adapter)
+
+        def retrieve(name: str) -> None | ReleaseMetadata:
+            try:
+                return retrieve_metadata(
+                    name,
+                    session=session,
+                    limiter=limiter,
+                    retries=retries,
+                    backoff=backoff,
+                    cache=cache,
+                    index=index,
+                )
+            except (requests.RequestException, ValueError) as x:
+                logger.warning('Unable to retrieve metadata for "%s": %s', name, x)
+                return None
+
+        with ThreadPoolExecutor(workers) as executor:
+            return dict(zip(names, executor.map(retrieve, names)))
+
+
 # --------------------------------------------------------------------------------------
 
 
@@ -155,38 +309,147 @@ def ingest_json(data: dict[str, object]) -> None | ReleaseMetadata:
     if "meta" in data and isinstance(data["meta"], dict):
         api_version = data["meta"].get("api-version")
 
-    files = cast(list[ReleaseMetadata], data["files"])
+    latest = ingest_json_files(cast(list[dict[str, object]], data["files"]))
+    if api_version is not None and latest is not None:
+        latest["api_version"] = api_version
+    return latest
+
+
+def ingest_json_text(text: str) -> None | ReleaseMetadata:
+    """
+    Process the JSON text from PyPI's Simple Repository API. Unlike
+    `ingest_json()`, this function does not decode the entire document upfront.
+    It instead decodes one file at a time, which keeps memory consumption low
+    for projects with tens of thousands of files.
+    """
+    api_version = None
+    latest: None | ReleaseMetadata = None
+    for key, value in iter_json_object(text, "files"):
+        if key == "meta" and isinstance(value, dict):
+            api_version = value.get("api-version")
+        elif key == "files":
+            latest = ingest_json_files(cast(Iterator[dict[str, object]], value))
+
+    if api_version is not None and latest is not None:
+        latest["api_version"] = api_version
+    return latest
+
+
+def ingest_json_files(files: Iterable[dict[str, object]]) -> None | ReleaseMetadata:
+    """Determine the latest wheel amongst the files and its metadata."""
     latest: None | ReleaseMetadata = None
+    latest_file: None | dict[str, object] = None
 
     for file in files:
-        maybe_latest = find_latest_release(file["filename"], latest)
+        filename = file["filename"]
+        # Skip sdists and the like before parsing the version.
+        if not isinstance(filename, str) or not filename.rstrip().endswith(".whl"):
+            continue
+        maybe_latest = find_latest_release(filename, latest)
         if maybe_latest is None:
             continue
+        latest, latest_file = maybe_latest, file
 
-        latest = maybe_latest
-        for key, value in file.items():
+    # Only copy the attributes of the one file that made the cut.
+    if latest is not None:
+        assert latest_file is not None
+        for key, value in latest_file.items():
             if key == "hashes":
                 latest["hashes"] = cast(HashValue, value).copy()
             if key == "core-metadata" and isinstance(value, dict):
                 latest["core_metadata"] = cast(HashValue, value).copy()
             elif key in JSON_ATTRIBUTES:
                 latest[JSON_ATTRIBUTES[key]] = value  # type: ignore[literal-required]
-
-    if api_version is not None and latest is not None:
-        latest["api_version"] = api_version
     return latest
 
 
+_JSON_DECODER = json.JSONDecoder()
+_JSON_WHITESPACE = re.compile(r"[ \t\n\r]*")
+_JSON_ELEMENT_END = re.compile(r"[ \t\n\r]*([,\]])[ \t\n\r]*")
+
+
+def iter_json_object(text: str, lazy: str) -> Iterator[tuple[str, object]]:
+    """
+    Iterate over the members of the JSON object in the text, decoding each value
+    in turn. The member named lazy must have an array as its value, which is
+    returned as an iterator that decodes one element at a time. Any elements
+    not consumed before advancing to the next member are skipped.
+    """
+    def skip(index: int) -> int:
+        return cast(re.Match[str], _JSON_WHITESPACE.match(text, index)).end()
+
+    def expect(index: int, chars: str) -> tuple[str, int]:
+        char = text[index:index + 1]
+        if char == "" or char not in chars:
+            expected = " or ".join(f"'{c}'" for c in chars)
+            raise json.JSONDecodeError(f"Expecting {expected}", text, index)
+        return char, skip(index + 1)
+
+    def iter_array(index: int) -> Iterator[object]:
+        _, index = expect(index, "[")
+        if text[index:index + 1] != "]":
+            # Bind names locally, since this loop runs once per element.
+            decode, match_end = _JSON_DECODER.raw_decode, _JSON_ELEMENT_END.match
+            while True:
+                value, index = decode(text, index)
+                position[0] = index
+                yield value
+                if (end := match_end(text, index)) is None:
+                    raise json.JSONDecodeError(
+                        "Expecting ',' or ']'", text, skip(index)
+                    )
+                index = end.end()
+                if end.group(1) == "]":
+                    break
+        else:
+            index = skip(index + 1)
+        position[0] = index
+
+    position = [0]
+    _, index = expect(skip(0), "{")
+    if text[index:index + 1] == "}":
+        return
+    while True:
+        key, index = _JSON_DECODER.raw_decode(text, index)
+        if not isinstance(key, str):
+            raise json.JSONDecodeError("Expecting property name", text, index)
+        _, index = expect(skip(index), ":")
+        if key == lazy:
+            position[0] = index
+            elements = iter_array(index)
+            yield key, elements
+            for _ in elements:
+                pass
+            index = position[0]
+        else:
+            value, index = _JSON_DECODER.raw_decode(text, index)
+            index = skip(index)
+            yield key, value
+        char, index = expect(index, ",}")
+        if char == "}":
+            return
+
+
 # --------------------------------------------------------------------------------------
 
 
-def ingest_html(html: str) -> None | ReleaseMetadata:
-    """Process the HTML result from PyPI' Simple Repository API."""
-    parser = LinkParser()
-    parser.feed(html)
-    parser.close()
-    anchors = parser._anchors
-    api_version = parser._api_version
+def ingest_html(page: str | bytes, encoding: str = "utf8") -> None | ReleaseMetadata:
+    """
+    Process the HTML result from PyPI' Simple Repository API. If the page is
+    bytes, this function first tries the faster `scan_anchors()` and only
+    falls back on `LinkParser` if the page has an unusual shape.
+    """
+    if isinstance(page, bytes) and (scan := scan_anchors(page, encoding)) is not None:
+        api_version, anchors = scan
+    else:
+        if isinstance(page, bytes):
+            logger.debug("Falling back on LinkParser for unusual HTML page")
+            page = page.decode(encoding, errors="replace")
+        parser = LinkParser()
+        parser.feed(page)
+        parser.close()
+        anchors = parser._anchors
+        api_version = parser._api_version
 
     latest: None | ReleaseMetadata = None
     for filename, attributes in anchors:
@@ -215,6 +478,80 @@ class Anchor(NamedTuple):
     attributes: list[tuple[str, None | str]]
 
 
+_HTML_ATTRIBUTE_SYNTAX = r"""\s+([^\s"'<>/=]+)(?:\s*(=)\s*(?:"([^"]*)"|'([^']*)'))?"""
+_HTML_ATTRIBUTE = re.compile(_HTML_ATTRIBUTE_SYNTAX)
+# Only group the attributes as a whole, so that findall() returns two strings.
+_HTML_ATTRIBUTES = f"((?:{re.sub(r'[(](?![?])', '(?:', _HTML_ATTRIBUTE_SYNTAX)})*)"
+# Without re.I, which slows down matching.
+_HTML_ANCHOR = re.compile(f"<[aA]{_HTML_ATTRIBUTES}\\s*>([^<]*)</[aA]\\s*>")
+_HTML_ANCHOR_START = re.compile(r"<[aA][\s/>]")
+_HTML_ANCHOR_END = re.compile(r"</[aA]\s*>")
+_HTML_META = re.compile(f"<meta{_HTML_ATTRIBUTES}\\s*/?>", re.I)
+_HTML_META_START = re.compile(r"<meta[\s/>]", re.I)
+_HTML_COMMENT = re.compile(r"<!--.*?-->", re.S)
+# CDATA sections and raw text elements may hide or contain markup.
+_HTML_UNUSUAL = re.compile(r"<!\[|<script|<style", re.I)
+
+
+def scan_anchors(
+    page: bytes, encoding: str = "utf8"
+) -> None | tuple[None | str, list[Anchor]]:
+    """
+    Scan the HTML page for its API version and anchors with regular expressions.
+    Doing so is a few times faster than running `LinkParser`, but it only works
+    for pages with the simple shape mandated by PEP 503: Anchors must contain
+    nothing but text and their attribute values must be quoted. If the page has
+    any other shape, this function returns None.
+    """
+    text = page.decode(encoding, errors="replace")
+    # PyPI ends every page with a comment containing its serial number. Since
+    # comments without markup do not affect scanning, they may stay in place.
+    comments = _HTML_COMMENT.findall(text)
+    if (
+        text.count("<!--") != len(comments)
+        or any("<" in comment[4:] for comment in comments)
+        or _HTML_UNUSUAL.search(text) is not None
+    ):
+        return None
+
+    unescape = html.unescape
+
+    def parse_attributes(text: str) -> list[tuple[str, None | str]]:
+        return [
+            (
+                name.lower(),
+                None if not equals
+                else unescape(value) if "&" in (value := double or single)
+                else value,
+            )
+            for name, equals, double, single in _HTML_ATTRIBUTE.findall(text)
+        ]
+
+    api_version = None
+    metas = _HTML_META.findall(text)
+    for attribute_text in metas:
+        attributes = parse_attributes(attribute_text)
+        if ("name", "pypi:repository-version") in attributes:
+            for key, value in attributes:
+                if key == "content" and value is not None:
+                    api_version = value
+
+    anchors = []
+    for attribute_text, content in _HTML_ANCHOR.findall(text):
+        if "&" in content:
+            content = unescape(content)
+        anchors.append(Anchor(content, parse_attributes(attribute_text)))
+
+    # Every element must have been matched.
+    if (
+        len(_HTML_META_START.findall(text)) != len(metas)
+        or len(_HTML_ANCHOR_START.findall(text)) != len(anchors)
+        or len(_HTML_ANCHOR_END.findall(text)) != len(anchors)
+    ):
+        return None
+    return api_version, anchors
+
+
 class LinkParser(HTMLParser):
     """A parser for the project pages of PyPI's Simple Repository API."""
 
@@ -309,6 +646,17 @@ def parse_filename(filename: str) -> None | tuple[str, str, str]:
     return kind, name, version
 
 
+@lru_cache(maxsize=4096)
+def parse_version(version: str) -> Version:
+    """
+    Parse the version string. Since a project's releases typically comprise
+    several wheels for different platforms, this function memoizes its results,
+    effectively grouping files by version string and parsing each group's
+    version only once.
+    """
+    return Version(version)
+
+
 def find_latest_release(
     filename: str, latest_so_far: None | ReleaseMetadata
 ) -> None | ReleaseMetadata:
@@ -322,13 +670,17 @@ def find_latest_release(
         return None
 
     assert version is not None
-    version_object = Version(version)
-    if (
-        latest_so_far is not None and
-        version_object < latest_so_far["version"]
-    ) :
-        logger.debug("Skipping wheel %s < %s", version, latest_so_far["version"])
-        return None
+    version_object = parse_version(version)
+    if latest_so_far is not None:
+        latest_version = cast(Version, latest_so_far["version"])
+        # The same version string yields the same object, which need not be
+        # compared. Otherwise, comparing the keys avoids dispatch overhead.
+        if (
+            version_object is not latest_version
+            and version_object.key < latest_version.key
+        ):
+            logger.debug("Skipping wheel %s < %s", version, latest_version)
+            return None
 
     return {"filename": filename, "name": name, "version": version_object}
 
@@ -345,14 +697,17 @@ def main(args: list[str]) -> None:
     core_metadata_count = 0
 
     projects = [r['project'] for r in rows[:50]]
+    retrieved = retrieve_all_metadata(
+        (name for name in projects if name not in latest_releases),
+        cache=HttpCache("pypi-cache"),
+    )
     for name in projects:
         logger.info('Processing %s', name)
-        time.sleep(2.0)
 
         if name in latest_releases:
             release: None | ReleaseMetadata = latest_releases[name]
         else:
-            release = retrieve_metadata(name)
+            release = retrieved[name]
 
         if release is None:
             continue
@@ -316,6 +316,11 @@ class Version:
         """Return the version data."""
         return self._data
 
+    @property
+    def key(self) -> Key:
+        """Return the version key."""
+        return self._key
+
     @property
     def public_version(self) -> 'Version':
         """Return the same version but without a local segment."""
@@ -62,6 +62,9 @@ def run_tests(options: Options) -> int:
     for module in (
         'test.cargo_version',
         'test.cargo_extra',
+        'test.cargo_index',
+        'test.tsutsumu_bundle',
+        'test.tsutsumu_maker',
     ):
         console.detail(f'╭──── {module}')
         subprocess.run([*options.test_command(), 'run-test-module', module], check=True)
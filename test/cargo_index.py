@@ -0,0 +1,294 @@
+from collections.abc import Iterator
+from contextlib import contextmanager
+import hashlib
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+import json
+import logging
+import os
+from tempfile import TemporaryDirectory
+import threading
+import time
+from typing import cast
+
+import requests
+
+from .console import Console
+from cargo.httpcache import HttpCache
+from cargo.index import (
+    ingest_html,
+    ingest_json,
+    ingest_json_text,
+    iter_json_object,
+    LinkParser,
+    parse_version,
+    RateLimiter,
+    retrieve_all_metadata,
+    retrieve_metadata,
+    scan_anchors,
+)
+
+
+PROJECTS = {
+    "spam": ["spam-1.0-py3-none-any.whl", "spam-1.1-py3-none-any.whl"],
+    "bacon": ["bacon-2.0.tar.gz", "bacon-2.0-py3-none-any.whl"],
+    "ham": ["ham-0.9-py3-none-any.whl"],
+}
+
+
+class IndexHandler(BaseHTTPRequestHandler):
+    """A stand-in for PyPI's JSON-based Simple Repository API."""
+
+    # Paths and the number of times they have been requested
+    requests: dict[str, int] = {}
+    lock = threading.Lock()
+
+    def do_GET(self) -> None:
+        with self.lock:
+            count = self.requests[self.path] = self.requests.get(self.path, 0) + 1
+
+        name = self.path.strip("/").split("/")[-1]
+        if name == "flaky":
+            if count == 1:
+                self.send_error(503)
+                return
+            files = ["flaky-3.0-py3-none-any.whl"]
+        else:
+            files = PROJECTS.get(name)
+        if files is None:
+            self.send_error(404)
+            return
+
+        body = json.dumps({
+            "meta": {"api-version": "1.1"},
+            "name": name,
+            "files": [
+                {"filename": file, "url": f"/files/{file}", "hashes": {}}
+                for file in files
+            ],
+        }).encode("utf8")
+        etag = f'"{hashlib.sha256(body).hexdigest()[:16]}"'
+        if self.headers.get("if-none-match") == etag:
+            self.send_response(304)
+            self.send_header("etag", etag)
+            self.end_headers()
+            return
+
+        self.send_response(200)
+        self.send_header("content-type", "application/vnd.pypi.simple.v1+json")
+        self.send_header("content-length", str(len(body)))
+        self.send_header("etag", etag)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format: str, *args: object) -> None:
+        pass
+
+
+@contextmanager
+def index_server() -> Iterator[str]:
+    IndexHandler.requests = {}
+    server = ThreadingHTTPServer(("127.0.0.1", 0), IndexHandler)
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    try:
+        yield f"http://127.0.0.1:{server.server_address[1]}/simple"
+    finally:
+        server.shutdown()
+        server.server_close()
+
+
+def test_retrieve_metadata(console: Console) -> None:
+    with index_server() as index:
+        release = retrieve_metadata("Spam", index=index)
+        assert release is not None
+        console.assert_eq(release["filename"], "spam-1.1-py3-none-any.whl")
+        console.assert_eq(release["version"], "1.1")
+        console.assert_eq(release["api_version"], "1.1")
+
+
+def test_retrieve_all_metadata(console: Console) -> None:
+    with index_server() as index:
+        names = ["spam", "bacon", "ham", "flaky", "tofu"]
+        # Keep the warning about tofu's 404 out of the test output.
+        logger = logging.getLogger("cargo.index")
+        logger.disabled = True
+        try:
+            releases = retrieve_all_metadata(
+                names, workers=4, rate=100.0, backoff=0.01, index=index
+            )
+        finally:
+            logger.disabled = False
+        console.assert_eq(list(releases), names)
+        console.assert_eq(
+            {name: None if r is None else r["version"] for name, r in releases.items()},
+            {"spam": "1.1", "bacon": "2.0", "ham": "0.9", "flaky": "3.0", "tofu": None},
+        )
+        console.assert_eq(IndexHandler.requests["/simple/flaky/"], 2)
+        console.assert_eq(IndexHandler.requests["/simple/tofu/"], 1)
+
+
+def test_ingest_json_text(console: Console) -> None:
+    page = {
+        "meta": {"api-version": "1.1"},
+        "name": "spam",
+        "files": [
+            {"filename": "spam-1.0.tar.gz", "url": "/0", "hashes": {"sha256": "0"}},
+            {"filename": "spam-1.0-py3-none-any.whl", "url": "/1", "hashes": {}},
+            {
+                "filename": "spam-2.0-py3-none-any.whl",
+                "url": "/2",
+                "hashes": {"sha256": "2"},
+                "requires-python": ">=3.10",
+                "core-metadata": {"sha256": "m"},
+            },
+            {"filename": "spam-1.5-py3-none-any.whl", "url": "/3", "hashes": {}},
+            {"filename": "spam-2.0.zip", "url": "/4", "hashes": {}},
+        ],
+        "versions": ["1.0", "1.5", "2.0"],
+    }
+    expected = ingest_json(page)
+    assert expected is not None
+    console.assert_eq(expected["filename"], "spam-2.0-py3-none-any.whl")
+    console.assert_eq(expected["core_metadata"], {"sha256": "m"})
+    console.assert_eq(ingest_json_text(json.dumps(page)), expected)
+    console.assert_eq(ingest_json_text(json.dumps(page, indent=2)), expected)
+
+    # Skipping unconsumed elements.
+    members = iter_json_object(' { "files" : [ 1 , [2] , {} ] , "x" : 4 } ', "files")
+    key, elements = next(members)
+    console.assert_eq(key, "files")
+    console.assert_eq(next(cast(Iterator[object], elements)), 1)
+    console.assert_eq(list(members), [("x", 4)])
+
+    for text in ('{"files": [1 2]}', '[]', '{"files": [], }'):
+        try:
+            for _, value in iter_json_object(text, "files"):
+                pass
+        except ValueError:
+            pass
+        else:
+            console.assert_eq(f"{text} is malformed", None)
+
+
+def test_parse_version_once(console: Console) -> None:
+    platforms = [f"cp3{minor}-cp3{minor}-manylinux_2_17_x86_64" for minor in range(30)]
+    page = {
+        "meta": {"api-version": "1.1"},
+        "name": "eggs",
+        "files": [
+            {"filename": f"eggs-{version}-{platform}.whl", "url": "/", "hashes": {}}
+            for version in ("1.0", "1.1", "1.0.1")
+            for platform in platforms
+        ],
+    }
+    parse_version.cache_clear()
+    release = ingest_json_text(json.dumps(page))
+    assert release is not None
+    console.assert_eq(release["filename"], f"eggs-1.1-{platforms[-1]}.whl")
+    console.assert_eq(parse_version.cache_info().misses, 3)
+
+
+HTML_PAGE = b"""<!DOCTYPE html>
+<html>
+  <head>
+    <meta name="pypi:repository-version" content="1.1">
+    <title>Links for spam</title>
+  </head>
+  <body>
+    <h1>Links for spam</h1>
+    <a href="/spam-1.0.tar.gz#sha256=00" data-requires-python="&gt;=3.7">spam-1.0.tar.gz</a><br />
+    <A HREF='/spam-1.1-py3-none-any.whl#sha256=11' data-core-metadata="sha256=ab" data-yanked>spam-1.1-py3-none-any.whl</A ><br/>
+    <a href="/spam-0.9-py3-none-any.whl"  >  spam&#45;0.9-py3-none-any.whl </a>
+  </body>
+</html>
+<!--SERIAL 665-->
+"""
+
+UNUSUAL_HTML_PAGES = (
+    b'<a href=/spam-1.0-py3-none-any.whl>spam-1.0-py3-none-any.whl</a>',
+    b'<a href="/spam-1.0-py3-none-any.whl"><b>spam-1.0-py3-none-any.whl</b></a>',
+    b'<script>"<a href=/spam-1.0-py3-none-any.whl>"</script>',
+    b'<a href="/spam-1.0-py3-none-any.whl" /> ',
+    b'<a href="/spam-1.0-py3-none-any.whl">spam<!-- -->',
+    b'<!-- <a href="/spam-1.0-py3-none-any.whl">spam-1.0-py3-none-any.whl</a> -->',
+)
+
+
+def parse_links(page: bytes) -> tuple[None | str, list[object]]:
+    parser = LinkParser()
+    parser.feed(page.decode("utf8"))
+    parser.close()
+    return parser.version, list(parser.anchors)
+
+
+def test_scan_anchors(console: Console) -> None:
+    scan = scan_anchors(HTML_PAGE)
+    console.assert_eq(scan, parse_links(HTML_PAGE))
+    assert scan is not None
+    console.assert_eq(scan[0], "1.1")
+    console.assert_eq(len(scan[1]), 3)
+    console.assert_eq(scan[1][0].attributes[1], ("data-requires-python", ">=3.7"))
+    console.assert_eq(scan[1][1].attributes[2], ("data-yanked", None))
+
+    release = ingest_html(HTML_PAGE)
+    assert release is not None
+    console.assert_eq(release["filename"], "spam-1.1-py3-none-any.whl")
+    console.assert_eq(release["hashes"], {"sha256": "11"})
+    console.assert_eq(release, ingest_html(HTML_PAGE.decode("utf8")))
+
+    # Keep the warning about the self-closing anchor out of the test output.
+    logger = logging.getLogger("cargo.index")
+    logger.disabled = True
+    try:
+        for page in UNUSUAL_HTML_PAGES:
+            console.assert_op("is_", scan_anchors(page), None)
+            # Falling back on LinkParser yields the same result as using it.
+            console.assert_eq(ingest_html(page), ingest_html(page.decode("utf8")))
+    finally:
+        logger.disabled = False
+
+
+def test_rate_limiter(console: Console) -> None:
+    limiter = RateLimiter(50.0, capacity=2)
+    start = time.monotonic()
+    for _ in range(7):
+        limiter.acquire()
+    duration = time.monotonic() - start
+    # Two tokens are available right away, the other five take 20 ms each.
+    console.assert_op("ge", duration, 0.09)
+    console.assert_op("lt", duration, 0.5)
+
+
+def test_http_cache(console: Console) -> None:
+    with index_server() as index, TemporaryDirectory() as tmpdir:
+        # A fresh entry is used without request.
+        cache = HttpCache(tmpdir)
+        for _ in range(2):
+            release = retrieve_metadata("spam", cache=cache, index=index)
+            assert release is not None
+            console.assert_eq(release["version"], "1.1")
+        console.assert_eq(IndexHandler.requests["/simple/spam/"], 1)
+        console.assert_eq((cache.hits, cache.revalidations, cache.misses), (1, 0, 1))
+
+        # A stale entry is revalidated.
+        cache = HttpCache(tmpdir, ttl=0)
+        release = retrieve_metadata("spam", cache=cache, index=index)
+        assert release is not None
+        console.assert_eq(release["version"], "1.1")
+        console.assert_eq(IndexHandler.requests["/simple/spam/"], 2)
+        console.assert_eq((cache.hits, cache.revalidations, cache.misses), (0, 1, 0))
+
+        # Adding entries beyond the maximum size evicts the least recently used.
+        size = sum(entry.stat().st_size for entry in os.scandir(tmpdir))
+        cache = HttpCache(tmpdir, max_size=size * 3 // 2)
+        retrieve_all_metadata(["bacon", "ham"], cache=cache, index=index)
+        console.assert_op("lt", len(os.listdir(tmpdir)), 3)
+        console.assert_op("is_", cache.get(f"{index}/spam/"), None)
+
+        # Responses that aren't stored don't count as misses.
+        cache = HttpCache(tmpdir)
+        response = requests.Response()
+        response.status_code = 404
+        updated = cache.update(f"{index}/tofu/", None, response)
+        console.assert_op("is_", updated, response)
+        console.assert_eq((cache.hits, cache.revalidations, cache.misses), (0, 0, 0))
@@ -0,0 +1,315 @@
+import os
+from pathlib import Path
+import shutil
+import sys
+from tempfile import TemporaryDirectory
+from typing import cast
+
+from .console import Console
+from tsutsumu.bundle import Bundle, Toolbox
+from tsutsumu.maker import BundleMaker
+
+
+def make_can(tmpdir: str, **options: bool) -> Path:
+    path = Path(tmpdir) / 'can.py'
+    BundleMaker(['spam'], output=path, **options).run()
+    return path
+
+
+def test_bytecode_cache(console: Console) -> None:
+    dont_write_bytecode = sys.dont_write_bytecode
+    sys.dont_write_bytecode = False
+    try:
+        check_bytecode_cache(console)
+    finally:
+        sys.dont_write_bytecode = dont_write_bytecode
+
+
+def check_bytecode_cache(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        can = make_can(tmpdir)
+        cache_dir = os.path.join(tmpdir, 'cache')
+        version, manifest = Toolbox.load_meta_data(can)
+
+        bundle = Bundle(can, version, manifest, cache_dir=cache_dir)
+        code = bundle.get_code('spam.bacon')
+        entries = os.listdir(cache_dir)
+        console.assert_eq(len(entries), 1)
+
+        # A fresh bundle reads the code object back from the cache.
+        bundle = Bundle(can, version, manifest, cache_dir=cache_dir)
+        cache_path = bundle._get_cache_path(bundle.get_filename('spam.bacon'))
+        console.assert_eq(cache_path, os.path.join(cache_dir, entries[0]))
+        assert cache_path is not None
+        console.assert_eq(bundle._read_cached_code(cache_path), code)
+
+        # Changing the bundle script invalidates the cache.
+        with open(can, mode='ab') as file:
+            file.write(b'\n')
+        bundle = Bundle(can, version, manifest, cache_dir=cache_dir)
+        cache_path = bundle._get_cache_path(bundle.get_filename('spam.bacon'))
+        assert cache_path is not None
+        console.assert_eq(bundle._read_cached_code(cache_path), None)
+
+
+def test_precompiled_code(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        can = make_can(tmpdir, precompile=True)
+        version, manifest = Toolbox.load_meta_data(can)
+        tag = sys.implementation.cache_tag
+        console.assert_eq(manifest[f'spam/__pycache__/bacon.{tag}.pyc'][0], 'c')
+
+        bundle = Bundle(can, version, manifest)
+        path = bundle.get_filename('spam.bacon')
+        code = bundle._get_precompiled_code(path)
+        console.assert_op('is_not', code, None)
+        assert code is not None
+        console.assert_eq(code.co_filename, path)
+        console.assert_eq(bundle.get_code('spam.bacon'), code)
+
+
+def test_shared_reads(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        can = make_can(tmpdir)
+        version, manifest = Toolbox.load_meta_data(can)
+        bundle = Bundle(can, version, manifest)
+
+        for key in manifest:
+            kind, offset, length = manifest[key]
+            expected = Toolbox.load_from_bundle(can, kind, offset, length)
+            console.assert_eq(bundle[os.path.join(can, key)], expected)
+            if key == 'spam/__init__.py':
+                file = bundle._file
+        console.assert_op('is_', bundle._file, file)
+
+        bundle.close()
+        console.assert_eq(bundle._file, None)
+        html = bundle.get_data(os.path.join(can, 'spam', 'ham.html'))
+        console.assert_eq(html[-5:-1], b'Ham!')
+        bundle.close()
+
+
+def test_uninstall_with_live_slice(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        can = make_can(tmpdir)
+        ham = os.path.join(can, 'spam', 'ham.html')
+        bundle = Bundle.install_from_file(can)
+        try:
+            kind, offset, length = bundle._manifest[ham]
+            data = bundle._read(offset, length)
+            expected = Toolbox.load_from_bundle(can, kind, offset, length)
+            console.assert_eq(Toolbox.decode(kind, data), expected)
+        finally:
+            bundle.uninstall()
+
+        console.assert_eq(bundle in sys.meta_path, False)
+        console.assert_eq(bundle._file, None)
+        console.assert_eq(Toolbox.decode(kind, data), expected)
+        del data
+
+        console.assert_eq(bundle.get_data(ham), expected)
+        bundle.close()
+
+
+def test_module_index(console: Console) -> None:
+    script = os.path.abspath('index.py')
+    bundle = Bundle(script, '0.0.0', {
+        'ns/pkg/__init__.py': ('t', 0, 0),
+        'ns/pkg/mod.py': ('t', 0, 0),
+        'ns/pkg.py': ('t', 0, 0),
+        'ns/data.txt': ('t', 0, 0),
+        'top.py': ('t', 0, 0),
+    })
+
+    def path(*segments: str) -> str:
+        return os.path.join(script, *segments)
+
+    console.assert_eq(bundle._toplevel, {'ns', 'top'})
+    console.assert_eq(bundle._locate('top'), (path('top.py'), None))
+    console.assert_eq(bundle._locate('ns'), (path('ns'), path('ns')))
+    console.assert_eq(
+        bundle._locate('ns.pkg'), (path('ns', 'pkg', '__init__.py'), path('ns', 'pkg')))
+    console.assert_eq(
+        bundle._locate('ns.pkg.mod', [path('ns', 'pkg')]),
+        (path('ns', 'pkg', 'mod.py'), None),
+    )
+    console.assert_eq(bundle.find_spec('ns.pkg.mod', ['elsewhere']), None)
+    console.assert_eq(bundle.find_spec('ns.data'), None)
+    console.assert_eq(bundle.find_spec('json'), None)
+
+
+def test_compact_manifest(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        expected = Toolbox.load_meta_data(make_can(tmpdir))
+        can = make_can(tmpdir, compact_manifest=True)
+        with open(can, mode='rb') as file:
+            console.assert_eq(Toolbox.load_compact_meta_data(file), expected)
+        console.assert_eq(Toolbox.load_meta_data(can), expected)
+
+
+def test_section_offsets(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        can = make_can(tmpdir)
+        with open(can, mode='rb') as file:
+            offsets = Toolbox.find_section_offsets_in_file(file)
+        console.assert_eq(offsets, Toolbox.find_section_offsets(can.read_bytes()))
+        expected = Toolbox.load_meta_data(can)
+
+        can = make_can(tmpdir, bundle_only=True)
+        with open(can, mode='rb') as file:
+            offsets = Toolbox.find_section_offsets_in_file(file)
+        console.assert_eq(offsets[:2], (-1, -1))
+        console.assert_eq(Toolbox.load_meta_data(can), expected)
+
+
+def test_rules_in_content(console: Console) -> None:
+    rules = (Toolbox.HEAVY_RULE + Toolbox.PLAIN_RULE).decode('ascii')
+    with TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / 'ruled'
+        root.mkdir()
+        (root / '__init__.py').write_text(
+            f'{rules}RULES = """\n{rules}"""\n{rules}', encoding='utf8')
+        (root / 'rules.txt').write_text(
+            f'{rules}__version__ = "0.0.0"\n{rules}', encoding='utf8')
+        (root / '__main__.py').write_text(f'{rules}import ruled\n', encoding='utf8')
+
+        for bundle_only in (False, True):
+            can = Path(tmpdir) / 'can.py'
+            BundleMaker([root], output=can, bundle_only=bundle_only).run()
+            data = can.read_bytes()
+            offsets = Toolbox.find_section_offsets(data)
+            with open(can, mode='rb') as file:
+                console.assert_eq(Toolbox.find_section_offsets_in_file(file), offsets)
+            console.assert_eq(offsets[0] < 0, bundle_only)
+            meta_data = offsets[0] if offsets[0] >= 0 else offsets[2]
+            console.assert_op(
+                'gt', meta_data, data.rfind(rules.encode('ascii') + b'__version__'))
+
+            version, manifest = Toolbox.load_meta_data(can)
+            bundle = Bundle(can, version, manifest)
+            for name in ('__init__.py', '__main__.py', 'rules.txt'):
+                content = bundle[os.path.join(can, 'ruled', name)]
+                console.assert_eq(content, (root / name).read_bytes())
+            bundle.close()
+
+
+def test_data_cache(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        can = make_can(tmpdir)
+        version, manifest = Toolbox.load_meta_data(can)
+        ham = os.path.join(can, 'spam', 'ham.html')
+        bacon = os.path.join(can, 'spam', 'bacon.jpg')
+
+        bundle = Bundle(can, version, manifest, data_cache_size=10_500)
+        data = bundle.get_data(ham)
+        console.assert_op('is_', bundle.get_data(ham), data)
+        console.assert_eq((bundle.data_cache_hits, bundle.data_cache_misses), (1, 1))
+
+        # The image pushes the total size over the limit and evicts the page.
+        bundle.get_data(bacon)
+        bundle.get_data(ham)
+        console.assert_eq((bundle.data_cache_hits, bundle.data_cache_misses), (1, 3))
+        console.assert_eq(list(bundle._data_cache), [ham])
+
+        bundle = Bundle(can, version, manifest, data_cache_size=0)
+        bundle.get_data(ham)
+        bundle.get_data(ham)
+        console.assert_eq((bundle.data_cache_hits, bundle.data_cache_misses), (0, 2))
+        bundle.close()
+
+
+def test_decode_text(console: Console) -> None:
+    for literal in (
+        b'b"print(\'spam\')\\n"',
+        b'b"tab\\tquote\\x22backslash\\\\\\n"',
+        b'b"""line\nanother line\n"""',
+        b'b"""caf\\xc3\\xa9\n\\x22quoted\\x22\n"""',
+        b"b'single quotes fall back on eval'",
+    ):
+        console.assert_eq(Toolbox.decode_text(literal), eval(literal))
+        console.assert_eq(Toolbox.decode_text(memoryview(literal)), eval(literal))
+
+    path = Path('bundles/bundler.py')
+    for kind, offset, length in Toolbox.load_meta_data(path)[1].values():
+        if kind == 't' and length > 0:
+            literal = Toolbox.read(path, offset, length)
+            console.assert_eq(Toolbox.decode_text(literal), eval(literal))
+
+
+def test_compressed_entries(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / 'spam'
+        shutil.copytree('spam', root)
+        table = ''.join(f'{n},{n * n},{n ** 0.5:.6f}\n' for n in range(20_000))
+        (root / 'table.txt').write_text(table, encoding='utf8')
+        # Both fit on a single line of the bundle.
+        (root / 'crumb.txt').write_text('a' * 300 + '\n', encoding='utf8')
+        (root / 'crumb.jpg').write_bytes(bytes(range(20)))
+        can = Path(tmpdir) / 'can.py'
+        BundleMaker([root], output=can, compress_threshold=0.8).run()
+
+        version, manifest = Toolbox.load_meta_data(can)
+        console.assert_eq(manifest['spam/table.txt'][0], 'z')
+        console.assert_eq(manifest['spam/crumb.txt'][0], 'z')
+        console.assert_eq(manifest['spam/bacon.jpg'][0], 'b')
+        console.assert_eq(manifest['spam/bacon.py'][0], 't')
+
+        bundle = Bundle(can, version, manifest)
+        data = bundle.get_data(os.path.join(can, 'spam', 'table.txt'))
+        console.assert_eq(data, table.encode('utf8'))
+        crumb = bundle.get_data(os.path.join(can, 'spam', 'crumb.txt'))
+        console.assert_eq(crumb, b'a' * 300 + b'\n')
+        crumb = bundle.get_data(os.path.join(can, 'spam', 'crumb.jpg'))
+        console.assert_eq(crumb, bytes(range(20)))
+
+        # Decompress block by block as well.
+        kind, offset, length = manifest['spam/table.txt']
+        encoded = Toolbox.read(can, offset, length)
+        threshold, block_size = Toolbox.STREAMING_THRESHOLD, Toolbox.STREAMING_BLOCK_SIZE
+        Toolbox.STREAMING_THRESHOLD, Toolbox.STREAMING_BLOCK_SIZE = 1_000, 1_000
+        try:
+            console.assert_eq(Toolbox.decode(kind, encoded), data)
+        finally:
+            Toolbox.STREAMING_THRESHOLD, Toolbox.STREAMING_BLOCK_SIZE = (
+                threshold, block_size)
+        bundle.close()
+
+
+def test_verification(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        can = make_can(tmpdir)
+        version, manifest = Toolbox.load_meta_data(can)
+        start, stop, _ = Toolbox.find_section_offsets(can.read_bytes())
+        bindings: dict[str, object] = {}
+        exec(can.read_bytes()[start:stop], bindings)
+        digests = cast('dict[str, str]', bindings['__digests__'])
+
+        bundle = Bundle(can, version, manifest, digests=digests, verify=True)
+        ham = os.path.join(can, 'spam', 'ham.html')
+        bundle[ham]
+        bundle[ham]
+        console.assert_eq(bundle.verified_entries, 1)
+        console.assert_op('gt', bundle.verification_time, 0)
+        bundle.get_code('spam.bacon')
+        console.assert_eq(bundle.verified_entries, 2)
+        bundle.close()
+
+        # Tamper with the bacon.
+        data = can.read_bytes().replace(b"'spam/bacon.py'", b"'spam/bacon.PY'", 1)
+        can.write_bytes(data)
+        bundle = Bundle(can, version, manifest, digests=digests, verify=True)
+        try:
+            bundle.get_code('spam.bacon')
+            console.assert_eq('no ImportError', 'ImportError')
+        except ImportError:
+            pass
+        console.assert_eq(bundle.verified_entries, 0)
+        bundle[ham]
+        console.assert_eq(bundle.verified_entries, 1)
+        bundle.close()
+
+        try:
+            Bundle(can, version, manifest, digests={}, verify=True)
+            console.assert_eq('no ValueError', 'ValueError')
+        except ValueError:
+            pass
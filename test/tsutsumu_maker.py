@@ -0,0 +1,307 @@
+from collections.abc import Iterator
+from contextlib import redirect_stderr
+import hashlib
+import io
+import marshal
+import os
+from pathlib import Path
+import shutil
+import subprocess
+import sys
+from tempfile import TemporaryDirectory
+import threading
+import time
+from typing import Callable, cast
+import zipfile
+
+from .console import Console
+from tsutsumu.bundle import Toolbox
+from tsutsumu.maker import BundledFile, BundleMaker, EncodingCache, FileKind
+
+
+class FailingMaker(BundleMaker):
+    def emit_meta_data(self) -> Iterator[bytes]:
+        raise RuntimeError('bundle maker failed on purpose')
+
+
+def test_atomic_output(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        output = Path(tmpdir) / 'can.py'
+        output.write_bytes(b'old can')
+
+        try:
+            FailingMaker(['spam'], output=output).run()
+        except RuntimeError:
+            pass
+        console.assert_eq(output.read_bytes(), b'old can')
+        console.assert_eq(os.listdir(tmpdir), ['can.py'])
+
+        BundleMaker(['spam'], output=output).run()
+        console.assert_eq(output.read_bytes()[:2], b'#!')
+        console.assert_eq(os.listdir(tmpdir), ['can.py'])
+
+        # Rebuilding preserves the executable bit and the symlink to the output.
+        output.chmod(0o755)
+        link = Path(tmpdir) / 'link.py'
+        link.symlink_to(output)
+        BundleMaker(['spam'], output=link).run()
+        console.assert_eq(output.stat().st_mode & 0o777, 0o755)
+        console.assert_op('is_', link.is_symlink(), True)
+        console.assert_eq(sorted(os.listdir(tmpdir)), ['can.py', 'link.py'])
+
+
+def test_writeall(console: Console) -> None:
+    stdout = sys.stdout
+    buffer = io.BytesIO()
+    sys.stdout = wrapper = io.TextIOWrapper(buffer, encoding='utf8')
+    try:
+        print('before')
+        BundleMaker.writeall([b'caf\xc3\xa9\n', b'\xff\n'])
+        print('after')
+        wrapper.flush()
+    finally:
+        sys.stdout = stdout
+        wrapper.detach()
+    console.assert_eq(buffer.getvalue(), b'before\ncaf\xc3\xa9\n\xff\nafter\n')
+
+
+def test_parallel_encoding(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        serial = Path(tmpdir) / 'serial.py'
+        parallel = Path(tmpdir) / 'parallel.py'
+        roots = ['tsutsumu', 'cargo', 'spam']
+        BundleMaker(roots, main='spam', output=serial).run()
+        BundleMaker(roots, main='spam', output=parallel, jobs=4).run()
+        console.assert_eq(serial.read_bytes(), parallel.read_bytes())
+
+
+def test_incremental_encoding(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / 'spam'
+        shutil.copytree('spam', root)
+        output = Path(tmpdir) / 'can.py'
+        fresh_output = Path(tmpdir) / 'fresh-can.py'
+        cache_path = Path(tmpdir) / 'cache.json'
+
+        def build() -> EncodingCache:
+            cache = EncodingCache(cache_path)
+            BundleMaker([root], output=output, encoding_cache=cache).run()
+            BundleMaker([root], output=fresh_output).run()
+            console.assert_eq(output.read_bytes(), fresh_output.read_bytes())
+            return cache
+
+        cache = build()
+        console.assert_eq((cache.hits, cache.misses), (0, 5))
+        cache = build()
+        console.assert_eq((cache.hits, cache.misses), (5, 0))
+
+        with open(root / 'bacon.py', mode='a', encoding='utf8') as file:
+            file.write('print("more bacon")\n')
+        cache = build()
+        console.assert_eq((cache.hits, cache.misses), (4, 1))
+
+        # A file modified between encoding and caching is a miss next time.
+        # Modules and their code objects have separate entries.
+        cache_path.unlink()
+        for hits_and_misses in [(0, 8), (8, 0)]:
+            cache = EncodingCache(cache_path)
+            BundleMaker(
+                [root], output=output, encoding_cache=cache, precompile=True).run()
+            console.assert_eq((cache.hits, cache.misses), hits_and_misses)
+
+        bacon = root / 'bacon.py'
+        file = BundledFile(FileKind.TEXT, bacon, 'spam/bacon.py')
+        encoding, status = BundleMaker.encode_file_with_status(
+            file.kind, file.path, file.key)
+        bacon.write_text('print("no more bacon")\n', encoding='utf8')
+        cache = EncodingCache()
+        cache.put(file, encoding, status)
+        console.assert_op('is_', cache.get(file), None)
+
+
+def test_tree_shaking(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / 'app'
+        for key, content in {
+            '__init__.py': '',
+            '__main__.py': 'from . import cli\n',
+            'cli.py': 'def main():\n    from .core import engine\n',
+            'core/__init__.py': 'import json\n',
+            'core/engine.py': 'from ..util.text import wrap\n',
+            'core/schema.json': '{}',
+            'util/__init__.py': '',
+            'util/text.py': '',
+            'util/unused.py': 'import app.plugins.extra\n',
+            'plugins/__init__.py': '',
+            'plugins/extra.py': '',
+            'plugins/extra.txt': '',
+            'templates/page.html': '',
+        }.items():
+            path = root / key
+            path.parent.mkdir(parents=True, exist_ok=True)
+            path.write_text(content, encoding='utf8')
+
+        maker = BundleMaker([root])
+        files = sorted(maker.list_files(), key=lambda f: f.key)
+        kept, dropped = maker.shake_tree(files, maker.select_main(files))
+        console.assert_eq([file.key for file in kept], [
+            'app/__init__.py',
+            'app/__main__.py',
+            'app/cli.py',
+            'app/core/__init__.py',
+            'app/core/engine.py',
+            'app/core/schema.json',
+            'app/templates/page.html',
+            'app/util/__init__.py',
+            'app/util/text.py',
+        ])
+        console.assert_eq([file.key for file in dropped], [
+            'app/plugins/__init__.py',
+            'app/plugins/extra.py',
+            'app/plugins/extra.txt',
+            'app/util/unused.py',
+        ])
+
+        maker = BundleMaker([root], keep=['app.plugins'])
+        kept, dropped = maker.shake_tree(files, 'app')
+        console.assert_eq([file.key for file in dropped], ['app/util/unused.py'])
+
+
+def wait_for(condition: 'Callable[[], bool]', timeout: float = 10) -> bool:
+    deadline = time.monotonic() + timeout
+    while not condition():
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+
+def test_watch(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / 'spam'
+        shutil.copytree('spam', root)
+        (root / 'unused.py').write_text('', encoding='utf8')
+        # An output inside a watched directory must not trigger rebuilds.
+        output = root / 'can.py'
+        maker = BundleMaker([root], output=output, tree_shake=True)
+
+        stop = threading.Event()
+        thread = threading.Thread(
+            target=maker.watch, kwargs=dict(interval=0.01, settle=0.01, stop=stop))
+        log = io.StringIO()
+        with redirect_stderr(log):
+            thread.start()
+            try:
+                console.assert_eq(wait_for(output.exists), True)
+                (root / 'bacon.py').write_text('print("more bacon")\n', encoding='utf8')
+                console.assert_eq(
+                    wait_for(lambda: b'more bacon' in output.read_bytes()), True)
+                time.sleep(0.2)
+            finally:
+                stop.set()
+                thread.join(10)
+        console.assert_eq(thread.is_alive(), False)
+
+        lines = log.getvalue().splitlines()
+        console.assert_eq(sum(line.startswith('Rebuilt') for line in lines), 2)
+        console.assert_eq(
+            [line for line in lines if line.startswith('Tree shaking')],
+            ['Tree shaking dropped 1 files'],
+        )
+        _, manifest = Toolbox.load_meta_data(output)
+        console.assert_eq('spam/can.py' in manifest, False)
+
+
+def test_zipapp(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        output = Path(tmpdir) / 'spam.pyz'
+        BundleMaker(['spam'], format='zipapp', output=output, precompile=True).run()
+        with zipfile.ZipFile(output) as archive:
+            names = archive.namelist()
+            console.assert_eq(names[:2], ['__main__.py', '__main__.pyc'])
+            console.assert_eq(
+                archive.read('spam/bacon.jpg'), Path('spam/bacon.jpg').read_bytes())
+            console.assert_op('contains', names, 'spam/bacon.pyc')
+            code = marshal.loads(archive.read('spam/bacon.pyc')[16:])
+            path = os.path.join(os.path.abspath(output), 'spam', 'bacon.py')
+            console.assert_eq(code.co_filename, path)
+
+        result = subprocess.run(
+            [sys.executable, str(output)], capture_output=True, check=True)
+        console.assert_eq(result.stdout.splitlines()[:3], [
+            b'spam/__init__.py', b'spam/__main__.py', b'spam/bacon.py'
+        ])
+
+        bundle = output.read_bytes()
+        BundleMaker(['spam'], format='zipapp', output=output, precompile=True).run()
+        console.assert_eq(output.read_bytes(), bundle)
+
+
+def test_deduplication(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        root = Path(tmpdir) / 'spam'
+        shutil.copytree('spam', root)
+        (root / 'copy.html').write_bytes((root / 'ham.html').read_bytes())
+        shutil.copy(root / 'bacon.jpg', root / 'copy.jpg')
+        output = Path(tmpdir) / 'can.py'
+        BundleMaker([root], output=output).run()
+
+        _, manifest = Toolbox.load_meta_data(output)
+        console.assert_eq(manifest['spam/copy.html'], manifest['spam/ham.html'])
+        console.assert_eq(manifest['spam/copy.jpg'], manifest['spam/bacon.jpg'])
+        bundled = output.read_bytes()
+        console.assert_eq(bundled.count(b'"spam/copy.jpg" has the same content'), 1)
+
+        copy = Path(tmpdir) / 'copy.py'
+        BundleMaker([root], output=copy, deduplicate=False).run()
+        _, manifest = Toolbox.load_meta_data(copy)
+        console.assert_op(
+            'ne', manifest['spam/copy.jpg'], manifest['spam/bacon.jpg'])
+        console.assert_op('lt', len(bundled), len(copy.read_bytes()) - 12_000)
+
+
+def test_reproducible_digests(console: Console) -> None:
+    with TemporaryDirectory() as tmpdir:
+        # A copy with different timestamps and Windows line endings
+        root = Path(tmpdir) / 'spam'
+        shutil.copytree('spam', root, copy_function=shutil.copy)
+        html = root / 'ham.html'
+        html.write_bytes(html.read_bytes().replace(b'\n', b'\r\n'))
+
+        output = Path(tmpdir) / 'can.py'
+        copy = Path(tmpdir) / 'copy.py'
+        BundleMaker(['spam'], output=output, compact_manifest=True).run()
+        BundleMaker([root], output=copy, compact_manifest=True, jobs=2).run()
+        bundle = output.read_bytes()
+        console.assert_eq(copy.read_bytes(), bundle)
+
+        recorded, actual = Toolbox.compute_digest(bundle)
+        console.assert_eq(recorded, actual)
+        tampered = bundle.replace(b'spam/bacon.py', b'spam/bacon.pz', 1)
+        recorded, actual = Toolbox.compute_digest(tampered)
+        console.assert_op('ne', recorded, actual)
+
+        start, stop, _ = Toolbox.find_section_offsets(bundle)
+        bindings: dict[str, object] = {}
+        exec(bundle[start:stop], bindings)
+        manifest = cast('dict[str, tuple[str, int, int]]', bindings['__manifest__'])
+        digests = cast('dict[str, str]', bindings['__digests__'])
+        console.assert_eq(list(digests), list(manifest))
+        for key, (_, offset, length) in manifest.items():
+            expected = hashlib.sha256(bundle[offset:offset + length]).hexdigest()
+            console.assert_eq(digests[key], expected)
+
+        # Heavy rules and a digest in bundled files must not throw off the digest.
+        rules = Toolbox.HEAVY_RULE + Toolbox.PLAIN_RULE
+        fake = Toolbox.DIGEST_MARK + b'0' * 64 + b'"\n'
+        (root / 'rules.txt').write_bytes(
+            rules + b"__version__ = '0.0.0'\n" + fake + rules)
+        for bundle_only in (False, True):
+            BundleMaker([root], output=copy, bundle_only=bundle_only).run()
+            bundle = copy.read_bytes()
+            recorded, actual = Toolbox.compute_digest(bundle)
+            console.assert_eq(recorded, actual)
+            console.assert_op('ne', recorded, '0' * 64)
+            tampered = bundle.replace(b'spam/bacon.py', b'spam/bacon.pz', 1)
+            recorded, actual = Toolbox.compute_digest(tampered)
+            console.assert_op('ne', recorded, actual)
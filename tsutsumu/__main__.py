@@ -1,11 +1,13 @@
 from argparse import ArgumentParser, HelpFormatter, RawTextHelpFormatter
 from dataclasses import dataclass, field
+import hashlib
 import os
 import sys
 from textwrap import dedent
 import traceback
 
-from .maker import BundleMaker
+from .bundle import Toolbox
+from .maker import BundleMaker, EncodingCache
 
 
 def parser() -> ArgumentParser:
@@ -56,32 +58,101 @@ def parser() -> ArgumentParser:
             The source repository is <https://github.com/apparebit/tsutsumu>
         """),
         formatter_class=width_limited_formatter)
+    parser.add_argument(
+        '--append-finder',
+        action='store_true',
+        help='when running the bundle, search the bundle\n'
+        'after the standard library and site packages')
     parser.add_argument(
         '-b', '--bundle-only',
         action='store_true',
         help='emit only bundled files and their manifest,\nno runtime code')
+    parser.add_argument(
+        '--bytecode-cache',
+        action='store_true',
+        help="when running the bundle, cache compiled\n"
+        "modules in the user's cache directory")
+    parser.add_argument(
+        '--compact-manifest',
+        action='store_true',
+        help='also append a marshalled manifest, which\n'
+        'loads without reading the entire bundle')
+    parser.add_argument(
+        '--compress',
+        action='store_true',
+        help='zlib-compress resources whose encoding\n'
+        'shrinks enough, per --compress-ratio')
+    parser.add_argument(
+        '--compress-ratio',
+        metavar='RATIO', type=float,
+        help='with --compress, the largest size of the\n'
+        'compressed over the original encoding\n'
+        '(default: 0.8)')
+    parser.add_argument(
+        '--compression-level',
+        metavar='LEVEL', type=int,
+        help="zipapp's deflate compression level from\n"
+        '0 (none) to 9 (best)')
     parser.add_argument(
         '-f', '--format',
         choices=('text', 'zipapp'),
         help="select Tsutsumu's textual bundle format or\nzipapp's more "
         "compact, binary one")
+    parser.add_argument(
+        '-i', '--incremental',
+        action='store_true',
+        help="reuse unchanged files' encodings from\n"
+        "the previous build of the same output")
+    parser.add_argument(
+        '-j', '--jobs',
+        metavar='N', type=int, default=1,
+        help='encode files with N workers;\n'
+        '0 means one per CPU')
+    parser.add_argument(
+        '-k', '--keep',
+        metavar='MODULE', action='append', default=[],
+        help='with --tree-shake, also bundle this module\n'
+        'and its submodules, e.g., for dynamic imports')
     parser.add_argument(
         '-m', '--main',
         metavar='MODULE',
         help="if a package, execute its __main__ module;\n"
         "if a module, execute this module")
+    parser.add_argument(
+        '--no-dedup',
+        action='store_true',
+        help='store identical files separately instead\n'
+        'of letting their keys share one copy')
     parser.add_argument(
         '-o', '--output',
         metavar='FILENAME',
         help='write bundle to this file')
+    parser.add_argument(
+        '--precompile',
+        action='store_true',
+        help='also embed code objects compiled by the\nrunning Python interpreter')
     parser.add_argument(
         '-r', '--repackage',
         action='store_true',
         help='repackage runtime as "tsutsumu.bundle.Bundle"')
+    parser.add_argument(
+        '-t', '--tree-shake',
+        action='store_true',
+        help='bundle only modules reachable from main\n'
+        'module through import statements')
     parser.add_argument(
         '-v', '--verbose',
         action='store_true',
         help='enable verbose output')
+    parser.add_argument(
+        '--verify',
+        action='store_true',
+        help="when running the bundle, check each file's\n"
+        'digest when it is first loaded')
+    parser.add_argument(
+        '-w', '--watch',
+        action='store_true',
+        help='keep rebuilding the bundle whenever\nbundled files change')
     parser.add_argument(
         'roots',
         metavar='PKGROOT', nargs='+',
@@ -91,11 +162,26 @@ def parser() -> ArgumentParser:
 
 @dataclass
 class ToolOptions:
+    append_finder: bool = False
     bundle_only: bool = False
+    bytecode_cache: bool = False
+    compact_manifest: bool = False
+    compress: bool = False
+    compress_ratio: 'None | float' = None
+    compression_level: 'None | int' = None
+    format: str = 'text'
+    incremental: bool = False
+    jobs: int = 1
+    keep: 'list[str]' = field(default_factory=list)
     main: 'None | str' = None
+    no_dedup: bool = False
     output: 'None | str' = None
+    precompile: bool = False
     repackage: bool = False
+    tree_shake: bool = False
     verbose: bool = False
+    verify: bool = False
+    watch: bool = False
     roots: 'list[str]' = field(default_factory=list)
 
 
@@ -103,16 +189,83 @@ def main() -> None:
     options = parser().parse_args(namespace=ToolOptions())
 
     try:
-        if options.bundle_only and (options.main or options.repackage):
-            raise ValueError('--bundle is incompatible with --main/--repackage')
+        if options.bundle_only and (
+            options.main
+            or options.repackage
+            or options.append_finder
+            or options.bytecode_cache
+            or options.tree_shake
+            or options.verify
+        ):
+            raise ValueError(
+                '--bundle is incompatible with --main/--repackage/'
+                '--append-finder/--bytecode-cache/--tree-shake/--verify')
+        if options.format == 'zipapp' and (
+            options.repackage
+            or options.append_finder
+            or options.bytecode_cache
+            or options.compact_manifest
+            or options.compress
+            or options.verify
+            or options.jobs != 1
+            or options.incremental
+            or options.no_dedup
+        ):
+            raise ValueError(
+                '--format zipapp is incompatible with --repackage/'
+                '--append-finder/--bytecode-cache/--compact-manifest/--compress/'
+                '--verify/--jobs/--incremental/--no-dedup')
+        if options.compress_ratio is not None and (
+            not options.compress or not 0 < options.compress_ratio <= 1
+        ):
+            raise ValueError(
+                '--compress-ratio requires --compress and must be greater than 0 '
+                'and at most 1')
+        if options.compression_level is not None and (
+            options.format != 'zipapp' or not 0 <= options.compression_level <= 9
+        ):
+            raise ValueError(
+                '--compression-level requires --format zipapp and ranges from 0 to 9')
+        if options.keep and not options.tree_shake:
+            raise ValueError('--keep requires --tree-shake')
+        if options.incremental and options.output is None:
+            raise ValueError('--incremental requires --output')
+        if options.watch and options.output is None:
+            raise ValueError('--watch requires --output')
+
+        encoding_cache = None
+        if options.incremental:
+            assert options.output is not None
+            output = os.path.abspath(options.output).encode('utf8')
+            encoding_cache = EncodingCache(Toolbox.user_cache_dir(
+                'encodings', hashlib.sha256(output).hexdigest() + '.json'))
 
-        BundleMaker(
+        maker = BundleMaker(
             options.roots,
+            append_finder=options.append_finder,
             bundle_only=options.bundle_only,
+            bytecode_cache=options.bytecode_cache,
+            compact_manifest=options.compact_manifest,
+            compress_threshold=(
+                (options.compress_ratio or 0.8) if options.compress else None),
+            compression_level=options.compression_level,
+            deduplicate=not options.no_dedup,
+            encoding_cache=encoding_cache,
+            jobs=options.jobs,
+            keep=options.keep,
+            format=options.format,
             main=options.main,
             output=options.output,
+            precompile=options.precompile,
             repackage=options.repackage,
-        ).run()
+            tree_shake=options.tree_shake,
+            verbose=options.verbose,
+            verify=options.verify,
+        )
+        if options.watch:
+            maker.watch()
+        else:
+            maker.run()
     except Exception as x:
         if options.verbose:
             traceback.print_exception(x)
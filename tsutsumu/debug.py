@@ -20,11 +20,30 @@ if __name__ == '__main__':
         print(f"Error: unable to load meta data ({x})")
         sys.exit(1)
 
+    try:
+        recorded, actual = Toolbox.compute_digest(bundle.read_bytes())
+        if recorded == actual:
+            print(f'bundle digest {recorded} is valid')
+        else:
+            print(f'Error: bundle digest {recorded} differs from actual {actual}')
+    except ValueError:
+        print('bundle has no digest')
+
+    originals: 'dict[tuple[str, int, int], str]' = {}
+    alias_count = saved_bytes = 0
+
     for key, (kind, offset, length) in manifest.items():
         if length == 0:
             print(f'bundled file "{key}" is empty')
             continue
 
+        original = originals.setdefault((kind, offset, length), key)
+        if original != key:
+            print(f'bundled file "{key}" shares {length} bytes with "{original}"')
+            alias_count += 1
+            saved_bytes += length
+            continue
+
         try:
             data = Toolbox.load_from_bundle(bundle, kind, offset, length)
             print(f'bundled file "{key}" has {len(data)} bytes')
@@ -36,3 +55,6 @@ if __name__ == '__main__':
             for line in raw_data.splitlines():
                 print(f'    {line!r}')
             print()
+
+    if alias_count > 0:
+        print(f'deduplication saved {saved_bytes} bytes for {alias_count} files')
@@ -1,23 +1,39 @@
+import ast
 import base64
-from contextlib import nullcontext
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+from contextlib import ExitStack, nullcontext
 from enum import Enum
+import hashlib
+import importlib.util
+import json
 from keyword import iskeyword
-import os.path
+import marshal
+import os
 from pathlib import Path
+import shutil
 import sys
-from typing import NamedTuple, TYPE_CHECKING
+import time
+from typing import cast, NamedTuple, TYPE_CHECKING
+import zipfile
+import zlib
 
 if TYPE_CHECKING:
     from collections.abc import Iterable, Iterator, Sequence
+    from concurrent.futures import Executor
     from contextlib import AbstractContextManager
     from importlib.abc import Loader
     from importlib.machinery import ModuleSpec
-    from typing import Callable, Protocol
+    from threading import Event
+    from typing import BinaryIO, Callable, Protocol, TextIO, TypeAlias
 
     class Writable(Protocol):
         def write(self, data: 'bytes | bytearray') -> int:
             ...
 
+    # The lines for a bundled file, the layout of its content, and its kind,
+    # which differs from the file's kind if compressed
+    Encoding: TypeAlias = tuple[list[bytes], tuple[int, int, int], 'FileKind']
+
 from tsutsumu import __version__
 from tsutsumu.bundle import Toolbox
 
@@ -72,6 +88,16 @@ _BUNDLE_START = b'if False: {\n'
 _BUNDLE_STOP = b'}\n\n'
 _EMPTY_LINE = b'\n'
 
+# Lines are coalesced into chunks of this many bytes before writing them
+_CHUNK_SIZE = 256 * 1024
+
+# Compressed data is Base85-encoded this many bytes per line. Since it's a
+# multiple of 4, each line decodes independently, which enables streaming.
+_COMPRESSED_LINE_SIZE = 56
+
+# Bump whenever the format of encoding cache entries changes
+_ENCODING_CACHE_FORMAT = 4
+
 _MAIN = """\
 if __name__ == "__main__":
     import runpy
@@ -80,7 +106,7 @@ if __name__ == "__main__":
     Toolbox.restrict_sys_path()
 
     # Install the bundle
-    bundle = Bundle.install(__file__, __version__, __manifest__)
+    bundle = Bundle.install(__file__, __version__, __manifest__{install_options})
 
     # This script does not exist. It never ran!
     {repackage}
@@ -89,11 +115,25 @@ if __name__ == "__main__":
     runpy.run_module("{main}", run_name="__main__", alter_sys=True)
 """
 
+_ZIPAPP_MAIN = """\
+# DO NOT EDIT! This module was automatically generated
+# by Tsutsumu <https://github.com/apparebit/tsutsumu>.
+import runpy
+
+# Run equivalent of "python -m {main}"
+runpy.run_module("{main}", run_name="__main__", alter_sys=True)
+"""
+
+# Zip entries have fixed timestamps so that zipapps are reproducible
+_ZIP_DATE_TIME = (1980, 1, 1, 0, 0, 0)
+
 # --------------------------------------------------------------------------------------
 
 class FileKind(Enum):
     BINARY = 'b'
+    CODE = 'c'
     TEXT = 't'
+    COMPRESSED = 'z'
     VALUE = 'v'
 
 
@@ -104,6 +144,156 @@ class BundledFile(NamedTuple):
     key: str
 
 
+class SourceStatus(NamedTuple):
+    """The size, modification time, and SHA-256 of the content that was encoded."""
+    size: int
+    mtime: int
+    sha256: str
+
+
+class EncodingCache:
+    """
+    A persistent cache of encoded files. Entries are keyed by bundle key, which
+    differs for a module's source and code object, and validated by local path,
+    size, and modification time or, failing that, content hash.
+    """
+
+    def __init__(self, path: 'None | str | Path' = None) -> None:
+        self._path = None if path is None else Path(path)
+        self._fingerprint = (
+            f'{__version__} {importlib.util.MAGIC_NUMBER.hex()} {_ENCODING_CACHE_FORMAT}')
+        self._entries: 'dict[str, dict[str, object]]' = {}
+        self._used: 'set[str]' = set()
+        self.hits = self.misses = 0
+
+        if self._path is not None and self._path.exists():
+            try:
+                with open(self._path, mode='rt', encoding='utf8') as file:
+                    data = json.load(file)
+            except (OSError, ValueError):
+                return
+            if data.get('fingerprint') == self._fingerprint:
+                self._entries = data['entries']
+
+    def get(
+        self, file: 'BundledFile', compress: 'None | float' = None
+    ) -> 'None | Encoding':
+        entry = self._entries.get(file.key)
+        if (
+            entry is None
+            or entry['kind'] != file.kind.value
+            or entry['path'] != str(file.path)
+            or entry['compress'] != compress
+        ):
+            self.misses += 1
+            return None
+
+        status = file.path.stat()
+        if entry['size'] != status.st_size or entry['mtime'] != status.st_mtime_ns:
+            digest = hashlib.sha256(file.path.read_bytes()).hexdigest()
+            if entry['sha256'] != digest:
+                self.misses += 1
+                return None
+            entry['size'] = status.st_size
+            entry['mtime'] = status.st_mtime_ns
+
+        self.hits += 1
+        self._used.add(file.key)
+        chunk = cast(str, entry['chunk']).encode('latin1')
+        prefix, data, suffix = cast('list[int]', entry['layout'])
+        kind = FileKind(entry['stored'])
+        return ([chunk] if chunk else []), (prefix, data, suffix), kind
+
+    def put(
+        self,
+        file: 'BundledFile',
+        encoding: 'Encoding',
+        status: 'SourceStatus',
+        compress: 'None | float' = None,
+    ) -> None:
+        # The status describes the encoded content, not the file as is. Otherwise,
+        # a file modified while being encoded would be cached with stale content.
+        self._entries[file.key] = {
+            'kind': file.kind.value,
+            'stored': encoding[2].value,
+            'compress': compress,
+            'path': str(file.path),
+            'size': status.size,
+            'mtime': status.mtime,
+            'sha256': status.sha256,
+            'layout': list(encoding[1]),
+            'chunk': b''.join(encoding[0]).decode('latin1'),
+        }
+        self._used.add(file.key)
+
+    def save(self) -> None:
+        """Persist the entries used since the last save and forget all others."""
+        self._entries = {
+            key: entry for key, entry in self._entries.items() if key in self._used
+        }
+        self._used = set()
+        if self._path is None:
+            return
+
+        self._path.parent.mkdir(parents=True, exist_ok=True)
+        temp_path = self._path.with_name(f'.{self._path.name}.{os.getpid()}.tmp')
+        with open(temp_path, mode='wt', encoding='utf8') as file:
+            data = {'fingerprint': self._fingerprint, 'entries': self._entries}
+            json.dump(data, file)
+        os.replace(temp_path, self._path)
+
+
+class DigestWriter:
+    """A writable that also feeds everything written to a SHA-256 hash."""
+
+    def __init__(self, writable: 'Writable') -> None:
+        self._writable = writable
+        self.hash = hashlib.sha256()
+
+    def write(self, data: 'bytes | bytearray') -> int:
+        self.hash.update(data)
+        return self._writable.write(data)
+
+
+class CountingWriter:
+    """
+    A writable that counts the bytes written. Since it also reports that count
+    as its position, zipfile can write to outputs that do not support seeking.
+    """
+
+    def __init__(self, writable: 'Writable') -> None:
+        self._writable = writable
+        self.count = 0
+
+    def write(self, data: 'bytes | bytearray') -> int:
+        self.count += len(data)
+        return self._writable.write(data)
+
+    def tell(self) -> int:
+        return self.count
+
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        pass
+
+
+class TextWriter:
+    """
+    A writable that decodes UTF-8 for a text stream without binary buffer, such
+    as doctest's replacement for stdout. Each write must end on a character
+    boundary, which holds for the whole lines written by write_chunked().
+    """
+
+    def __init__(self, stream: 'TextIO') -> None:
+        self._stream = stream
+
+    def write(self, data: 'bytes | bytearray') -> int:
+        self._stream.write(data.decode('utf8'))
+        return len(data)
+
+
 class BundleMaker:
     """
     Class to create Python bundles, i.e., Python scripts that contains the source
@@ -114,20 +304,50 @@ class BundleMaker:
         self,
         directories: 'Sequence[str | Path]',
         *,
+        append_finder: bool = False,
         bundle_only: bool = False,
+        bytecode_cache: bool = False,
+        compact_manifest: bool = False,
+        compress_threshold: 'None | float' = None,
+        compression_level: 'None | int' = None,
+        deduplicate: bool = True,
+        encoding_cache: 'None | EncodingCache' = None,
+        jobs: int = 1,
+        keep: 'Sequence[str]' = (),
         binary_extensions: 'tuple[str, ...]' = _BINARY_EXTENSIONS,
         binary_files: 'tuple[str, ...]' = _BINARY_FILES,
         text_extensions: 'tuple[str, ...]' = _TEXT_EXTENSIONS,
         text_files: 'tuple[str, ...]' = _TEXT_FILES,
+        format: str = 'text',
         main: 'None | str' = None,
         output: 'None | str | Path' = None,
+        precompile: bool = False,
         repackage: bool = False,
+        tree_shake: bool = False,
+        verbose: bool = False,
+        verify: bool = False,
     ) -> None:
         self._directories = directories
+        self._append_finder = append_finder
         self._bundle_only = bundle_only
+        self._bytecode_cache = bytecode_cache
+        self._compact_manifest = compact_manifest
+        self._compress_threshold = compress_threshold
+        self._compression_level = compression_level
+        self._deduplicate = deduplicate
+        self._encoding_cache = encoding_cache
+        self._jobs = jobs if jobs > 0 else (os.cpu_count() or 1)
+        self._keep = tuple(keep)
+        if format not in ('text', 'zipapp'):
+            raise ValueError(f'unknown bundle format "{format}"')
+        self._format = format
         self._main = main
         self._output = output
+        self._precompile = precompile
         self._repackage = repackage
+        self._tree_shake = tree_shake
+        self._verbose = verbose
+        self._verify = verify
 
         self._binary_extensions = set(binary_extensions)
         self._binary_files = set(binary_files)
@@ -135,6 +355,11 @@ class BundleMaker:
         self._text_files = set(text_files)
 
         self._ranges: 'list[tuple[FileKind, str, int, int, int]]' = []
+        self._aliases: 'dict[str, str]' = {}
+        self._digests: 'dict[str, str]' = {}
+        self._originals: 'dict[tuple[FileKind, bytes], str]' = {}
+        self._saved_bytes = 0
+        self._dropped: 'None | list[str]' = None
         self._repr: 'None | str' = None
 
     def __repr__(self) -> str:
@@ -146,54 +371,212 @@ class BundleMaker:
     # ----------------------------------------------------------------------------------
 
     def run(self) -> None:
+        self._ranges = []
+        self._aliases = {}
+        self._digests = {}
+        self._originals = {}
+        self._saved_bytes = 0
+        if self._encoding_cache is not None:
+            self._encoding_cache.hits = self._encoding_cache.misses = 0
         files = sorted(self.list_files(), key=lambda f: f.key)
         main = None if self._bundle_only else self.select_main(files)
+        if self._tree_shake:
+            assert main is not None
+            files, dropped = self.shake_tree(files, main)
+            self.report_dropped(dropped)
+        if self._precompile and self._format == 'text':
+            files = sorted([*files, *self.list_precompiled(files)], key=lambda f: f.key)
 
         # context's type annotation is based on the observation that open()'s
         # result is a BufferedWriter is an AbstractContextManager[BufferedWriter].
         # The nullcontext prevents closing of stdout's binary stream when done.
-        context: 'AbstractContextManager[Writable]'
+        # To never expose a partially written bundle, it goes to a temporary file
+        # first, which replaces the output only after all writes succeeded. The
+        # output path is resolved, so that the target of a symlink is replaced.
+        context: 'AbstractContextManager[BinaryIO]'
         if self._output is None:
             context = nullcontext(sys.stdout.buffer)
+            temp_path = None
         else:
-            context = open(self._output, mode='wb')
+            output = Path(os.path.realpath(self._output))
+            temp_path = output.with_name(f'.{output.name}.{os.getpid()}.tmp')
+            context = open(temp_path, mode='wb')
 
-        with context as script:
-            BundleMaker.writeall(_BANNER.splitlines(keepends=True), script)
-            BundleMaker.writeall(self.emit_bundle(files), script)
-            BundleMaker.writeall(self.emit_meta_data(), script)
-            if not self._bundle_only:
-                assert main is not None
-                BundleMaker.writeall(self.emit_runtime(main), script)
+        start = time.perf_counter()
+        byte_count = 0
+        try:
+            with context as script:
+                if self._format == 'zipapp':
+                    byte_count += self.emit_zipapp(files, main, script)
+                else:
+                    writer = DigestWriter(script)
+                    byte_count += BundleMaker.write_chunked(
+                        _BANNER.splitlines(keepends=True), writer)
+                    byte_count += BundleMaker.write_chunked(
+                        self.emit_bundle(files), writer)
+                    byte_count += BundleMaker.write_chunked(
+                        self.emit_meta_data(), writer)
+
+                    # The bundle digest covers all bytes but its own line. Since
+                    # the runtime and compact manifest come after that line, they
+                    # are buffered and hashed before writing the digest.
+                    tail: 'list[bytes]' = []
+                    if not self._bundle_only:
+                        assert main is not None
+                        tail.extend(self.emit_runtime(main))
+                    if self._compact_manifest:
+                        tail.extend(self.emit_compact_manifest())
+                    for line in tail:
+                        writer.hash.update(line)
+                    byte_count += BundleMaker.write_chunked(
+                        self.emit_digest(writer.hash.hexdigest()), script)
+                    byte_count += BundleMaker.write_chunked(tail, script)
+            if temp_path is not None:
+                # Preserve the mode of an existing bundle, e.g., its executable bit.
+                if output.exists():
+                    shutil.copymode(output, temp_path)
+                os.replace(temp_path, output)
+            if self._encoding_cache is not None:
+                self._encoding_cache.save()
+        except BaseException:
+            if temp_path is not None and temp_path.exists():
+                temp_path.unlink()
+            raise
+
+        if self._verbose:
+            duration = time.perf_counter() - start
+            throughput = byte_count / duration / 1_000_000 if duration > 0 else 0
+            destination = 'stdout' if self._output is None else f'"{self._output}"'
+            print(
+                f'Wrote {byte_count:,} bytes for {len(files):,} files to {destination} '
+                f'in {duration:.3f} s ({throughput:.1f} MB/s)',
+                file=sys.stderr,
+            )
+            if self._encoding_cache is not None:
+                print(
+                    f'Reused {self._encoding_cache.hits:,} cached files, '
+                    f'encoded {self._encoding_cache.misses:,} files',
+                    file=sys.stderr,
+                )
+            if self._aliases:
+                print(
+                    f'Deduplicated {len(self._aliases):,} files, '
+                    f'saving {self._saved_bytes:,} bytes',
+                    file=sys.stderr,
+                )
+
+    def watch(
+        self,
+        interval: float = 0.5,
+        settle: float = 0.2,
+        stop: 'None | Event' = None,
+    ) -> None:
+        """
+        Rebuild the bundle whenever the files to be bundled change. This method
+        polls the file system, since the standard library does not support
+        inotify or equivalents. It runs until interrupted or the stop event is
+        set.
+        """
+        if self._output is None:
+            raise ValueError('unable to watch without output file')
+        if self._encoding_cache is None:
+            self._encoding_cache = EncodingCache()
+
+        def sleep(duration: float) -> bool:
+            if stop is None:
+                time.sleep(duration)
+                return True
+            return not stop.wait(duration)
+
+        snapshot: 'None | dict[str, tuple[int, int]]' = None
+        try:
+            while True:
+                current = self.take_snapshot()
+                if current == snapshot:
+                    if not sleep(interval):
+                        return
+                    continue
+
+                # Debounce bursts of changes by waiting until files are unchanged.
+                while snapshot is not None:
+                    if not sleep(settle):
+                        return
+                    latest = self.take_snapshot()
+                    if latest == current:
+                        break
+                    current = latest
+
+                start = time.perf_counter()
+                try:
+                    self.run()
+                except Exception as x:
+                    print(f'Error: {x}', file=sys.stderr)
+                else:
+                    duration = (time.perf_counter() - start) * 1_000
+                    cache = self._encoding_cache
+                    print(
+                        f'Rebuilt "{self._output}" in {duration:.1f} ms '
+                        f'(reused {cache.hits:,}, encoded {cache.misses:,} files)',
+                        file=sys.stderr,
+                    )
+                snapshot = current
+        except KeyboardInterrupt:
+            pass
+
+    def take_snapshot(self) -> 'dict[str, tuple[int, int]]':
+        snapshot = {}
+        for file in self.list_files():
+            try:
+                status = file.path.stat()
+            except FileNotFoundError:
+                continue
+            snapshot[file.key] = status.st_mtime_ns, status.st_size
+        return snapshot
 
     # ----------------------------------------------------------------------------------
 
     def list_files(self) -> 'Iterator[BundledFile]':
         # Since names of directories (and stems of Python files) are module
-        # names, traversal MUST NOT resolve symbolic links!
+        # names, traversal MUST NOT resolve symbolic links! Directory entries
+        # cache their type, which saves a stat() call per file. The output is
+        # skipped, since bundling a bundle's previous version is never intended
+        # and watching it would rebuild forever. Temporary outputs start with a
+        # dot and hence are no module names.
+        outputs = set()
+        if self._output is not None:
+            outputs.add(os.path.abspath(self._output))
+            outputs.add(os.path.realpath(self._output))
         for directory in self._directories:
-            root = Path(directory).absolute()
-            pending = list(root.iterdir())
+            root = os.path.abspath(directory)
+            pending = [(root, os.path.basename(root) + '/')]
             while pending:
-                item = pending.pop().absolute()
-                if item.is_file() and BundleMaker.is_module_name(item.stem):
-                    kind = self.classify_kind(item)
-                    if kind is None:
-                        continue
-                    key = str(item.relative_to(root.parent)).replace('\\', '/')
-                    if not self.is_excluded_key(key):
-                        yield BundledFile(kind, item, key)
-                elif item.is_dir() and BundleMaker.is_module_name(item.name):
-                    pending.extend(item.iterdir())
+                path, prefix = pending.pop()
+                with os.scandir(path) as entries:
+                    for entry in entries:
+                        name = entry.name
+                        if entry.is_file():
+                            stem, suffix = os.path.splitext(name)
+                            if not BundleMaker.is_module_name(stem):
+                                continue
+                            kind = self.classify_kind(name, suffix)
+                            if kind is None:
+                                continue
+                            key = prefix + name
+                            if entry.path in outputs:
+                                continue
+                            if not self.is_excluded_key(key):
+                                yield BundledFile(kind, Path(entry.path), key)
+                        elif entry.is_dir() and BundleMaker.is_module_name(name):
+                            pending.append((entry.path, prefix + name + '/'))
 
     @staticmethod
     def is_module_name(name: str) -> bool:
         return name.isidentifier() and not iskeyword(name)
 
-    def classify_kind(self, path: Path) -> 'None | FileKind':
-        if path.suffix in self._binary_extensions or path.name in self._binary_files:
+    def classify_kind(self, name: str, suffix: str) -> 'None | FileKind':
+        if suffix in self._binary_extensions or name in self._binary_files:
             return FileKind.BINARY
-        elif path.suffix in self._text_extensions or path.name in self._text_files:
+        elif suffix in self._text_extensions or name in self._text_files:
             return FileKind.TEXT
         else:
             return None
@@ -204,6 +587,19 @@ class BundleMaker:
             and key in ('tsutsumu/__init__.py', 'tsutsumu/bundle.py')
         )
 
+    def list_precompiled(self, files: 'list[BundledFile]') -> 'Iterator[BundledFile]':
+        # Code objects are only valid for the running interpreter. Their keys
+        # include the cache tag, just like the contents of __pycache__.
+        tag: 'None | str' = sys.implementation.cache_tag
+        if tag is None:
+            raise ValueError(f'{sys.implementation.name} does not support bytecode')
+
+        for file in files:
+            if file.kind is FileKind.TEXT and file.key.endswith('.py'):
+                head, _, tail = file.key.rpartition('/')
+                key = f'{head}/__pycache__/{tail[:-3]}.{tag}.pyc'
+                yield BundledFile(FileKind.CODE, file.path, key)
+
     # ----------------------------------------------------------------------------------
 
     def select_main(self, files: 'list[BundledFile]') -> str:
@@ -229,61 +625,335 @@ class BundleMaker:
 
     # ----------------------------------------------------------------------------------
 
+    def shake_tree(
+        self, files: 'list[BundledFile]', main: str
+    ) -> 'tuple[list[BundledFile], list[BundledFile]]':
+        """
+        Split the files into those reachable from the main module and those
+        that are not. Reachability is determined by statically parsing import
+        statements, including those nested inside functions and conditionals,
+        and then computing the transitive closure. Importing a module also
+        imports its parent packages. Modules named by the keep option, which
+        serves as allowlist for dynamic imports, are reachable along with their
+        submodules. Finally, resources are reachable if the closest enclosing
+        directory with Python modules contains a reachable module.
+        """
+        modules: 'dict[str, BundledFile]' = {}
+        for file in files:
+            if file.key.endswith('.py'):
+                modules[BundleMaker.to_module_name(file.key)] = file
+
+        roots = [main]
+        if f'{main}.__main__' in modules:
+            roots.append(f'{main}.__main__')
+        for name in self._keep:
+            roots.extend(
+                module for module in modules
+                if module == name or module.startswith(name + '.')
+            )
+
+        reachable: 'set[str]' = set()
+        pending = list(roots)
+        while pending:
+            name = pending.pop()
+            for module in BundleMaker.with_parents(name):
+                if module in reachable or module not in modules:
+                    continue
+                reachable.add(module)
+                file = modules[module]
+                pending.extend(self.list_imports(
+                    module, file.key.endswith('/__init__.py'), file.path))
+
+        reachable_directories = {
+            modules[module].key.rpartition('/')[0] for module in reachable
+        }
+        module_directories = {
+            file.key.rpartition('/')[0] for file in modules.values()
+        }
+
+        kept: 'list[BundledFile]' = []
+        dropped: 'list[BundledFile]' = []
+        for file in files:
+            if file.key.endswith('.py'):
+                is_reachable = BundleMaker.to_module_name(file.key) in reachable
+            else:
+                directory = file.key.rpartition('/')[0]
+                while directory not in module_directories and '/' in directory:
+                    directory = directory.rpartition('/')[0]
+                is_reachable = directory in reachable_directories
+            (kept if is_reachable else dropped).append(file)
+        return kept, dropped
+
+    @staticmethod
+    def to_module_name(key: str) -> str:
+        name = key[:-3].replace('/', '.')
+        return name[:-9] if name.endswith('.__init__') else name
+
+    @staticmethod
+    def with_parents(name: str) -> 'Iterator[str]':
+        index = name.find('.')
+        while index != -1:
+            yield name[:index]
+            index = name.find('.', index + 1)
+        yield name
+
+    @staticmethod
+    def list_imports(name: str, is_package: bool, path: Path) -> 'Iterator[str]':
+        try:
+            tree = ast.parse(path.read_bytes(), filename=str(path))
+        except SyntaxError as x:
+            raise ValueError(f'unable to parse module {name} for tree shaking') from x
+
+        package = name if is_package else name.rpartition('.')[0]
+        for node in ast.walk(tree):
+            if isinstance(node, ast.Import):
+                for alias in node.names:
+                    yield alias.name
+            elif isinstance(node, ast.ImportFrom):
+                if node.level == 0:
+                    base = node.module or ''
+                else:
+                    # Resolve relative imports just like importlib.util.resolve_name()
+                    parts = package.rsplit('.', node.level - 1)
+                    if len(parts) < node.level:
+                        continue
+                    base = parts[0]
+                    if node.module:
+                        base = f'{base}.{node.module}' if base else node.module
+                if not base:
+                    continue
+                yield base
+                for alias in node.names:
+                    if alias.name != '*':
+                        # The name may be a submodule or just an attribute.
+                        yield f'{base}.{alias.name}'
+
+    def report_dropped(self, dropped: 'list[BundledFile]') -> None:
+        # When watching, only report changes to the dropped files.
+        keys = [file.key for file in dropped]
+        if keys == self._dropped or (self._dropped is None and not keys):
+            self._dropped = keys
+            return
+        self._dropped = keys
+        print(
+            f'Tree shaking dropped {len(dropped):,} files'
+            f'{":" if self._verbose else ""}',
+            file=sys.stderr,
+        )
+        if self._verbose:
+            for file in dropped:
+                print(f'    {file.key}', file=sys.stderr)
+
+    # ----------------------------------------------------------------------------------
+
     def emit_bundle(
         self,
         files: 'list[BundledFile]',
     ) -> 'Iterator[bytes]':
         yield from _BUNDLE_START.splitlines(keepends=True)
-        for file in files:
-            yield from self.emit_file(file.kind, file.path, file.key)
+        if self._jobs == 1 and self._encoding_cache is None:
+            for file in files:
+                yield from self.emit_file(
+                    file.kind, file.path, file.key, self.get_compress_threshold(file))
+        else:
+            for file, encoding in zip(files, self.encode_files(files)):
+                yield from self.emit_encoding(file.key, encoding)
         yield from _BUNDLE_STOP.splitlines(keepends=True)
 
-    def emit_file(self, kind: 'FileKind', path: Path, key: str) -> 'Iterator[bytes]':
+    def encode_files(self, files: 'list[BundledFile]') -> 'Iterator[Encoding]':
+        """
+        Encode the files, yielding their encodings in order. Files that are not
+        in the encoding cache are encoded by the workers, with their encodings
+        yielded as they become available, so that the bundle keeps streaming.
+        """
+        cache = self._encoding_cache
+        thresholds = [self.get_compress_threshold(file) for file in files]
+        if cache is None:
+            cached: 'list[None | Encoding]' = [None] * len(files)
+        else:
+            cached = [
+                cache.get(file, threshold) for file, threshold in zip(files, thresholds)
+            ]
+
+        pending = [
+            (file, threshold)
+            for file, threshold, encoding in zip(files, thresholds, cached)
+            if encoding is None
+        ]
+        arguments = (
+            [file.kind for file, _ in pending],
+            [file.path for file, _ in pending],
+            [file.key for file, _ in pending],
+            [threshold for _, threshold in pending],
+        )
+
+        encode = BundleMaker.encode_file_with_status
+        with ExitStack() as stack:
+            if self._jobs == 1 or len(pending) <= 1:
+                fresh = map(encode, *arguments)
+            else:
+                executor = stack.enter_context(self.create_executor())
+                fresh = executor.map(encode, *arguments, chunksize=16)
+
+            # Merge fresh encodings into the ones from the cache, maintaining order.
+            for file, threshold, encoding in zip(files, thresholds, cached):
+                if encoding is None:
+                    encoding, status = next(fresh)
+                    if cache is not None:
+                        cache.put(file, encoding, status, threshold)
+                yield encoding
+
+    def create_executor(self) -> 'Executor':
+        # Worker processes must be able to import this module, which isn't
+        # necessarily the case when running from a bundle.
+        path = globals().get('__file__')
+        if isinstance(path, str) and Path(path).is_file():
+            return ProcessPoolExecutor(self._jobs)
+        return ThreadPoolExecutor(self._jobs)
+
+    def get_compress_threshold(self, file: 'BundledFile') -> 'None | float':
+        # Only resources are candidates for compression, so that bundled code
+        # remains readable.
+        if (
+            self._compress_threshold is None
+            or file.kind not in (FileKind.BINARY, FileKind.TEXT)
+            or file.key.endswith('.py')
+        ):
+            return None
+        return self._compress_threshold
+
+    def emit_file(
+        self, kind: 'FileKind', path: Path, key: str, compress: 'None | float' = None
+    ) -> 'Iterator[bytes]':
+        yield from self.emit_encoding(
+            key, BundleMaker.encode_file(kind, path, key, compress))
+
+    def emit_encoding(self, key: str, encoding: 'Encoding') -> 'Iterator[bytes]':
+        lines, (prefix, data, suffix), kind = encoding
+        digest = hashlib.sha256(b''.join(lines)[prefix:prefix + data])
+        self._digests[key] = digest.hexdigest()
+        if self._deduplicate and data > 0:
+            # Files with the same stored kind and payload share the same range.
+            # Instead of the payload, the alias has a comment naming the original.
+            original = self._originals.setdefault((kind, digest.digest()), key)
+            if original != key:
+                comment = f'# "{key}" has the same content as "{original}"\n'
+                alias_lines = [Toolbox.PLAIN_RULE, comment.encode('utf8')]
+                self._aliases[key] = original
+                self._saved_bytes += sum(map(len, lines)) - sum(map(len, alias_lines))
+                self.record_range(kind, key, 0, 0, sum(map(len, alias_lines)))
+                yield from alias_lines
+                return
+
+        self.record_range(kind, key, prefix, data, suffix)
+        yield from lines
+
+    @staticmethod
+    def encode_file(
+        kind: 'FileKind', path: Path, key: str, compress: 'None | float' = None
+    ) -> 'Encoding':
+        return BundleMaker.encode_content(kind, path.read_bytes(), key, compress)
+
+    @staticmethod
+    def encode_file_with_status(
+        kind: 'FileKind', path: Path, key: str, compress: 'None | float' = None
+    ) -> 'tuple[Encoding, SourceStatus]':
+        # Stat before reading, so that a modification while reading results in a
+        # newer modification time and hence revalidation by content hash.
+        mtime = path.stat().st_mtime_ns
+        content = path.read_bytes()
+        status = SourceStatus(len(content), mtime, hashlib.sha256(content).hexdigest())
+        return BundleMaker.encode_content(kind, content, key, compress), status
+
+    @staticmethod
+    def encode_content(
+        kind: 'FileKind', content: bytes, key: str, compress: 'None | float' = None
+    ) -> 'Encoding':
+        """
+        Encode the file content as lines of the bundle and determine their
+        layout. If compress is a ratio, the content is stored zlib-compressed
+        instead when that shrinks the encoded lines to at most that fraction of
+        the uncompressed ones. The returned kind reflects that choice.
+        """
         if kind is FileKind.TEXT:
             lines = [
                 line                      # Split bytestring into lines,
                 .decode('iso8859-1')      # convert each byte 1:1 to code point,
                 .encode('unicode_escape') # convert to bytes, escaping non-ASCII values
                 .replace(b'"', b'\\x22')  # and escape double quotes.
-                for line in path.read_bytes().splitlines()
+                for line in content.splitlines()
             ]
+        elif kind is FileKind.CODE:
+            data = BundleMaker.compile_code(content, key)
+            lines = base64.a85encode(data, wrapcol=76).splitlines()
         else:
-            lines = base64.a85encode(path.read_bytes(), wrapcol=76).splitlines()
+            lines = base64.a85encode(content, wrapcol=76).splitlines()
 
         line_count = len(lines)
         byte_length = sum(len(line) for line in lines) + line_count
 
         if line_count == 0:
             assert byte_length == 0
-            self.record_range(kind, key, 0, 0, 0)
-            return
+            return [], (0, 0, 0), kind
+
+        if compress is not None:
+            if kind is FileKind.TEXT:
+                content = BundleMaker.normalize_newlines(content)
+            compressed = zlib.compress(content, 9)
+            compressed_lines = [
+                base64.a85encode(compressed[index:index + _COMPRESSED_LINE_SIZE])
+                for index in range(0, len(compressed), _COMPRESSED_LINE_SIZE)
+            ]
+            compressed_length = (
+                sum(len(line) for line in compressed_lines) + len(compressed_lines))
+            if compressed_length <= compress * byte_length:
+                kind = FileKind.COMPRESSED
+                lines = compressed_lines
+                line_count = len(lines)
+                byte_length = compressed_length
 
         prefix = b'"' + key.encode('utf8') + b'":'
         offset = len(Toolbox.PLAIN_RULE) + len(prefix) + 1
 
-        yield Toolbox.PLAIN_RULE
+        output = [Toolbox.PLAIN_RULE]
 
         if line_count == 1:
             if kind is FileKind.TEXT:
-                self.record_range(kind, key, offset, byte_length + 4, 2)
+                layout = offset, byte_length + 4, 2
             else:
-                self.record_range(kind, key, offset + 2, byte_length + 1, 3)
+                # The range excludes the escaped newline, whose backslash and n
+                # would otherwise be decoded as Base85 characters.
+                layout = offset + 2, byte_length - 1, 5
 
-            yield prefix + b' b"' + lines[0] + b'\\n",\n'
+            output.append(prefix + b' b"' + lines[0] + b'\\n",\n')
         else:
             if kind is FileKind.TEXT:
-                self.record_range(kind, key, offset, byte_length + 7, 2)
+                layout = offset, byte_length + 7, 2
                 first_line = b'b"""' + lines[0]
             else:
-                self.record_range(kind, key, offset + 4, byte_length + 1, 5)
+                layout = offset + 4, byte_length + 1, 5
                 prefix += b' b"""'
                 first_line = lines[0]
 
-            yield prefix + b'\n'
-            yield first_line + b'\n'
+            output.append(prefix + b'\n')
+            output.append(first_line + b'\n')
             for line in lines[1:]:
-                yield line + b'\n'
-            yield b'""",\n'
+                output.append(line + b'\n')
+            output.append(b'""",\n')
+
+        return output, layout, kind
+
+    @staticmethod
+    def normalize_newlines(content: bytes) -> bytes:
+        # Same as decoding the textual encoding, which writes lines with \n.
+        return b''.join(line + b'\n' for line in content.splitlines())
+
+    @staticmethod
+    def compile_code(source: bytes, key: str) -> bytes:
+        # Bundle.get_code() replaces the key with the runtime path again.
+        filename = key.replace('/__pycache__/', '/').rsplit('.', 2)[0] + '.py'
+        code = compile(source, filename, 'exec', dont_inherit=True)
+        return importlib.util.MAGIC_NUMBER + marshal.dumps(code)
 
     def record_range(
         self,
@@ -297,11 +967,79 @@ class BundleMaker:
 
     # ----------------------------------------------------------------------------------
 
+    def emit_zipapp(
+        self, files: 'list[BundledFile]', main: 'None | str', output: 'BinaryIO'
+    ) -> int:
+        """
+        Write a zipapp with the given files and a generated __main__ module that
+        runs the main module to the output and return the number of bytes
+        written. The archive is deflate-compressed. If precompiling, it also
+        includes .pyc files next to the Python sources, which is where zipimport
+        looks for them.
+        """
+        writable: 'BinaryIO | CountingWriter'
+        if output.seekable():
+            writable = output
+            start = output.tell()
+        else:
+            writable = CountingWriter(output)
+            start = 0
+
+        if main is not None:
+            writable.write(b'#!/usr/bin/env python3\n')
+
+        with zipfile.ZipFile(writable, mode='w') as archive:
+            def add(key: str, data: bytes) -> None:
+                info = zipfile.ZipInfo(key, date_time=_ZIP_DATE_TIME)
+                info.compress_type = zipfile.ZIP_DEFLATED
+                info.create_system = 3
+                info.external_attr = 0o644 << 16
+                archive.writestr(info, data, compresslevel=self._compression_level)
+
+            # zipimport reports a module's path as the archive's absolute path
+            # joined with the module's key. Compiled code uses the same path.
+            archive_path = (
+                None if self._output is None else os.path.abspath(self._output))
+
+            def add_source(key: str, data: bytes) -> None:
+                add(key, data)
+                if self._precompile and key.endswith('.py'):
+                    path = key if archive_path is None else os.path.join(
+                        archive_path, *key.split('/'))
+                    add(key[:-3] + '.pyc', BundleMaker.compile_pyc(data, path))
+
+            if main is not None:
+                add_source('__main__.py', _ZIPAPP_MAIN.format(main=main).encode('utf8'))
+            for file in files:
+                data = file.path.read_bytes()
+                if file.kind is FileKind.TEXT:
+                    data = BundleMaker.normalize_newlines(data)
+                add_source(file.key, data)
+
+        return writable.tell() - start
+
+    @staticmethod
+    def compile_pyc(source: bytes, path: str) -> bytes:
+        # Unchecked hash-based .pyc files don't depend on timestamps, which keeps
+        # the zipapp reproducible, and zipimport never reads the source again.
+        code = compile(source, path, 'exec', dont_inherit=True)
+        return b''.join([
+            importlib.util.MAGIC_NUMBER,
+            (0b01).to_bytes(4, 'little'),
+            importlib.util.source_hash(source),
+            marshal.dumps(code),
+        ])
+
+    # ----------------------------------------------------------------------------------
+
     def emit_meta_data(self) -> 'Iterator[bytes]':
         yield Toolbox.HEAVY_RULE
         yield from self.emit_version()
         yield _EMPTY_LINE
         yield from self.emit_manifest()
+        yield _EMPTY_LINE
+        yield from self.emit_digests()
+        yield _EMPTY_LINE
 
     def emit_version(self) -> 'Iterator[bytes]':
         yield f"__version__ = '{__version__}'\n".encode('ascii')
@@ -310,8 +1048,14 @@ class BundleMaker:
         self
     ) -> 'Iterator[tuple[str, tuple[FileKind, int, int]]]':
         offset = len(_BANNER) + len(_BUNDLE_START)
+        locations: 'dict[str, tuple[int, int]]' = {}
         for kind, key, prefix, data, suffix in self._ranges:
-            yield key, ((kind, 0, 0) if data == 0 else (kind, offset + prefix, data))
+            if key in self._aliases:
+                location = locations[self._aliases[key]]
+            else:
+                location = (0, 0) if data == 0 else (offset + prefix, data)
+                locations[key] = location
+            yield key, (kind, *location)
             offset += prefix + data + suffix
 
     def emit_manifest(self) -> 'Iterator[bytes]':
@@ -321,6 +1065,31 @@ class BundleMaker:
             yield entry.encode('utf8')
         yield b'}\n'
 
+    def emit_digests(self) -> 'Iterator[bytes]':
+        # SHA-256 of each entry's range in the bundle, i.e., its stored bytes
+        yield b'__digests__ = {\n'
+        for _, key, *_ in self._ranges:
+            yield f'    "{key}": "{self._digests[key]}",\n'.encode('utf8')
+        yield b'}\n'
+
+    def emit_digest(self, digest: str) -> 'Iterator[bytes]':
+        yield Toolbox.DIGEST_MARK + f'{digest}"\n'.encode('ascii')
+
+    def emit_compact_manifest(self) -> 'Iterator[bytes]':
+        manifest = {
+            key: (kind.value, offset, length)
+            for key, (kind, offset, length) in self.list_manifest_entries()
+        }
+        data = marshal.dumps((__version__, manifest), 4)
+        encoded = base64.a85encode(data, wrapcol=76).splitlines()
+        lines = [b'# ' + line + b'\n' for line in encoded]
+
+        yield _EMPTY_LINE
+        yield Toolbox.PLAIN_RULE
+        yield from lines
+        length = sum(len(line) for line in lines)
+        yield Toolbox.MANIFEST_MARK + f'{length:010d}\n'.encode('ascii')
+
     # ----------------------------------------------------------------------------------
 
     def emit_runtime(
@@ -339,7 +1108,16 @@ class BundleMaker:
         repackage = 'bundle.repackage()\n    ' if self._repackage else ''
         repackage += "del sys.modules['__main__']"
 
-        main_block = _MAIN.format(main=main, repackage=repackage)
+        install_options = ''
+        if self._append_finder:
+            install_options += ', append=True'
+        if self._bytecode_cache:
+            install_options += ', cache_dir=Toolbox.user_cache_dir("bytecode")'
+        if self._verify:
+            install_options += ', digests=__digests__, verify=True'
+
+        main_block = _MAIN.format(
+            main=main, install_options=install_options, repackage=repackage)
         yield from main_block.encode('utf8').splitlines(keepends=True)
 
     def emit_tsutsumu_bundle(self) -> 'Iterator[bytes]':
@@ -377,8 +1155,24 @@ class BundleMaker:
         writable: 'None | Writable' = None,
     ) -> None:
         if writable is None:
-            for line in lines:
-                print(line.decode('utf8'), end='')
-        else:
-            for line in lines:
-                writable.write(line)
+            # Flush pending text first, so that it precedes the lines.
+            sys.stdout.flush()
+            buffer = getattr(sys.stdout, 'buffer', None)
+            writable = TextWriter(sys.stdout) if buffer is None else buffer
+        BundleMaker.write_chunked(lines, writable)
+
+    @staticmethod
+    def write_chunked(lines: 'Iterable[bytes]', writable: 'Writable') -> int:
+        """Write the lines in few large chunks and return their total size."""
+        byte_count = 0
+        chunk = bytearray()
+        for line in lines:
+            chunk += line
+            if len(chunk) >= _CHUNK_SIZE:
+                writable.write(chunk)
+                byte_count += len(chunk)
+                chunk.clear()
+        if chunk:
+            writable.write(chunk)
+            byte_count += len(chunk)
+        return byte_count